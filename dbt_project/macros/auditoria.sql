@@ -0,0 +1,69 @@
+-- Macros de auditoria das execuções do dbt
+--
+-- registrar_contagens, chamada no on-run-end (dbt_project.yml), grava em
+-- <schema do target>_auditoria.dbt_contagens a contagem exata de linhas de cada
+-- modelo materializado na execução. O dashboard lê essa tabela em vez de rodar
+-- COUNT(*) nas camadas a cada atualização.
+
+-- Tabela de contagens: uma linha por relação, com a última contagem registrada
+{% macro relacao_contagens() %}
+    {{ return(api.Relation.create(
+        database=target.database, schema=target.schema ~ '_auditoria', identifier='dbt_contagens'
+    )) }}
+{% endmacro %}
+
+
+-- Grava a contagem dos modelos/snapshots executados com sucesso. Modelos
+-- `table` usam o rows_affected do CREATE TABLE AS (sem nova leitura); os
+-- incrementais são contados uma vez aqui. Views e efêmeros ficam de fora.
+{% macro registrar_contagens(results) %}
+    {%- if not execute or not var('registrar_contagens', true) -%}
+        {{ return('') }}
+    {%- endif -%}
+
+    {%- set linhas = [] -%}
+    {%- for resultado in results
+        if resultado.status == 'success'
+        and resultado.node.resource_type in ('model', 'snapshot')
+        and resultado.node.config.materialized not in ('view', 'ephemeral') -%}
+        {%- set no = resultado.node -%}
+        {%- set afetadas = (resultado.adapter_response or {}).get('rows_affected') -%}
+        {%- if no.config.materialized == 'table' and afetadas is not none and afetadas >= 0 -%}
+            {%- set registros, origem = afetadas ~ '::bigint', 'dbt' -%}
+        {%- else -%}
+            {%- set registros, origem = '(SELECT COUNT(*) FROM ' ~ no.relation_name ~ ')', 'count' -%}
+        {%- endif -%}
+        {%- do linhas.append(
+            "('" ~ no.schema ~ "', '" ~ (no.alias or no.name) ~ "', " ~ registros ~ ", '" ~ origem ~ "', '"
+            ~ invocation_id ~ "')"
+        ) -%}
+    {%- endfor -%}
+    {%- if not linhas -%}
+        {{ return('') }}
+    {%- endif -%}
+
+    {%- set tabela = relacao_contagens() -%}
+    {% set sql %}
+        CREATE SCHEMA IF NOT EXISTS {{ tabela.schema }};
+        CREATE TABLE IF NOT EXISTS {{ tabela }} (
+            schema_nome TEXT NOT NULL,
+            tabela TEXT NOT NULL,
+            registros BIGINT NOT NULL,
+            origem_contagem TEXT NOT NULL,  -- 'dbt' (rows_affected) ou 'count'
+            invocation_id TEXT,
+            contado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (schema_nome, tabela)
+        );
+        INSERT INTO {{ tabela }} (schema_nome, tabela, registros, origem_contagem, invocation_id)
+        VALUES {{ linhas | join(',\n               ') }}
+        ON CONFLICT (schema_nome, tabela) DO UPDATE SET
+            registros = EXCLUDED.registros,
+            origem_contagem = EXCLUDED.origem_contagem,
+            invocation_id = EXCLUDED.invocation_id,
+            contado_em = NOW();
+    {% endset %}
+    {% do run_query(sql) %}
+    {% do adapter.commit() %}
+    {{ log('📏 Contagens de ' ~ linhas | length ~ ' modelos registradas em ' ~ tabela, info=True) }}
+    {{ return('') }}
+{% endmacro %}
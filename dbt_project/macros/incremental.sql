@@ -0,0 +1,104 @@
+-- Macros para modelos incrementais
+
+-- Marca d'água de um modelo incremental: maior `column` já carregado em {{ this }},
+-- recuado `lookback_minutes` para não perder transações que fizeram commit depois
+-- da última execução com updated_at anterior a ela. Como é uma subconsulta sem
+-- correlação, o Postgres a avalia uma vez e o filtro `updated_at > ...` usa o índice.
+{% macro incremental_watermark(column='updated_at', lookback_minutes=var('incremental_lookback_minutes', 10)) %}
+    (SELECT COALESCE(MAX({{ column }}), '1900-01-01'::timestamp) - INTERVAL '{{ lookback_minutes }} minutes' FROM {{ this }})
+{% endmacro %}
+
+
+-- Camada bronze materializada (var bronze_materializado): em vez de views sobre
+-- as tabelas transacionais da origem, cópias locais mantidas por marca d'água de
+-- updated_at, com índices para as leituras de silver/gold. Exclusões físicas na
+-- origem só são refletidas com --full-refresh.
+{% macro bronze_materializacao() %}
+    {{ return('incremental' if var('bronze_materializado', false) else 'view') }}
+{% endmacro %}
+
+-- Filtro da camada bronze: a validação básica na carga completa (e na view) e,
+-- nas cargas incrementais, só as linhas alteradas desde a marca d'água. As
+-- alteradas que deixaram de passar na validação são removidas por bronze_pos_carga.
+{% macro bronze_filtro(condicao=none) %}
+    {% if is_incremental() %}
+    WHERE updated_at > {{ incremental_watermark() }}
+    {% elif condicao %}
+    WHERE {{ condicao }}
+    {% endif %}
+{% endmacro %}
+
+-- post_hook da camada bronze materializada
+{% macro bronze_pos_carga(condicao=none) %}
+    {% if not var('bronze_materializado', false) or not condicao %}
+        {{ return([]) }}
+    {% endif %}
+    {{ return(["DELETE FROM {{ this }} WHERE (" ~ condicao ~ ") IS NOT TRUE"]) }}
+{% endmacro %}
+
+
+-- pre_hook dos modelos incrementais que só carregam as linhas da `origem` que
+-- passam em `condicao`: o delete+insert substitui apenas as chaves que o modelo
+-- ainda retorna, então uma linha alterada na origem que deixou de passar no
+-- filtro (ex: valor_bruto <= 0) manteria a versão antiga em {{ this }}. Remove
+-- essas chaves antes da carga, lendo na origem só as linhas além da marca d'água.
+-- A source é resolvida na execução do hook (no parse, source() não aponta para a tabela real).
+{% macro remover_reprovados(fonte, tabela, condicao, chave_destino, chave_origem='id') %}
+    {{ return([
+        "{% if is_incremental() %}"
+        ~ "DELETE FROM {{ this }} WHERE " ~ chave_destino ~ " IN ("
+        ~ "SELECT " ~ chave_origem ~ " FROM {{ source('" ~ fonte ~ "', '" ~ tabela ~ "') }}"
+        ~ " WHERE updated_at > {{ incremental_watermark() }} AND (" ~ condicao ~ ") IS NOT TRUE)"
+        ~ "{% endif %}"
+    ]) }}
+{% endmacro %}
+
+
+-- Versões anteriores das linhas de um modelo incremental, para os agregados
+-- incrementais que leem dele. Quando uma linha muda de chave de agrupamento
+-- (ex: data_pedido ou cliente_id alterados) ou sai do modelo, os agregados
+-- precisam recalcular também o grupo em que ela estava antes; esse grupo não
+-- está mais no modelo, só em <modelo>_anteriores.
+{% macro relacao_anteriores(relacao) %}
+    {{ return(relacao.incorporate(path={'identifier': relacao.identifier ~ '_anteriores'})) }}
+{% endmacro %}
+
+-- pre_hook: antes da carga, guarda em <this>_anteriores as `colunas` atuais das
+-- linhas alteradas na origem desde a marca d'água (inclusive as que vão sair do
+-- modelo). Entradas mais antigas que var('retencao_anteriores_dias') são descartadas.
+{% macro registrar_anteriores(fonte, tabela, chave_destino, colunas, chave_origem='id') %}
+    {%- set lista = ([chave_destino] + colunas) | join(', ') -%}
+    {{ return([
+        "{% if is_incremental() %}"
+        ~ "CREATE TABLE IF NOT EXISTS {{ relacao_anteriores(this) }} AS"
+        ~ " SELECT " ~ lista ~ ", NOW()::timestamp as substituido_em FROM {{ this }} WITH NO DATA;"
+        ~ " INSERT INTO {{ relacao_anteriores(this) }}"
+        ~ " SELECT " ~ lista ~ ", NOW()::timestamp FROM {{ this }}"
+        ~ " WHERE " ~ chave_destino ~ " IN ("
+        ~ "SELECT " ~ chave_origem ~ " FROM {{ source('" ~ fonte ~ "', '" ~ tabela ~ "') }}"
+        ~ " WHERE updated_at > {{ incremental_watermark() }});"
+        ~ " DELETE FROM {{ relacao_anteriores(this) }}"
+        ~ " WHERE substituido_em < NOW()::timestamp - INTERVAL '{{ var('retencao_anteriores_dias', 7) }} days'"
+        ~ "{% endif %}"
+    ]) }}
+{% endmacro %}
+
+-- Valores anteriores de `expressao` em <relacao>_anteriores registrados desde a
+-- marca d'água do agregado (coluna ultima_atualizacao); vazio (com os tipos de
+-- `relacao`) enquanto a relação ainda não teve carga incremental
+{% macro chaves_anteriores(relacao, expressao) %}
+    {%- set anteriores = relacao_anteriores(relacao) -%}
+    {%- if adapter.get_relation(anteriores.database, anteriores.schema, anteriores.identifier) is none -%}
+    SELECT {{ expressao }} FROM {{ relacao }} WHERE FALSE
+    {%- else -%}
+    SELECT {{ expressao }}
+    FROM {{ anteriores }}
+    WHERE substituido_em > {{ incremental_watermark('ultima_atualizacao') }}
+    {%- endif -%}
+{% endmacro %}
+
+-- post_hook dos agregados incrementais: os grupos recalculados que ficaram sem
+-- linhas voltam do modelo com ultima_atualizacao nula e são removidos aqui
+{% macro remover_grupos_vazios() %}
+    {{ return(["{% if is_incremental() %}DELETE FROM {{ this }} WHERE ultima_atualizacao IS NULL{% endif %}"]) }}
+{% endmacro %}
@@ -0,0 +1,37 @@
+-- Macros de índices dos modelos
+--
+-- Os índices de cada modelo ficam na configuração `indexes` (lista de
+-- {'columns': [...], 'unique': bool, 'type': 'btree'|'hash'|...}). O dbt só os
+-- cria quando a tabela é (re)construída; garantir_indices, aplicada como
+-- post-hook das camadas silver e gold (dbt_project.yml), cria também os que
+-- faltam em tabelas incrementais já existentes, sem duplicar os que o dbt criou.
+
+-- Cria os índices de `indexes` que ainda não existem em {{ this }}
+-- (um índice equivalente = mesmas colunas, na mesma ordem, e mesma unicidade)
+{% macro garantir_indices() %}
+    {%- if not execute or config.get('materialized') in ('view', 'ephemeral') -%}
+        {{ return('') }}
+    {%- endif -%}
+    {%- for indice in config.get('indexes', []) %}
+        {%- set colunas = indice['columns'] if indice['columns'] is not string else [indice['columns']] %}
+        {%- set unico = indice.get('unique', false) %}
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        WHERE i.indrelid = '{{ this.include(database=false) }}'::regclass
+          AND i.indisunique = {{ 'true' if unico else 'false' }}
+          AND ARRAY(
+              SELECT a.attname::text
+              FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, ordem)
+              JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+              ORDER BY k.ordem
+          ) = ARRAY[{% for coluna in colunas %}'{{ coluna }}'{{ ', ' if not loop.last }}{% endfor %}]::text[]
+    ) THEN
+        CREATE {{ 'UNIQUE ' if unico }}INDEX ON {{ this }}
+            USING {{ indice.get('type', 'btree') }} ({{ colunas | join(', ') }});
+    END IF;
+END $$;
+    {%- endfor %}
+{% endmacro %}
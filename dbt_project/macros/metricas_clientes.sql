@@ -0,0 +1,276 @@
+-- Macros das métricas avançadas por cliente
+--
+-- O SQL de gold_metricas_avancadas_clientes e de gold_clientes_pedidos_historico
+-- fica aqui para que o teste de regressão (tests/regression) rode exatamente a
+-- mesma consulta sobre o fixture em seeds/fixtures, e o benchmark
+-- (scripts/benchmark_metricas_clientes.py) meça o SQL compilado dos modelos.
+
+-- Agregados de todo o histórico de pedidos por cliente (estado do modo
+-- histórico materializado). `filtro` restringe os pedidos lidos (ex: só os
+-- clientes alterados, nas cargas incrementais).
+{% macro agregados_historicos_clientes(pedidos, filtro=none) %}
+SELECT
+    cliente_id,
+    COUNT(*) as total_pedidos,
+    SUM(valor_liquido) as receita_total,
+    AVG(valor_liquido) as ticket_medio,
+    MIN(data_pedido) as primeira_compra,
+    MAX(data_pedido) as ultima_compra,
+    MODE() WITHIN GROUP (ORDER BY EXTRACT(MONTH FROM data_pedido)) as mes_preferido,
+    MAX(updated_at) as ultima_atualizacao
+FROM {{ pedidos }}
+{% if filtro %}
+WHERE {{ filtro }}
+{% endif %}
+GROUP BY cliente_id
+{% endmacro %}
+
+
+-- Linhas de `clientes_alterados` (relação/CTE com cliente_id) para a carga
+-- incremental do histórico: os agregados recalculados e, para os clientes que
+-- ficaram sem pedidos, uma linha com ultima_atualizacao nula, removida depois
+-- por remover_grupos_vazios
+{% macro historico_clientes_alterados(pedidos, clientes_alterados) %}
+{{ agregados_historicos_clientes(pedidos, 'cliente_id IN (SELECT cliente_id FROM ' ~ clientes_alterados ~ ')') }}
+UNION ALL
+SELECT a.cliente_id, 0, NULL, NULL, NULL, NULL, NULL, NULL::timestamp
+FROM {{ clientes_alterados }} a
+WHERE a.cliente_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM {{ pedidos }} p WHERE p.cliente_id = a.cliente_id)
+{% endmacro %}
+
+
+-- Métricas por cliente de `clientes` (dim_clientes) a partir de `pedidos`
+-- (fct_pedidos). Com `historico` (gold_clientes_pedidos_historico), os agregados
+-- sobre todo o histórico vêm dele e só o último ano de pedidos é lido; sem ele,
+-- tudo sai de uma única passada em `pedidos`.
+{% macro metricas_avancadas_clientes(pedidos, clientes, historico=none) %}
+WITH base_clientes AS (
+    SELECT
+        cliente_id,
+        nome,
+        email_original as email,
+        data_cadastro,
+        status,
+        tipo_cliente,
+        limite_credito
+    FROM {{ clientes }}
+),
+
+{% if historico %}
+-- Modo histórico materializado: os agregados sobre todo o histórico vêm de
+-- `historico` (recalculado só para clientes com pedidos novos); as janelas
+-- relativas a CURRENT_DATE saem do último ano de pedidos, lido pelo índice de
+-- data_pedido. Os scores RFM continuam calculados sobre todos os clientes.
+pedidos_recentes AS (
+    SELECT
+        cliente_id,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN 1 END) as pedidos_30d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN 1 END) as pedidos_90d,
+        COUNT(*) as pedidos_12m,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN valor_liquido ELSE 0 END) as receita_30d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN valor_liquido ELSE 0 END) as receita_90d,
+        SUM(valor_liquido) as receita_12m,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '180 days'
+                  AND data_pedido < CURRENT_DATE - INTERVAL '90 days'
+                  THEN valor_liquido ELSE 0 END) as receita_90d_anterior
+    FROM {{ pedidos }}
+    WHERE data_pedido >= CURRENT_DATE - INTERVAL '365 days'
+    GROUP BY cliente_id
+),
+
+pedidos_agregados AS (
+    SELECT
+        h.cliente_id,
+        h.total_pedidos,
+        h.receita_total,
+        h.ticket_medio,
+        h.primeira_compra,
+        h.ultima_compra,
+        COALESCE(r.pedidos_30d, 0) as pedidos_30d,
+        COALESCE(r.pedidos_90d, 0) as pedidos_90d,
+        COALESCE(r.pedidos_12m, 0) as pedidos_12m,
+        COALESCE(r.receita_30d, 0) as receita_30d,
+        COALESCE(r.receita_90d, 0) as receita_90d,
+        COALESCE(r.receita_12m, 0) as receita_12m,
+        COALESCE(r.receita_90d_anterior, 0) as receita_90d_anterior,
+        h.mes_preferido
+    FROM {{ historico }} h
+    LEFT JOIN pedidos_recentes r ON r.cliente_id = h.cliente_id
+),
+{% else %}
+-- Uma única passada em `pedidos` por cliente: totais, janelas, base da
+-- tendência e mês preferido saem do mesmo GROUP BY
+pedidos_agregados AS (
+    SELECT
+        cliente_id,
+        COUNT(*) as total_pedidos,
+        SUM(valor_liquido) as receita_total,
+        AVG(valor_liquido) as ticket_medio,
+        MIN(data_pedido) as primeira_compra,
+        MAX(data_pedido) as ultima_compra,
+
+        -- Métricas temporais
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN 1 END) as pedidos_30d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN 1 END) as pedidos_90d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '365 days' THEN 1 END) as pedidos_12m,
+
+        -- Receita por período
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN valor_liquido ELSE 0 END) as receita_30d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN valor_liquido ELSE 0 END) as receita_90d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '365 days' THEN valor_liquido ELSE 0 END) as receita_12m,
+
+        -- Receita dos 3 meses anteriores aos últimos 3 (base da tendência)
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '180 days'
+                  AND data_pedido < CURRENT_DATE - INTERVAL '90 days'
+                  THEN valor_liquido ELSE 0 END) as receita_90d_anterior,
+
+        -- Sazonalidade (mês com maior volume)
+        MODE() WITHIN GROUP (ORDER BY EXTRACT(MONTH FROM data_pedido)) as mes_preferido
+
+    FROM {{ pedidos }}
+    GROUP BY cliente_id
+),
+{% endif %}
+
+metricas_comportamentais AS (
+    -- Derivadas dos agregados por cliente, sem reler os pedidos
+    SELECT
+        cliente_id,
+
+        -- Frequência de compra
+        CASE
+            WHEN total_pedidos = 0 THEN 0
+            ELSE EXTRACT(DAYS FROM (ultima_compra - primeira_compra)) / NULLIF(total_pedidos - 1, 0)
+        END as dias_entre_compras,
+
+        -- Recência (dias desde última compra)
+        EXTRACT(DAYS FROM (CURRENT_DATE - ultima_compra)) as dias_desde_ultima_compra,
+
+        -- Tendência de crescimento (comparando últimos 3 meses vs 3 meses anteriores)
+        COALESCE(
+            (receita_90d - receita_90d_anterior) / NULLIF(receita_90d_anterior, 0), 0
+        ) as tendencia_crescimento,
+
+        mes_preferido
+
+    FROM pedidos_agregados
+),
+
+rfm_analysis AS (
+    SELECT
+        pa.cliente_id,
+
+        -- Recency Score (1-5, onde 5 é mais recente)
+        CASE
+            WHEN dias_desde_ultima_compra <= 30 THEN 5
+            WHEN dias_desde_ultima_compra <= 60 THEN 4
+            WHEN dias_desde_ultima_compra <= 90 THEN 3
+            WHEN dias_desde_ultima_compra <= 180 THEN 2
+            ELSE 1
+        END as recency_score,
+
+        -- Frequency Score (baseado em quartis; cliente_id desempata para o resultado ser determinístico)
+        NTILE(5) OVER (ORDER BY pa.total_pedidos, pa.cliente_id) as frequency_score,
+
+        -- Monetary Score (baseado em quartis)
+        NTILE(5) OVER (ORDER BY pa.receita_total, pa.cliente_id) as monetary_score
+
+    FROM pedidos_agregados pa
+    INNER JOIN metricas_comportamentais mc ON pa.cliente_id = mc.cliente_id
+),
+
+segmentacao_avancada AS (
+    SELECT
+        rfm.*,
+
+        -- Segmentação RFM
+        CASE
+            WHEN recency_score >= 4 AND frequency_score >= 4 AND monetary_score >= 4 THEN 'Champions'
+            WHEN recency_score >= 3 AND frequency_score >= 3 AND monetary_score >= 3 THEN 'Loyal Customers'
+            WHEN recency_score >= 4 AND frequency_score <= 2 THEN 'New Customers'
+            WHEN recency_score >= 3 AND frequency_score >= 3 AND monetary_score <= 2 THEN 'Potential Loyalists'
+            WHEN recency_score >= 3 AND frequency_score <= 2 AND monetary_score >= 3 THEN 'Big Spenders'
+            WHEN recency_score <= 2 AND frequency_score >= 3 AND monetary_score >= 3 THEN 'At Risk'
+            WHEN recency_score <= 2 AND frequency_score >= 2 AND monetary_score <= 2 THEN 'Cannot Lose Them'
+            WHEN recency_score <= 2 AND frequency_score <= 2 AND monetary_score >= 3 THEN 'Hibernating'
+            ELSE 'Lost'
+        END as segmento_rfm,
+
+        -- Score RFM combinado
+        (recency_score * 100) + (frequency_score * 10) + monetary_score as rfm_score
+
+    FROM rfm_analysis rfm
+),
+
+metricas_finais AS (
+    SELECT
+        bc.cliente_id,
+        bc.nome,
+        bc.email,
+        bc.data_cadastro,
+        bc.status,
+        bc.tipo_cliente,
+        bc.limite_credito,
+
+        -- Métricas básicas
+        COALESCE(pa.total_pedidos, 0) as total_pedidos,
+        COALESCE(pa.receita_total, 0) as receita_total,
+        COALESCE(pa.ticket_medio, 0) as ticket_medio,
+        pa.primeira_compra,
+        pa.ultima_compra,
+
+        -- Métricas temporais
+        COALESCE(pa.pedidos_30d, 0) as pedidos_30d,
+        COALESCE(pa.pedidos_90d, 0) as pedidos_90d,
+        COALESCE(pa.pedidos_12m, 0) as pedidos_12m,
+        COALESCE(pa.receita_30d, 0) as receita_30d,
+        COALESCE(pa.receita_90d, 0) as receita_90d,
+        COALESCE(pa.receita_12m, 0) as receita_12m,
+
+        -- Métricas comportamentais
+        COALESCE(mc.dias_entre_compras, 0) as dias_entre_compras,
+        COALESCE(mc.dias_desde_ultima_compra, 999) as dias_desde_ultima_compra,
+        COALESCE(mc.tendencia_crescimento, 0) as tendencia_crescimento,
+        mc.mes_preferido,
+
+        -- RFM e Segmentação
+        COALESCE(sa.recency_score, 1) as recency_score,
+        COALESCE(sa.frequency_score, 1) as frequency_score,
+        COALESCE(sa.monetary_score, 1) as monetary_score,
+        COALESCE(sa.rfm_score, 111) as rfm_score,
+        COALESCE(sa.segmento_rfm, 'Lost') as segmento_rfm,
+
+        -- Customer Lifetime Value (CLV) estimado
+        CASE
+            WHEN pa.total_pedidos > 0 AND mc.dias_entre_compras > 0 THEN
+                (pa.ticket_medio * (365.0 / mc.dias_entre_compras) * 2) -- Estimativa para 2 anos
+            ELSE 0
+        END as clv_estimado,
+
+        -- Flags de risco e oportunidade
+        CASE
+            WHEN mc.dias_desde_ultima_compra > 180 THEN true
+            ELSE false
+        END as em_risco_churn,
+
+        CASE
+            WHEN pa.receita_30d > pa.receita_90d / 3 * 1.5 THEN true
+            ELSE false
+        END as crescimento_acelerado,
+
+        -- Classificação de valor
+        {{ classify_customer_value('COALESCE(pa.receita_total, 0)') }} as categoria_valor,
+
+        -- Auditoria
+        {{ add_audit_columns() }}
+
+    FROM base_clientes bc
+    LEFT JOIN pedidos_agregados pa ON bc.cliente_id = pa.cliente_id
+    LEFT JOIN metricas_comportamentais mc ON bc.cliente_id = mc.cliente_id
+    LEFT JOIN segmentacao_avancada sa ON bc.cliente_id = sa.cliente_id
+)
+
+SELECT * FROM metricas_finais
+ORDER BY receita_total DESC, total_pedidos DESC
+{% endmacro %}
@@ -0,0 +1,167 @@
+-- Macros para tabelas de fatos particionadas por mês
+--
+-- Materialização incremental_particionado: cria o modelo como tabela
+-- particionada (PARTITION BY RANGE) na coluna `partition_by`, com uma partição
+-- por mês, e nas execuções incrementais grava só nas partições dos meses
+-- presentes no resultado do modelo. Os filtros por data das consultas gold
+-- (data_pedido >= CURRENT_DATE - INTERVAL ...) passam a ler só as partições
+-- do período (partition pruning).
+--
+-- Configurações:
+--   partition_by: coluna de data/timestamp usada na partição (obrigatória)
+--   unique_key: remove a versão anterior das linhas por chave antes de inserir
+--               (o modelo retorna só as linhas alteradas)
+--
+-- A reconstrução (primeira execução ou --full-refresh) é feita numa relação
+-- intermediária trocada pela atual por rename, como na materialização table
+-- do dbt: a tabela antiga continua legível durante a carga e só é bloqueada
+-- na troca. Mudanças de schema do modelo exigem --full-refresh.
+
+-- is_incremental() também vale para a materialização particionada
+{% macro is_incremental() %}
+    {% if not execute %}
+        {{ return(False) }}
+    {% endif %}
+    {% set relation = adapter.get_relation(this.database, this.schema, this.table) %}
+    {{ return(
+        relation is not none
+        and relation.type == 'table'
+        and model.config.materialized in ('incremental', 'incremental_particionado')
+        and not should_full_refresh()
+    ) }}
+{% endmacro %}
+
+
+-- Renomeia as partições de `relacao` cujo nome começa com `prefixo` para
+-- começar com `novo_prefixo` (as partições não acompanham o rename da tabela mãe)
+{% macro renomear_particoes(relacao, prefixo, novo_prefixo) %}
+    {% set filhas = run_query(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        ~ "WHERE i.inhparent = to_regclass('" ~ relacao.include(database=False) ~ "') "
+        ~ "AND starts_with(c.relname, '" ~ prefixo ~ "')"
+    ).columns[0].values() %}
+    {% for nome in filhas %}
+        {% do run_query(
+            "ALTER TABLE " ~ relacao.incorporate(path={'identifier': nome})
+            ~ " RENAME TO " ~ adapter.quote(novo_prefixo ~ nome[(prefixo | length):])
+        ) %}
+    {% endfor %}
+{% endmacro %}
+
+
+-- Cria (se ainda não existem) as partições mensais dos meses presentes em `origem`
+-- e retorna os nomes das partições afetadas
+{% macro criar_particoes_mensais(relacao, origem, coluna) %}
+    {% set meses = run_query(
+        "SELECT DISTINCT to_char(DATE_TRUNC('month', " ~ coluna ~ "), 'YYYYMM'), "
+        ~ "DATE_TRUNC('month', " ~ coluna ~ ")::date::text, "
+        ~ "(DATE_TRUNC('month', " ~ coluna ~ ") + INTERVAL '1 month')::date::text "
+        ~ "FROM " ~ origem ~ " WHERE " ~ coluna ~ " IS NOT NULL"
+    ) %}
+    {% set particoes = [] %}
+    {% for sufixo, inicio, fim in meses.rows %}
+        {% set particao = relacao.incorporate(path={'identifier': relacao.identifier ~ '_p' ~ sufixo}) %}
+        {% do run_query(
+            "CREATE TABLE IF NOT EXISTS " ~ particao ~ " PARTITION OF " ~ relacao
+            ~ " FOR VALUES FROM ('" ~ inicio ~ "') TO ('" ~ fim ~ "')"
+        ) %}
+        {% do particoes.append(particao) %}
+    {% endfor %}
+    {{ return(particoes) }}
+{% endmacro %}
+
+
+{% materialization incremental_particionado, adapter='postgres' %}
+    {%- set target_relation = this.incorporate(type='table') -%}
+    {%- set existing_relation = load_cached_relation(this) -%}
+    {%- set temp_relation = make_temp_relation(target_relation) -%}
+    {%- set intermediate_relation = make_intermediate_relation(target_relation) -%}
+    {%- set coluna = config.require('partition_by') -%}
+    {%- set unique_key = config.get('unique_key') -%}
+    {%- set grant_config = config.get('grants') -%}
+
+    {% set reconstruir = existing_relation is none or should_full_refresh() or existing_relation.type != 'table' %}
+    {%- set backup_relation = make_backup_relation(
+        target_relation, existing_relation.type if existing_relation is not none else 'table'
+    ) -%}
+    -- Sobras de uma reconstrução interrompida
+    {% do drop_relation_if_exists(load_cached_relation(intermediate_relation)) %}
+    {% do drop_relation_if_exists(load_cached_relation(backup_relation)) %}
+
+    -- O SQL do modelo já foi compilado como incremental; uma tabela comum
+    -- existente (versão anterior do modelo) precisa de --full-refresh
+    {% if not reconstruir %}
+        {% set relkind = run_query(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            ~ "WHERE n.nspname = '" ~ existing_relation.schema ~ "' AND c.relname = '" ~ existing_relation.identifier ~ "'"
+        ).columns[0].values() %}
+        {% if relkind | first != 'p' %}
+            {% do exceptions.raise_compiler_error(
+                existing_relation ~ " existe mas não é particionada; execute com --full-refresh"
+            ) %}
+        {% endif %}
+    {% endif %}
+
+    {{ run_hooks(pre_hooks, inside_transaction=False) }}
+    {{ run_hooks(pre_hooks, inside_transaction=True) }}
+
+    -- Reconstrução: a nova tabela é montada em intermediate_relation
+    {% set destino = intermediate_relation if reconstruir else target_relation %}
+
+    {% call statement('dados') %}
+        {{ get_create_table_as_sql(True, temp_relation, sql) }}
+    {% endcall %}
+
+    {% if reconstruir %}
+        {% call statement('criar_particionada') %}
+            CREATE TABLE {{ destino }} (LIKE {{ temp_relation }})
+                PARTITION BY RANGE ({{ coluna }});
+            -- Linhas com {{ coluna }} nulo
+            CREATE TABLE {{ destino.incorporate(path={'identifier': destino.identifier ~ '_padrao'}) }}
+                PARTITION OF {{ destino }} DEFAULT;
+        {% endcall %}
+    {% endif %}
+
+    {% do criar_particoes_mensais(destino, temp_relation, coluna) %}
+    {% set colunas = adapter.get_columns_in_relation(temp_relation) | map(attribute='quoted') | join(', ') %}
+
+    {% call statement('main') %}
+        {% if not reconstruir and unique_key %}
+            -- Versão anterior das linhas (inclusive as que mudaram de mês)
+            DELETE FROM {{ target_relation }} t
+            USING {{ temp_relation }} s
+            WHERE t.{{ unique_key }} = s.{{ unique_key }};
+        {% endif %}
+        INSERT INTO {{ destino }} ({{ colunas }})
+        SELECT {{ colunas }} FROM {{ temp_relation }};
+    {% endcall %}
+
+    {% if reconstruir %}
+        {% do create_indexes(intermediate_relation) %}
+        -- Troca por rename; as partições são renomeadas junto para manter o
+        -- padrão <tabela>_pAAAAMM usado nas cargas incrementais seguintes
+        {% if existing_relation is not none %}
+            {% do adapter.rename_relation(existing_relation, backup_relation) %}
+            {% if existing_relation.type == 'table' %}
+                {% do renomear_particoes(backup_relation, target_relation.identifier ~ '_', backup_relation.identifier ~ '_') %}
+            {% endif %}
+        {% endif %}
+        {% do adapter.rename_relation(intermediate_relation, target_relation) %}
+        {% do renomear_particoes(target_relation, intermediate_relation.identifier ~ '_', target_relation.identifier ~ '_') %}
+    {% endif %}
+
+    {{ run_hooks(post_hooks, inside_transaction=True) }}
+
+    {% do adapter.commit() %}
+
+    {% if reconstruir %}
+        {% do drop_relation_if_exists(backup_relation) %}
+    {% endif %}
+
+    {% do apply_grants(target_relation, grant_config, should_revoke=not reconstruir) %}
+    {% do persist_docs(target_relation, model) %}
+
+    {{ run_hooks(post_hooks, inside_transaction=False) }}
+
+    {{ return({'relations': [target_relation]}) }}
+{% endmaterialization %}
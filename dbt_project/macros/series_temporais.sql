@@ -0,0 +1,62 @@
+-- Macros das séries temporais do dashboard
+
+-- Rollup de vendas por `granularidade` ('minute', 'hour', ...) a partir de
+-- `pedidos` (fct_pedidos): uma linha por intervalo com pedidos e receita. Nas
+-- execuções incrementais só os intervalos com pedidos alterados desde a marca
+-- d'água são recalculados, por inteiro: os atuais e os anteriores desses pedidos
+-- (fct_pedidos_anteriores). Os que ficaram sem pedidos voltam com
+-- ultima_atualizacao nula e são removidos por remover_grupos_vazios. Com
+-- `tipo` (ex: 'date'), o intervalo é convertido para esse tipo.
+{% macro rollup_vendas(pedidos, granularidade, coluna, tipo=none) %}
+{%- set intervalo -%}
+    DATE_TRUNC('{{ granularidade }}', data_pedido){{ '::' ~ tipo if tipo else '' }}
+{%- endset -%}
+WITH
+{% if is_incremental() %}
+intervalos_alterados AS (
+    SELECT DISTINCT {{ intervalo }} as inicio
+    FROM {{ pedidos }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+      AND data_pedido IS NOT NULL
+    UNION
+    SELECT {{ intervalo }}
+    FROM ({{ chaves_anteriores(pedidos, 'data_pedido') }}) a (data_pedido)
+    WHERE data_pedido IS NOT NULL
+),
+{% endif %}
+
+pedidos AS (
+    SELECT
+        p.data_pedido,
+        p.valor_bruto,
+        p.valor_liquido,
+        p.updated_at
+    FROM {{ pedidos }} p
+    {% if is_incremental() %}
+    -- Intervalo em data_pedido: usa o índice e as partições mensais de fct_pedidos
+    JOIN intervalos_alterados i
+      ON p.data_pedido >= i.inicio
+     AND p.data_pedido < i.inicio + INTERVAL '1 {{ granularidade }}'
+    {% endif %}
+    WHERE p.data_pedido IS NOT NULL
+)
+
+SELECT
+    {{ intervalo }} as {{ coluna }},
+    COUNT(*) as total_pedidos,
+    SUM(valor_bruto) as receita_bruta,
+    SUM(valor_liquido) as receita_liquida,
+    MAX(updated_at) as ultima_atualizacao
+FROM pedidos
+GROUP BY {{ intervalo }}
+{% if is_incremental() %}
+UNION ALL
+SELECT i.inicio, 0, 0, 0, NULL::timestamp
+FROM intervalos_alterados i
+WHERE NOT EXISTS (
+    SELECT 1 FROM pedidos p
+    WHERE p.data_pedido >= i.inicio
+      AND p.data_pedido < i.inicio + INTERVAL '1 {{ granularidade }}'
+)
+{% endif %}
+{% endmacro %}
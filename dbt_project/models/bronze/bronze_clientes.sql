@@ -4,7 +4,14 @@
 -- Esta é uma visão simples dos dados brutos, sem transformações complexas ainda.
 
 {{ config(
-    materialized='view',
+    materialized=bronze_materializacao(),
+    unique_key='id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['id'], 'unique': True},
+        {'columns': ['updated_at']}
+    ],
+    post_hook=bronze_pos_carga('nome IS NOT NULL'),
     tags=['bronze', 'clientes', 'cdc']
 ) }}
 
@@ -30,4 +37,5 @@ SELECT
     -- Metadados para auditoria CDC
     updated_at as ultima_modificacao_fonte
 FROM {{ source('raw_data', 'clientes') }}
-WHERE nome IS NOT NULL  -- Validação básica: nome obrigatório
\ No newline at end of file
+-- Validação básica: nome obrigatório (ver bronze_filtro)
+{{ bronze_filtro('nome IS NOT NULL') }}
\ No newline at end of file
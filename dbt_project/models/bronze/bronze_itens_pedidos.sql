@@ -1,6 +1,16 @@
 -- bronze_itens_pedidos.sql
 
-{{ config(materialized='view') }}
+{{ config(
+    materialized=bronze_materializacao(),
+    unique_key='id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['id'], 'unique': True},
+        {'columns': ['updated_at']},
+        {'columns': ['pedido_id']},
+        {'columns': ['produto_id']}
+    ]
+) }}
 
 SELECT
     id,
@@ -14,4 +24,5 @@ SELECT
     updated_at,
     created_by,
     version
-FROM {{ source('public', 'itens_pedido') }}
\ No newline at end of file
+FROM {{ source('public', 'itens_pedido') }}
+{{ bronze_filtro() }}
@@ -2,7 +2,14 @@
 -- Camada Bronze: Dados brutos de leads do CRM
 
 {{ config(
-    materialized='view',
+    materialized=bronze_materializacao(),
+    unique_key='id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['id'], 'unique': True},
+        {'columns': ['updated_at']}
+    ],
+    post_hook=bronze_pos_carga('nome IS NOT NULL'),
     tags=['bronze', 'leads', 'crm', 'cdc']
 ) }}
 
@@ -32,4 +39,5 @@ SELECT
     -- Metadados para auditoria CDC
     updated_at as ultima_modificacao_fonte
 FROM {{ source('raw_data', 'leads') }}
-WHERE nome IS NOT NULL  -- Validação básica: lead deve ter nome 
\ No newline at end of file
+-- Validação básica: lead deve ter nome (ver bronze_filtro)
+{{ bronze_filtro('nome IS NOT NULL') }} 
\ No newline at end of file
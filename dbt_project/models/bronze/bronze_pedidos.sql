@@ -4,7 +4,15 @@
 -- Esta é uma visão simples dos dados brutos, sem transformações complexas ainda.
 
 {{ config(
-    materialized='view',
+    materialized=bronze_materializacao(),
+    unique_key='id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['id'], 'unique': True},
+        {'columns': ['updated_at']},
+        {'columns': ['cliente_id']}
+    ],
+    post_hook=bronze_pos_carga('valor_bruto > 0'),
     tags=['bronze', 'pedidos', 'cdc']
 ) }}
 
@@ -32,4 +40,5 @@ SELECT
     -- Metadados para auditoria CDC
     updated_at as ultima_modificacao_fonte
 FROM {{ source('raw_data', 'pedidos') }}
-WHERE valor_bruto > 0  -- Validação básica: pedidos devem ter valor positivo
\ No newline at end of file
+-- Validação básica: pedidos devem ter valor positivo (ver bronze_filtro)
+{{ bronze_filtro('valor_bruto > 0') }}
\ No newline at end of file
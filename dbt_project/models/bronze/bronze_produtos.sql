@@ -2,7 +2,14 @@
 -- Camada Bronze: Dados brutos de produtos do e-commerce
 
 {{ config(
-    materialized='view',
+    materialized=bronze_materializacao(),
+    unique_key='id',
+    incremental_strategy='delete+insert',
+    indexes=[
+        {'columns': ['id'], 'unique': True},
+        {'columns': ['updated_at']}
+    ],
+    post_hook=bronze_pos_carga('nome IS NOT NULL'),
     tags=['bronze', 'produtos', 'ecommerce', 'cdc']
 ) }}
 
@@ -33,4 +40,5 @@ SELECT
     -- Metadados para auditoria CDC
     updated_at as ultima_modificacao_fonte
 FROM {{ source('raw_data', 'produtos') }}
-WHERE nome IS NOT NULL  -- Validação básica: produto deve ter nome 
\ No newline at end of file
+-- Validação básica: produto deve ter nome (ver bronze_filtro)
+{{ bronze_filtro('nome IS NOT NULL') }} 
\ No newline at end of file
@@ -2,6 +2,12 @@
 -- Este modelo agrega o valor total de pedidos por cliente e por mês.
 -- É um exemplo de modelo da camada Gold, pronto para consumo por ferramentas de BI ou dashboards.
 
+{{ config(
+    indexes=[
+        {'columns': ['cliente_id']}
+    ]
+) }}
+
 WITH fct_pedidos AS (
     SELECT
         cliente_id,
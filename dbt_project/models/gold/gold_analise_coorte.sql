@@ -4,63 +4,35 @@
 {{ config(
     materialized='table',
     tags=['gold', 'analytics', 'cohort', 'retention'],
-    post_hook=[
-        "CREATE INDEX IF NOT EXISTS idx_coorte_mes_aquisicao ON {{ this }} (mes_aquisicao)",
-        "CREATE INDEX IF NOT EXISTS idx_coorte_periodo ON {{ this }} (periodo_desde_aquisicao)"
+    indexes=[
+        {'columns': ['mes_aquisicao']},
+        {'columns': ['periodo_desde_aquisicao']}
     ]
 ) }}
 
-WITH clientes_primeira_compra AS (
+-- A matriz por (mes_aquisicao, mes_atividade) é mantida incrementalmente em
+-- gold_coorte_celulas; aqui só são derivadas as métricas que dependem de outras
+-- células (LTV acumulado, churn, benchmarks entre coortes), sobre poucas linhas.
+WITH coorte_retencao AS (
     SELECT 
-        cliente_id,
-        MIN(data_pedido) as primeira_compra,
-        DATE_TRUNC('month', MIN(data_pedido)) as mes_aquisicao
-    FROM {{ ref('fct_pedidos') }}
-    GROUP BY cliente_id
-),
-
-atividade_mensal AS (
-    SELECT 
-        p.cliente_id,
-        DATE_TRUNC('month', p.data_pedido) as mes_atividade,
-        SUM(p.valor_liquido) as receita_mes,
-        COUNT(*) as pedidos_mes
-    FROM {{ ref('fct_pedidos') }} p
-    GROUP BY p.cliente_id, DATE_TRUNC('month', p.data_pedido)
+        mes_aquisicao,
+        mes_atividade,
+        periodo_desde_aquisicao,
+        clientes_ativos,
+        receita_periodo,
+        receita_media_cliente,
+        total_pedidos
+    FROM {{ ref('gold_coorte_celulas') }}
 ),
 
 coorte_base AS (
+    -- Todo cliente da coorte está ativo no mês de aquisição
     SELECT 
-        cpc.mes_aquisicao,
-        COUNT(DISTINCT cpc.cliente_id) as clientes_adquiridos,
-        SUM(am.receita_mes) as receita_aquisicao
-    FROM clientes_primeira_compra cpc
-    INNER JOIN atividade_mensal am ON cpc.cliente_id = am.cliente_id 
-                                   AND cpc.mes_aquisicao = am.mes_atividade
-    GROUP BY cpc.mes_aquisicao
-),
-
-coorte_retencao AS (
-    SELECT 
-        cpc.mes_aquisicao,
-        am.mes_atividade,
-        
-        -- Período desde aquisição (em meses)
-        EXTRACT(YEAR FROM am.mes_atividade) * 12 + EXTRACT(MONTH FROM am.mes_atividade) -
-        (EXTRACT(YEAR FROM cpc.mes_aquisicao) * 12 + EXTRACT(MONTH FROM cpc.mes_aquisicao)) as periodo_desde_aquisicao,
-        
-        COUNT(DISTINCT cpc.cliente_id) as clientes_ativos,
-        SUM(am.receita_mes) as receita_periodo,
-        AVG(am.receita_mes) as receita_media_cliente,
-        COUNT(am.pedidos_mes) as total_pedidos
-        
-    FROM clientes_primeira_compra cpc
-    INNER JOIN atividade_mensal am ON cpc.cliente_id = am.cliente_id
-    WHERE am.mes_atividade >= cpc.mes_aquisicao
-    GROUP BY 
-        cpc.mes_aquisicao, 
-        am.mes_atividade,
-        periodo_desde_aquisicao
+        mes_aquisicao,
+        clientes_ativos as clientes_adquiridos,
+        receita_periodo as receita_aquisicao
+    FROM coorte_retencao
+    WHERE mes_atividade = mes_aquisicao
 ),
 
 coorte_metricas AS (
@@ -0,0 +1,36 @@
+-- Modelo Gold: Agregados de todo o histórico de pedidos por cliente
+-- Estado do modo histórico materializado de gold_metricas_avancadas_clientes
+-- (--vars '{metricas_clientes_historico_materializado: true}'): só os clientes
+-- com pedidos novos ou alterados, e os clientes anteriores desses pedidos
+-- (fct_pedidos_anteriores), são recalculados; os que ficaram sem pedidos são
+-- removidos. As métricas relativas a CURRENT_DATE (janelas, recência,
+-- tendência) ficam no modelo final.
+
+{{ config(
+    materialized='incremental',
+    enabled=var('metricas_clientes_historico_materializado', false),
+    unique_key='cliente_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['cliente_id'], 'unique': True},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'analytics', 'advanced']
+) }}
+
+{% if is_incremental() %}
+WITH clientes_alterados AS (
+    SELECT cliente_id
+    FROM {{ ref('fct_pedidos') }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    UNION
+    SELECT cliente_id
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'cliente_id') }}) a (cliente_id)
+)
+
+{{ historico_clientes_alterados(ref('fct_pedidos'), 'clientes_alterados') }}
+{% else %}
+{{ agregados_historicos_clientes(ref('fct_pedidos')) }}
+{% endif %}
@@ -0,0 +1,92 @@
+-- Modelo Gold: Comportamento de compra de cada cliente na janela de detecção de anomalias
+-- Recalcula só os clientes com pedidos novos/alterados e os que tiveram dias
+-- expirados da janela, a partir de gold_vendas_clientes_diarias. O desvio
+-- padrão vem das somas e somas de quadrados (mesma fórmula do STDDEV).
+-- Clientes que ficaram sem pedidos na janela são removidos no post_hook
+-- (primeiro_pedido_em só é nulo nessas linhas e tem índice).
+
+{{ config(
+    materialized='incremental',
+    unique_key='cliente_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['cliente_id'], 'unique': True},
+        {'columns': ['primeiro_pedido_em']}
+    ],
+    tags=['gold', 'analytics', 'anomaly_detection'],
+    post_hook=[
+        "DELETE FROM {{ this }} WHERE primeiro_pedido_em IS NULL"
+    ]
+) }}
+
+WITH dias_na_janela AS (
+    SELECT *
+    FROM {{ ref('gold_vendas_clientes_diarias') }}
+    WHERE data_venda >= CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}
+),
+
+{% if is_incremental() %}
+clientes_afetados AS (
+    SELECT cliente_id
+    FROM {{ ref('gold_vendas_clientes_diarias') }}
+    WHERE ultima_atualizacao > {{ incremental_watermark('ultima_atualizacao') }}
+    
+    UNION
+    
+    -- Clientes anteriores dos pedidos alterados (podem ter perdido pedidos na janela)
+    SELECT cliente_id
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'cliente_id') }}) a (cliente_id)
+    WHERE cliente_id IS NOT NULL
+
+    UNION
+
+    -- Clientes cuja janela perdeu dias desde a última execução
+    SELECT cliente_id
+    FROM {{ this }}
+    WHERE primeiro_pedido_em < CURRENT_DATE - INTERVAL '{{ var("janela_anomalias_dias", 90) }} days'
+),
+{% else %}
+clientes_afetados AS (
+    SELECT DISTINCT cliente_id FROM dias_na_janela
+),
+{% endif %}
+
+agregados AS (
+    SELECT 
+        ca.cliente_id,
+        COALESCE(SUM(d.pedidos), 0) as pedidos_periodo,
+        SUM(d.receita) as gasto_total,
+        SUM(d.receita_quadrados) as gasto_quadrados,
+        MAX(d.maior_pedido) as maior_pedido,
+        MIN(d.menor_pedido) as menor_pedido,
+        MIN(d.primeiro_pedido_em) as primeiro_pedido_em,
+        MAX(d.ultimo_pedido_em) as ultimo_pedido_em,
+        MAX(d.ultima_atualizacao) as ultima_atualizacao
+    FROM clientes_afetados ca
+    LEFT JOIN dias_na_janela d ON d.cliente_id = ca.cliente_id
+    GROUP BY ca.cliente_id
+)
+
+-- Clientes sem pedidos na janela voltam com pedidos_periodo = 0: substituem a
+-- linha antiga e são removidos pelo post_hook
+SELECT 
+    cliente_id,
+    pedidos_periodo,
+    gasto_total,
+    gasto_total / NULLIF(pedidos_periodo, 0) as ticket_medio_cliente,
+    maior_pedido,
+    menor_pedido,
+    CASE 
+        WHEN pedidos_periodo > 1 THEN
+            SQRT(GREATEST(
+                (pedidos_periodo * gasto_quadrados - gasto_total * gasto_total)
+                / (pedidos_periodo * (pedidos_periodo - 1)),
+                0
+            ))
+    END as variacao_ticket,
+    EXTRACT(DAYS FROM (ultimo_pedido_em - primeiro_pedido_em)) / NULLIF(pedidos_periodo - 1, 0) as dias_entre_compras,
+    primeiro_pedido_em,
+    ultimo_pedido_em,
+    ultima_atualizacao
+FROM agregados
@@ -0,0 +1,103 @@
+-- Modelo Gold: Matriz de coorte (mes_aquisicao x mes_atividade), estado incremental de gold_analise_coorte
+-- Cada execução recalcula inteiros apenas os meses de atividade afetados:
+--   1. meses com pedidos novos ou alterados
+--   2. todos os meses de atividade dos clientes cuja coorte mudou (gold_coorte_clientes)
+--   3. os meses anteriores dos pedidos alterados (fct_pedidos_anteriores), que
+--      podem ter perdido o pedido (mudança de data ou de cliente, ou pedido
+--      removido de fct_pedidos)
+-- O delete+insert por mes_atividade também remove as células da coorte antiga;
+-- os meses que ficaram sem atividade voltam com ultima_atualizacao nula e são
+-- removidos por remover_grupos_vazios.
+
+{{ config(
+    materialized='incremental',
+    unique_key='mes_atividade',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['mes_atividade']},
+        {'columns': ['mes_aquisicao']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'analytics', 'cohort']
+) }}
+
+{% if is_incremental() %}
+WITH meses_afetados AS (
+    SELECT DISTINCT DATE_TRUNC('month', data_pedido) as mes
+    FROM {{ ref('fct_pedidos') }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    
+    UNION
+    
+    SELECT DISTINCT DATE_TRUNC('month', p.data_pedido)
+    FROM {{ ref('gold_coorte_clientes') }} c
+    INNER JOIN {{ ref('fct_pedidos') }} p ON p.cliente_id = c.cliente_id
+    WHERE c.coorte_alterada_em > {{ incremental_watermark('ultima_atualizacao') }}
+
+    UNION
+
+    SELECT DATE_TRUNC('month', data_pedido)
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'data_pedido') }}) a (data_pedido)
+    WHERE data_pedido IS NOT NULL
+),
+
+atividade_mensal AS (
+    -- Faixas de data_pedido por mês afetado: usa o índice de data_pedido
+    SELECT 
+        p.cliente_id,
+        m.mes as mes_atividade,
+        SUM(p.valor_liquido) as receita_mes,
+        COUNT(*) as pedidos_mes,
+        MAX(p.updated_at) as ultima_atualizacao
+    FROM meses_afetados m
+    INNER JOIN {{ ref('fct_pedidos') }} p
+        ON p.data_pedido >= m.mes
+       AND p.data_pedido < m.mes + INTERVAL '1 month'
+    GROUP BY p.cliente_id, m.mes
+),
+{% else %}
+WITH atividade_mensal AS (
+    SELECT 
+        p.cliente_id,
+        DATE_TRUNC('month', p.data_pedido) as mes_atividade,
+        SUM(p.valor_liquido) as receita_mes,
+        COUNT(*) as pedidos_mes,
+        MAX(p.updated_at) as ultima_atualizacao
+    FROM {{ ref('fct_pedidos') }} p
+    GROUP BY p.cliente_id, DATE_TRUNC('month', p.data_pedido)
+),
+{% endif %}
+
+celulas AS (
+    SELECT 
+        c.mes_aquisicao,
+        am.mes_atividade,
+
+        -- Período desde aquisição (em meses)
+        EXTRACT(YEAR FROM am.mes_atividade) * 12 + EXTRACT(MONTH FROM am.mes_atividade) -
+        (EXTRACT(YEAR FROM c.mes_aquisicao) * 12 + EXTRACT(MONTH FROM c.mes_aquisicao)) as periodo_desde_aquisicao,
+
+        COUNT(DISTINCT c.cliente_id) as clientes_ativos,
+        SUM(am.receita_mes) as receita_periodo,
+        AVG(am.receita_mes) as receita_media_cliente,
+        COUNT(am.pedidos_mes) as total_pedidos,
+        MAX(am.ultima_atualizacao) as ultima_atualizacao
+
+    FROM {{ ref('gold_coorte_clientes') }} c
+    INNER JOIN atividade_mensal am ON c.cliente_id = am.cliente_id
+    WHERE am.mes_atividade >= c.mes_aquisicao
+    GROUP BY 
+        c.mes_aquisicao, 
+        am.mes_atividade
+)
+
+SELECT * FROM celulas
+{% if is_incremental() %}
+-- Meses afetados que ficaram sem atividade (removidos por remover_grupos_vazios)
+UNION ALL
+SELECT NULL, m.mes, NULL, 0, NULL, NULL, 0, NULL::timestamp
+FROM meses_afetados m
+WHERE m.mes IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM celulas c WHERE c.mes_atividade = m.mes)
+{% endif %}
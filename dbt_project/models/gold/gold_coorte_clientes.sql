@@ -0,0 +1,77 @@
+-- Modelo Gold: Coorte de aquisição de cada cliente (estado incremental de gold_analise_coorte)
+-- Recalcula a primeira compra só dos clientes com pedidos novos ou alterados e
+-- registra em coorte_alterada_em quando a coorte do cliente mudou, para que
+-- gold_coorte_celulas recalcule os meses de atividade desses clientes. Também
+-- são recalculados os clientes anteriores dos pedidos alterados
+-- (fct_pedidos_anteriores); os que ficaram sem pedidos são removidos.
+
+{{ config(
+    materialized='incremental',
+    unique_key='cliente_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['cliente_id'], 'unique': True},
+        {'columns': ['coorte_alterada_em']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'analytics', 'cohort']
+) }}
+
+WITH
+{% if is_incremental() %}
+clientes_alterados AS (
+    SELECT cliente_id
+    FROM {{ ref('fct_pedidos') }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    UNION
+    SELECT cliente_id
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'cliente_id') }}) a (cliente_id)
+),
+{% endif %}
+
+pedidos AS (
+    SELECT
+        cliente_id,
+        data_pedido,
+        updated_at
+    FROM {{ ref('fct_pedidos') }}
+    {% if is_incremental() %}
+    -- Todos os pedidos dos clientes com algum pedido novo/alterado
+    WHERE cliente_id IN (SELECT cliente_id FROM clientes_alterados)
+    {% endif %}
+),
+
+clientes_primeira_compra AS (
+    SELECT 
+        cliente_id,
+        MIN(data_pedido) as primeira_compra,
+        DATE_TRUNC('month', MIN(data_pedido)) as mes_aquisicao,
+        MAX(updated_at) as ultima_atualizacao
+    FROM pedidos
+    GROUP BY cliente_id
+)
+
+SELECT
+    cpc.cliente_id,
+    cpc.primeira_compra,
+    cpc.mes_aquisicao,
+    cpc.ultima_atualizacao,
+    {% if is_incremental() %}
+    CASE
+        WHEN anterior.mes_aquisicao IS NOT DISTINCT FROM cpc.mes_aquisicao THEN anterior.coorte_alterada_em
+        ELSE cpc.ultima_atualizacao
+    END as coorte_alterada_em
+    {% else %}
+    cpc.ultima_atualizacao as coorte_alterada_em
+    {% endif %}
+FROM clientes_primeira_compra cpc
+{% if is_incremental() %}
+LEFT JOIN {{ this }} anterior ON anterior.cliente_id = cpc.cliente_id
+-- Clientes que ficaram sem pedidos (removidos por remover_grupos_vazios)
+UNION ALL
+SELECT a.cliente_id, NULL, NULL, NULL::timestamp, NULL
+FROM clientes_alterados a
+WHERE a.cliente_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM pedidos p WHERE p.cliente_id = a.cliente_id)
+{% endif %}
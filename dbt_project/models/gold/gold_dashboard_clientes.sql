@@ -0,0 +1,64 @@
+-- Modelo Gold: Receita por cliente do dashboard
+-- Uma linha por cliente com pedidos; só os clientes com pedidos novos/alterados
+-- ou com cadastro alterado são recalculados, junto com os clientes anteriores
+-- desses pedidos (fct_pedidos_anteriores). O ranking "Top 10 Clientes" lê
+-- as 10 primeiras linhas pelo índice de receita_total.
+
+{{ config(
+    materialized='incremental',
+    unique_key='cliente_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['cliente_id'], 'unique': True},
+        {'columns': ['receita_total']},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'dashboard']
+) }}
+
+WITH
+{% if is_incremental() %}
+clientes_alterados AS (
+    SELECT cliente_id
+    FROM {{ ref('fct_pedidos') }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    UNION
+    SELECT id
+    FROM {{ ref('bronze_clientes') }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    UNION
+    SELECT cliente_id
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'cliente_id') }}) a (cliente_id)
+),
+{% endif %}
+
+pedidos AS (
+    SELECT
+        cliente_id,
+        valor_bruto,
+        updated_at
+    FROM {{ ref('fct_pedidos') }}
+    {% if is_incremental() %}
+    WHERE cliente_id IN (SELECT cliente_id FROM clientes_alterados)
+    {% endif %}
+)
+
+SELECT
+    p.cliente_id,
+    c.nome,
+    COUNT(*) as total_pedidos,
+    SUM(p.valor_bruto) as receita_total,
+    GREATEST(MAX(p.updated_at), MAX(c.updated_at)) as ultima_atualizacao
+FROM pedidos p
+LEFT JOIN {{ ref('bronze_clientes') }} c ON c.id = p.cliente_id
+GROUP BY p.cliente_id, c.nome
+{% if is_incremental() %}
+-- Clientes que ficaram sem pedidos (removidos por remover_grupos_vazios)
+UNION ALL
+SELECT a.cliente_id, NULL, 0, 0, NULL::timestamp
+FROM clientes_alterados a
+WHERE a.cliente_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM pedidos p WHERE p.cliente_id = a.cliente_id)
+{% endif %}
@@ -0,0 +1,16 @@
+-- Modelo Gold: KPIs do dashboard
+-- Uma única linha com os totais do cabeçalho do dashboard. Pedidos e receita
+-- saem das linhas diárias de gold_dashboard_vendas_diarias (uma por dia, não
+-- uma por pedido); o dashboard lê só esta linha.
+
+{{ config(
+    tags=['gold', 'dashboard']
+) }}
+
+SELECT
+    (SELECT COUNT(*) FROM {{ ref('dim_clientes') }}) as total_clientes,
+    COALESCE(SUM(total_pedidos), 0) as total_pedidos,
+    COALESCE(SUM(receita_bruta), 0) as receita_total,
+    COALESCE(SUM(receita_bruta) / NULLIF(SUM(total_pedidos), 0), 0) as ticket_medio,
+    MAX(ultima_atualizacao) as atualizado_ate
+FROM {{ ref('gold_dashboard_vendas_diarias') }}
@@ -0,0 +1,51 @@
+-- Modelo Gold: Vendas por produto do dashboard
+-- Uma linha por produto vendido, a partir dos itens dos pedidos (e não do texto
+-- de observacoes); só os produtos com itens novos/alterados ou com cadastro
+-- alterado são recalculados. O ranking "Top 10 Produtos" lê as 10 primeiras
+-- linhas pelo índice de receita_total.
+
+{{ config(
+    materialized='incremental',
+    unique_key='produto_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['produto_id'], 'unique': True},
+        {'columns': ['receita_total']},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    tags=['gold', 'dashboard']
+) }}
+
+WITH itens AS (
+    SELECT
+        produto_id,
+        pedido_id,
+        quantidade,
+        valor_total,
+        updated_at
+    FROM {{ ref('bronze_itens_pedidos') }}
+    {% if is_incremental() %}
+    WHERE produto_id IN (
+        SELECT produto_id
+        FROM {{ ref('bronze_itens_pedidos') }}
+        WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+        UNION
+        SELECT id
+        FROM {{ ref('bronze_produtos') }}
+        WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    )
+    {% endif %}
+)
+
+SELECT
+    i.produto_id,
+    pr.nome as produto,
+    pr.categoria,
+    COUNT(DISTINCT i.pedido_id) as total_vendas,
+    SUM(i.quantidade) as unidades_vendidas,
+    SUM(i.valor_total) as receita_total,
+    GREATEST(MAX(i.updated_at), MAX(pr.updated_at)) as ultima_atualizacao
+FROM itens i
+LEFT JOIN {{ ref('bronze_produtos') }} pr ON pr.id = i.produto_id
+GROUP BY i.produto_id, pr.nome, pr.categoria
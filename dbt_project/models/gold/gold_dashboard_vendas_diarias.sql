@@ -0,0 +1,22 @@
+-- Modelo Gold: Vendas diárias do dashboard
+-- Uma linha por dia com pedidos e receita de todo o histórico, pela mesma macro
+-- dos rollups por hora e por minuto (rollup_vendas). Só os dias com
+-- pedidos novos ou alterados desde a última execução são recalculados (também
+-- os dias em que esses pedidos estavam antes, de fct_pedidos_anteriores); o gráfico
+-- de evolução e os totais de gold_dashboard_kpis leem estas linhas em vez de
+-- agregar public.pedidos a cada atualização do dashboard.
+
+{{ config(
+    materialized='incremental',
+    unique_key='data_venda',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['data_venda'], 'unique': True},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'dashboard']
+) }}
+
+{{ rollup_vendas(ref('fct_pedidos'), 'day', 'data_venda', 'date') }}
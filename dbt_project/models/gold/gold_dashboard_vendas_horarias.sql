@@ -0,0 +1,19 @@
+-- Modelo Gold: Vendas por hora do dashboard
+-- Uma linha por hora com pedidos e receita de todo o histórico, para o gráfico
+-- de evolução em resolução horária (scripts/series_temporais.py). Só as horas
+-- com pedidos novos ou alterados são recalculadas.
+
+{{ config(
+    materialized='incremental',
+    unique_key='hora_venda',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['hora_venda'], 'unique': True},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'dashboard']
+) }}
+
+{{ rollup_vendas(ref('fct_pedidos'), 'hour', 'hora_venda') }}
@@ -0,0 +1,19 @@
+-- Modelo Gold: Vendas por minuto do dashboard
+-- Uma linha por minuto com pedidos, para o gráfico de evolução em resolução de
+-- minuto (scripts/series_temporais.py), usada em períodos curtos. Só os minutos
+-- com pedidos novos ou alterados são recalculados.
+
+{{ config(
+    materialized='incremental',
+    unique_key='minuto_venda',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['minuto_venda'], 'unique': True},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    post_hook=remover_grupos_vazios(),
+    tags=['gold', 'dashboard']
+) }}
+
+{{ rollup_vendas(ref('fct_pedidos'), 'minute', 'minuto_venda') }}
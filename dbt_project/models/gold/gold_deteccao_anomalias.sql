@@ -4,23 +4,25 @@
 {{ config(
     materialized='table',
     tags=['gold', 'analytics', 'anomaly_detection', 'monitoring'],
-    post_hook=[
-        "CREATE INDEX IF NOT EXISTS idx_anomalias_data ON {{ this }} (data_analise)",
-        "CREATE INDEX IF NOT EXISTS idx_anomalias_tipo ON {{ this }} (tipo_anomalia)",
-        "CREATE INDEX IF NOT EXISTS idx_anomalias_severidade ON {{ this }} (severidade)"
+    indexes=[
+        {'columns': ['data_analise']},
+        {'columns': ['tipo_anomalia']},
+        {'columns': ['severidade']}
     ]
 ) }}
 
+-- Os agregados diários e por cliente da janela são mantidos incrementalmente
+-- (gold_vendas_diarias, gold_comportamento_clientes_janela): este modelo não lê
+-- fct_pedidos, só as ~90 linhas diárias e o estado por cliente.
 WITH vendas_diarias AS (
     SELECT 
-        DATE(data_pedido) as data_venda,
-        COUNT(*) as total_pedidos,
-        SUM(valor_liquido) as receita_total,
-        AVG(valor_liquido) as ticket_medio,
-        COUNT(DISTINCT cliente_id) as clientes_unicos
-    FROM {{ ref('fct_pedidos') }}
-    WHERE data_pedido >= CURRENT_DATE - INTERVAL '90 days'
-    GROUP BY DATE(data_pedido)
+        data_venda,
+        total_pedidos,
+        receita_total,
+        ticket_medio,
+        clientes_unicos
+    FROM {{ ref('gold_vendas_diarias') }}
+    WHERE data_venda >= CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}
 ),
 
 metricas_estatisticas AS (
@@ -103,22 +105,20 @@ anomalias_vendas AS (
 comportamento_clientes AS (
     SELECT 
         cliente_id,
-        COUNT(*) as pedidos_periodo,
-        SUM(valor_liquido) as gasto_total,
-        AVG(valor_liquido) as ticket_medio_cliente,
-        MAX(valor_liquido) as maior_pedido,
-        MIN(valor_liquido) as menor_pedido,
+        pedidos_periodo,
+        gasto_total,
+        ticket_medio_cliente,
+        maior_pedido,
+        menor_pedido,
         
         -- Variação no comportamento
-        STDDEV(valor_liquido) as variacao_ticket,
+        variacao_ticket,
         
         -- Frequência de compra
-        EXTRACT(DAYS FROM (MAX(data_pedido) - MIN(data_pedido))) / NULLIF(COUNT(*) - 1, 0) as dias_entre_compras
+        dias_entre_compras
         
-    FROM {{ ref('fct_pedidos') }}
-    WHERE data_pedido >= CURRENT_DATE - INTERVAL '90 days'
-    GROUP BY cliente_id
-    HAVING COUNT(*) >= 2 -- Apenas clientes com múltiplos pedidos
+    FROM {{ ref('gold_comportamento_clientes_janela') }}
+    WHERE pedidos_periodo >= 2 -- Apenas clientes com múltiplos pedidos
 ),
 
 anomalias_clientes AS (
@@ -0,0 +1,70 @@
+-- Modelo Gold: Agregados diários por cliente da janela de detecção de anomalias
+-- Estado incremental de gold_deteccao_anomalias: contagens, somas e somas de
+-- quadrados por (dia, cliente). Cada execução recalcula só os dias com pedidos
+-- novos ou alterados e os dias anteriores desses pedidos (fct_pedidos_anteriores);
+-- os dias que saem da janela ou ficam sem pedidos são removidos nos post_hooks.
+
+{{ config(
+    materialized='incremental',
+    unique_key='data_venda',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['data_venda']},
+        {'columns': ['cliente_id']},
+        {'columns': ['ultima_atualizacao']}
+    ],
+    tags=['gold', 'analytics', 'anomaly_detection'],
+    post_hook=[
+        "DELETE FROM {{ this }} WHERE data_venda < CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}"
+    ] + remover_grupos_vazios()
+) }}
+
+WITH
+{% if is_incremental() %}
+dias_alterados AS (
+    SELECT DISTINCT DATE(data_pedido) as dia
+    FROM {{ ref('fct_pedidos') }}
+    WHERE updated_at > {{ incremental_watermark('ultima_atualizacao') }}
+    UNION
+    SELECT DATE(data_pedido)
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'data_pedido') }}) a (data_pedido)
+    WHERE data_pedido IS NOT NULL
+),
+{% endif %}
+
+pedidos AS (
+    SELECT
+        cliente_id,
+        data_pedido,
+        valor_liquido,
+        updated_at
+    FROM {{ ref('fct_pedidos') }}
+    WHERE data_pedido >= CURRENT_DATE - INTERVAL '{{ var("janela_anomalias_dias", 90) }} days'
+    {% if is_incremental() %}
+      -- Só os dias alterados, recalculados por inteiro (todos os clientes do dia)
+      AND DATE(data_pedido) IN (SELECT dia FROM dias_alterados)
+    {% endif %}
+)
+
+SELECT 
+    DATE(data_pedido) as data_venda,
+    cliente_id,
+    COUNT(*) as pedidos,
+    SUM(valor_liquido) as receita,
+    SUM(valor_liquido * valor_liquido) as receita_quadrados,
+    MAX(valor_liquido) as maior_pedido,
+    MIN(valor_liquido) as menor_pedido,
+    MIN(data_pedido) as primeiro_pedido_em,
+    MAX(data_pedido) as ultimo_pedido_em,
+    MAX(updated_at) as ultima_atualizacao
+FROM pedidos
+GROUP BY DATE(data_pedido), cliente_id
+{% if is_incremental() %}
+-- Dias da janela que ficaram sem pedidos (removidos por remover_grupos_vazios)
+UNION ALL
+SELECT d.dia, NULL, 0, 0, 0, NULL, NULL, NULL, NULL, NULL::timestamp
+FROM dias_alterados d
+WHERE d.dia >= CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}
+  AND NOT EXISTS (SELECT 1 FROM pedidos p WHERE DATE(p.data_pedido) = d.dia)
+{% endif %}
@@ -0,0 +1,57 @@
+-- Modelo Gold: Totais diários da janela de detecção de anomalias
+-- Uma linha por dia, derivada de gold_vendas_clientes_diarias; só os dias
+-- alterados desde a última execução (e os dias anteriores dos pedidos
+-- alterados, de fct_pedidos_anteriores) são recalculados; os que ficaram sem
+-- pedidos são removidos por remover_grupos_vazios. As estatísticas da
+-- janela (média, desvio, quartis) saem destas ~90 linhas, não dos pedidos.
+
+{{ config(
+    materialized='incremental',
+    unique_key='data_venda',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['data_venda'], 'unique': True}
+    ],
+    tags=['gold', 'analytics', 'anomaly_detection'],
+    post_hook=[
+        "DELETE FROM {{ this }} WHERE data_venda < CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}"
+    ] + remover_grupos_vazios()
+) }}
+
+{% if is_incremental() %}
+WITH dias_alterados AS (
+    SELECT DISTINCT data_venda as dia
+    FROM {{ ref('gold_vendas_clientes_diarias') }}
+    WHERE ultima_atualizacao > {{ incremental_watermark('ultima_atualizacao') }}
+    UNION
+    SELECT DATE(data_pedido)
+    FROM ({{ chaves_anteriores(ref('fct_pedidos'), 'data_pedido') }}) a (data_pedido)
+    WHERE data_pedido IS NOT NULL
+)
+{% endif %}
+
+SELECT 
+    data_venda,
+    SUM(pedidos) as total_pedidos,
+    SUM(receita) as receita_total,
+    SUM(receita) / SUM(pedidos) as ticket_medio,
+    -- Uma linha por cliente e dia; a linha dos pedidos sem cliente não conta
+    COUNT(cliente_id) as clientes_unicos,
+    MAX(ultima_atualizacao) as ultima_atualizacao
+FROM {{ ref('gold_vendas_clientes_diarias') }}
+WHERE data_venda >= CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}
+{% if is_incremental() %}
+  AND data_venda IN (SELECT dia FROM dias_alterados)
+{% endif %}
+GROUP BY data_venda
+{% if is_incremental() %}
+-- Dias da janela que ficaram sem pedidos (removidos por remover_grupos_vazios)
+UNION ALL
+SELECT d.dia, 0, 0, NULL, 0, NULL::timestamp
+FROM dias_alterados d
+WHERE d.dia >= CURRENT_DATE - {{ var('janela_anomalias_dias', 90) }}
+  AND NOT EXISTS (
+      SELECT 1 FROM {{ ref('gold_vendas_clientes_diarias') }} v WHERE v.data_venda = d.dia
+  )
+{% endif %}
@@ -3,6 +3,12 @@
 -- Este modelo de agregação fornece uma visão geral dos clientes,
 -- combinando informações da camada silver de clientes e pedidos.
 
+{{ config(
+    indexes=[
+        {'columns': ['cliente_id_origem']}
+    ]
+) }}
+
 WITH silver_clientes AS (
     SELECT
         cliente_id_origem,
@@ -1,8 +1,19 @@
 -- models/silver/dim_clientes.sql
 -- Este modelo cria a dimensão de clientes, limpando e transformando os dados de bronze_clientes.
+-- Incremental: cada execução reprocessa só os clientes alterados desde a última
+-- carga; `dbt run --full-refresh` reconstrói tudo. Exclusões físicas na origem
+-- não deixam linha alterada para a marca d'água: só são refletidas com
+-- --full-refresh.
 
 {{ config(
-    materialized='table',
+    materialized='incremental',
+    unique_key='cliente_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['cliente_id'], 'unique': True},
+        {'columns': ['updated_at']}
+    ],
     tags=['silver', 'dimension']
 ) }}
 
@@ -48,3 +59,16 @@ SELECT
     END as categoria_credito
 FROM {{ ref('bronze_clientes') }}
 WHERE nome IS NOT NULL
+{% if is_incremental() %}
+  AND (
+    updated_at > {{ incremental_watermark() }}
+    -- categoria_cliente depende de CURRENT_DATE: reprocessa quem mudou de faixa
+    -- desde a última carga, mesmo sem alteração na origem
+    OR id IN (
+        SELECT cliente_id
+        FROM {{ this }}
+        WHERE (categoria_cliente = 'Novo' AND data_cadastro < CURRENT_DATE - INTERVAL '30 days')
+           OR (categoria_cliente = 'Recente' AND data_cadastro < CURRENT_DATE - INTERVAL '365 days')
+    )
+  )
+{% endif %}
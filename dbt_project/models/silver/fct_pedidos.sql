@@ -1,9 +1,30 @@
 -- models/silver/fct_pedidos.sql
 -- Este modelo cria a tabela de fatos para pedidos, transformando dados de bronze_pedidos
 -- e juntando com dimensões como bronze_clientes.
+-- Incremental: cada execução reprocessa só os pedidos alterados (ou cujo cliente
+-- foi alterado) desde a última carga; `dbt run --full-refresh` reconstrói tudo.
+-- Particionada por mês de data_pedido (macros/particionamento.sql): a carga
+-- incremental grava só nas partições dos meses alterados e os filtros por data
+-- dos modelos gold leem só as partições do período. Pedidos alterados que
+-- deixaram de passar na validação (valor_bruto > 0) são removidos antes da
+-- carga (remover_reprovados); a data e o cliente anteriores dos pedidos
+-- alterados ficam em fct_pedidos_anteriores para os agregados gold.
+-- Exclusões físicas na origem não deixam linha alterada para a marca d'água:
+-- só são refletidas com --full-refresh (deste modelo e dos agregados gold
+-- incrementais que leem dele).
 
 {{ config(
-    materialized='table',
+    materialized='incremental_particionado',
+    partition_by='data_pedido',
+    unique_key='pedido_id',
+    indexes=[
+        {'columns': ['pedido_id', 'data_pedido'], 'unique': True},
+        {'columns': ['updated_at']},
+        {'columns': ['cliente_id']},
+        {'columns': ['data_pedido']}
+    ],
+    pre_hook=registrar_anteriores('raw_data', 'pedidos', 'pedido_id', ['data_pedido', 'cliente_id'])
+        + remover_reprovados('raw_data', 'pedidos', 'valor_bruto > 0', 'pedido_id'),
     tags=['silver', 'fact']
 ) }}
 
@@ -27,6 +48,16 @@ WITH bronze_pedidos AS (
         data_entrega_real,
         updated_at
     FROM {{ ref('bronze_pedidos') }}
+    {% if is_incremental() %}
+    -- Pedidos novos/alterados (idx_pedidos_updated_at) e pedidos de clientes
+    -- alterados, já que nome_cliente e tipo_cliente vêm de bronze_clientes
+    WHERE updated_at > {{ incremental_watermark() }}
+       OR cliente_id IN (
+           SELECT id
+           FROM {{ ref('bronze_clientes') }}
+           WHERE updated_at > {{ incremental_watermark() }}
+       )
+    {% endif %}
 ),
 
 bronze_clientes AS (
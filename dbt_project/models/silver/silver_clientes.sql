@@ -5,7 +5,10 @@
 
 {{ config(
     tags=["silver"],
-    materialized='table'
+    materialized='table',
+    indexes=[
+        {'columns': ['cliente_id_origem']}
+    ]
 ) }}
 
 WITH bronze_clientes AS (
@@ -5,7 +5,10 @@
 
 {{ config(
     tags=["silver", "leads", "crm"],
-    materialized='table'
+    materialized='table',
+    indexes=[
+        {'columns': ['lead_id_origem']}
+    ]
 ) }}
 
 WITH bronze_leads AS (
@@ -5,7 +5,11 @@
 
 {{ config(
     tags=["silver"],
-    materialized='table'
+    materialized='table',
+    indexes=[
+        {'columns': ['pedido_id_origem']},
+        {'columns': ['cliente_id_origem']}
+    ]
 ) }}
 
 WITH bronze_pedidos AS (
@@ -1,11 +1,18 @@
 -- Modelo Incremental Avançado para Pedidos
 -- Demonstra capacidades de merge inteligente e detecção de mudanças
+-- bronze_pedidos só traz valor_bruto > 0: pedidos alterados que deixaram de
+-- passar são removidos antes da carga (remover_reprovados). Exclusões físicas
+-- na origem só são refletidas com --full-refresh.
 
 {{ config(
-    materialized='incremental',
+    materialized='incremental_particionado',
+    partition_by='data_pedido',
     unique_key='pedido_id',
-    incremental_strategy='append',
-    on_schema_change='sync_all_columns',
+    indexes=[
+        {'columns': ['pedido_id', 'data_pedido'], 'unique': True},
+        {'columns': ['updated_at']}
+    ],
+    pre_hook=remover_reprovados('raw_data', 'pedidos', 'valor_bruto > 0', 'pedido_id'),
     tags=['silver', 'incremental', 'fact']
 ) }}
 
@@ -26,18 +33,24 @@ WITH source_data AS (
     FROM {{ ref('bronze_pedidos') }}
     
     {% if is_incremental() %}
-        -- Estratégia híbrida: novos registros + registros modificados
-        WHERE updated_at > (SELECT MAX(updated_at) FROM {{ this }})
-           OR id IN (
-               -- Detectar registros que mudaram comparando hash
-               SELECT DISTINCT b.id
-               FROM {{ ref('bronze_pedidos') }} b
-               INNER JOIN {{ this }} t ON b.id = t.pedido_id
-               WHERE {{ generate_row_hash(['b.status', 'b.valor_liquido', 'b.desconto']) }} != t.row_hash
-           )
+        -- Janela de mudanças: só o que passou da marca d'água (com recuo),
+        -- resolvido pelo índice idx_pedidos_updated_at da origem
+        WHERE updated_at > {{ incremental_watermark() }}
     {% endif %}
 ),
 
+{% if is_incremental() %}
+changed_data AS (
+    -- Dentro da janela, mantém os pedidos novos e os que mudaram de fato
+    -- (hash diferente); a busca em {{ this }} usa o índice de pedido_id
+    SELECT s.*
+    FROM source_data s
+    LEFT JOIN {{ this }} t ON t.pedido_id = s.pedido_id
+    WHERE t.pedido_id IS NULL
+       OR t.row_hash != s.row_hash
+),
+{% endif %}
+
 enriched_data AS (
     SELECT 
         s.*,
@@ -59,14 +72,17 @@ enriched_data AS (
         CASE WHEN valor_liquido > 1000 THEN true ELSE false END as is_high_value,
         CASE WHEN data_pedido = CURRENT_DATE THEN true ELSE false END as is_today
         
-    FROM source_data s
+    FROM {% if is_incremental() %}changed_data{% else %}source_data{% endif %} s
 )
 
 SELECT * FROM enriched_data
 
 -- Adicionar comentário sobre a estratégia incremental
 -- Este modelo usa uma abordagem híbrida que:
--- 1. Captura novos registros baseado em updated_at
--- 2. Detecta mudanças em registros existentes usando hash
--- 3. Aplica merge inteligente apenas nas colunas que podem mudar
--- 4. Inclui validações de qualidade de dados em tempo real
\ No newline at end of file
+-- 1. Limita a leitura à janela updated_at > marca d'água - recuo (incremental_watermark)
+-- 2. Dentro da janela, detecta mudanças em registros existentes usando hash
+-- 3. Faz upsert por pedido_id (delete+insert: o Postgres 13 da origem não tem MERGE),
+--    então um pedido alterado substitui a linha anterior em vez de duplicá-la
+-- 4. Particiona a tabela por mês de data_pedido (incremental_particionado), então
+--    cada carga grava só nas partições dos meses dos pedidos alterados
+-- 5. Inclui validações de qualidade de dados em tempo real
\ No newline at end of file
@@ -5,7 +5,10 @@
 
 {{ config(
     tags=["silver", "produtos", "ecommerce"],
-    materialized='table'
+    materialized='table',
+    indexes=[
+        {'columns': ['produto_id_origem']}
+    ]
 ) }}
 
 WITH bronze_produtos AS (
@@ -0,0 +1,182 @@
+-- Teste de regressão: as métricas de gold_metricas_avancadas_clientes (macro
+-- metricas_avancadas_clientes, nos modos passada única e histórico materializado)
+-- devem ser as mesmas da formulação original em duas passadas, reproduzida abaixo.
+-- Roda as três sobre o fixture de seeds/fixtures (datas relativas a CURRENT_DATE:
+-- janelas de 30/90/180/365 dias, cliente com um pedido, pedidos no mesmo dia,
+-- empates no NTILE, cliente sem pedidos e pedidos de cliente fora de dim_clientes)
+-- e retorna as linhas que divergem em qualquer um dos lados.
+-- O modo histórico materializado roda duas vezes: com o histórico reconstruído
+-- e com o histórico atualizado como numa carga incremental a partir do estado
+-- anterior do fixture (cliente_id_anterior: pedido que mudou de cliente,
+-- deixando o cliente anterior sem pedidos).
+
+{{ config(tags=['regression']) }}
+
+WITH fixture AS (
+    SELECT
+        pedido_id,
+        cliente_id,
+        cliente_id_anterior,
+        CURRENT_DATE - dias_atras * INTERVAL '1 day' + hora * INTERVAL '1 hour' as data_pedido,
+        valor_liquido,
+        CURRENT_TIMESTAMP as updated_at
+    FROM {{ ref('fixture_metricas_pedidos') }}
+),
+
+pedidos_fixture AS (
+    SELECT pedido_id, cliente_id, data_pedido, valor_liquido, updated_at
+    FROM fixture
+),
+
+pedidos_antes AS (
+    SELECT pedido_id, COALESCE(cliente_id_anterior, cliente_id) as cliente_id, data_pedido, valor_liquido, updated_at
+    FROM fixture
+),
+
+clientes_fixture AS (
+    SELECT * FROM {{ ref('fixture_metricas_clientes') }}
+),
+
+historico_fixture AS (
+    {{ agregados_historicos_clientes('pedidos_fixture') }}
+),
+
+-- Carga incremental simulada: clientes atuais e anteriores dos pedidos alterados
+-- recalculados sobre o histórico do estado anterior (delete+insert e remoção
+-- dos clientes sem pedidos, como em gold_clientes_pedidos_historico)
+historico_antes AS (
+    {{ agregados_historicos_clientes('pedidos_antes') }}
+),
+
+clientes_alterados_fixture AS (
+    SELECT cliente_id FROM fixture WHERE cliente_id_anterior IS NOT NULL
+    UNION
+    SELECT cliente_id_anterior FROM fixture WHERE cliente_id_anterior IS NOT NULL
+),
+
+historico_incremental AS (
+    SELECT *
+    FROM historico_antes
+    WHERE cliente_id NOT IN (SELECT cliente_id FROM clientes_alterados_fixture)
+    UNION ALL
+    SELECT *
+    FROM ({{ historico_clientes_alterados('pedidos_fixture', 'clientes_alterados_fixture') }}) h
+    WHERE ultima_atualizacao IS NOT NULL
+),
+
+pedidos_agregados AS (
+    SELECT 
+        cliente_id,
+        COUNT(*) as total_pedidos,
+        SUM(valor_liquido) as receita_total,
+        AVG(valor_liquido) as ticket_medio,
+        MIN(data_pedido) as primeira_compra,
+        MAX(data_pedido) as ultima_compra,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN 1 END) as pedidos_30d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN 1 END) as pedidos_90d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '365 days' THEN 1 END) as pedidos_12m,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN valor_liquido ELSE 0 END) as receita_30d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN valor_liquido ELSE 0 END) as receita_90d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '365 days' THEN valor_liquido ELSE 0 END) as receita_12m
+    FROM pedidos_fixture
+    GROUP BY cliente_id
+),
+
+metricas_comportamentais AS (
+    SELECT 
+        p.cliente_id,
+        CASE 
+            WHEN pa.total_pedidos = 0 THEN 0
+            ELSE EXTRACT(DAYS FROM (pa.ultima_compra - pa.primeira_compra)) / NULLIF(pa.total_pedidos - 1, 0)
+        END as dias_entre_compras,
+        EXTRACT(DAYS FROM (CURRENT_DATE - pa.ultima_compra)) as dias_desde_ultima_compra,
+        COALESCE(
+            (SUM(CASE WHEN p.data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN p.valor_liquido ELSE 0 END) -
+         SUM(CASE WHEN p.data_pedido >= CURRENT_DATE - INTERVAL '180 days' 
+                   AND p.data_pedido < CURRENT_DATE - INTERVAL '90 days' 
+                   THEN p.valor_liquido ELSE 0 END)) /
+        NULLIF(SUM(CASE WHEN p.data_pedido >= CURRENT_DATE - INTERVAL '180 days' 
+                        AND p.data_pedido < CURRENT_DATE - INTERVAL '90 days' 
+                        THEN p.valor_liquido ELSE 0 END), 0), 0
+        ) as tendencia_crescimento,
+        MODE() WITHIN GROUP (ORDER BY EXTRACT(MONTH FROM p.data_pedido)) as mes_preferido
+    FROM pedidos_fixture p
+    INNER JOIN pedidos_agregados pa ON p.cliente_id = pa.cliente_id
+    GROUP BY p.cliente_id, pa.total_pedidos, pa.primeira_compra, pa.ultima_compra
+),
+
+referencia_rfm AS (
+    SELECT 
+        pa.cliente_id,
+        pa.total_pedidos,
+        pa.receita_total,
+        pa.ticket_medio,
+        pa.primeira_compra,
+        pa.ultima_compra,
+        pa.pedidos_30d,
+        pa.pedidos_90d,
+        pa.pedidos_12m,
+        pa.receita_30d,
+        pa.receita_90d,
+        pa.receita_12m,
+        COALESCE(mc.dias_entre_compras, 0) as dias_entre_compras,
+        mc.dias_desde_ultima_compra,
+        mc.tendencia_crescimento,
+        mc.mes_preferido,
+        NTILE(5) OVER (ORDER BY pa.total_pedidos, pa.cliente_id) as frequency_score,
+        NTILE(5) OVER (ORDER BY pa.receita_total, pa.cliente_id) as monetary_score
+    FROM pedidos_agregados pa
+    INNER JOIN metricas_comportamentais mc ON pa.cliente_id = mc.cliente_id
+),
+
+referencia AS (
+    -- O modelo só traz clientes presentes em dim_clientes (o NTILE é calculado antes do filtro)
+    SELECT *
+    FROM referencia_rfm
+    WHERE cliente_id IN (SELECT cliente_id FROM clientes_fixture)
+),
+
+{% set colunas %}
+        cliente_id,
+        total_pedidos,
+        receita_total,
+        ticket_medio,
+        primeira_compra,
+        ultima_compra,
+        pedidos_30d,
+        pedidos_90d,
+        pedidos_12m,
+        receita_30d,
+        receita_90d,
+        receita_12m,
+        dias_entre_compras,
+        dias_desde_ultima_compra,
+        tendencia_crescimento,
+        mes_preferido,
+        frequency_score,
+        monetary_score
+{% endset %}
+
+modelos AS (
+    SELECT 'passada_unica' as modo, {{ colunas }}
+    FROM ({{ metricas_avancadas_clientes('pedidos_fixture', 'clientes_fixture') }}) m
+    WHERE total_pedidos > 0
+    UNION ALL
+    SELECT 'historico_materializado', {{ colunas }}
+    FROM ({{ metricas_avancadas_clientes('pedidos_fixture', 'clientes_fixture', 'historico_fixture') }}) m
+    WHERE total_pedidos > 0
+    UNION ALL
+    SELECT 'historico_incremental', {{ colunas }}
+    FROM ({{ metricas_avancadas_clientes('pedidos_fixture', 'clientes_fixture', 'historico_incremental') }}) m
+    WHERE total_pedidos > 0
+),
+
+esperado AS (
+    SELECT m.modo, r.*
+    FROM referencia r
+    CROSS JOIN (VALUES ('passada_unica'), ('historico_materializado'), ('historico_incremental')) m (modo)
+)
+
+(SELECT 'so_na_referencia' as divergencia, * FROM esperado EXCEPT SELECT 'so_na_referencia', * FROM modelos)
+UNION ALL
+(SELECT 'so_no_modelo' as divergencia, * FROM modelos EXCEPT SELECT 'so_no_modelo', * FROM esperado)
@@ -221,6 +221,17 @@ CREATE INDEX IF NOT EXISTS idx_leads_status ON public.leads(status);
 CREATE INDEX IF NOT EXISTS idx_leads_campanha ON public.leads(campanha_id);
 CREATE INDEX IF NOT EXISTS idx_leads_updated_at ON public.leads(updated_at);
 
+-- Índices de updated_at para detecção de mudanças (scheduler com --trigger change)
+CREATE INDEX IF NOT EXISTS idx_itens_pedido_updated_at ON public.itens_pedido(updated_at);
+CREATE INDEX IF NOT EXISTS idx_campanhas_marketing_updated_at ON public.campanhas_marketing(updated_at);
+
+-- Itens por produto (gold_dashboard_produtos recalcula todos os itens dos produtos alterados)
+CREATE INDEX IF NOT EXISTS idx_itens_pedido_produto_id ON public.itens_pedido(produto_id);
+
+-- Estatísticas por consulta (shared_preload_libraries no docker-compose), lidas
+-- por scripts/consultor_indices.py
+CREATE EXTENSION IF NOT EXISTS pg_stat_statements;
+
 -- ============================================================================
 -- DADOS INICIAIS
 -- ============================================================================
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark da camada bronze: views sobre a origem x tabelas materializadas
+
+Para cada modo (var bronze_materializado false/true) o projeto é reconstruído
+com --full-refresh e depois são medidos:
+
+- ciclo incremental: `alteracoes` pedidos da origem são tocados (updated_at
+  avança pelo trigger) e o `dbt run` seguinte é cronometrado
+- carga na origem: leituras sequenciais/por índice nas tabelas transacionais
+  (deltas de pg_stat_user_tables) durante o ciclo
+- latência de consultas analíticas típicas sobre as relações bronze
+
+Uso:
+    python benchmark_bronze.py [--ciclos N] [--alteracoes N] [--repeticoes N] [--dbt-project-dir DIR]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+from dbt_backend import SubprocessBackend
+from detector_mudancas import SOURCE_DB_CONFIG, TABELAS_ORIGEM
+
+MODOS = {'view': False, 'tabela': True}
+
+# Consultas analíticas típicas dos modelos silver/gold, sobre as relações bronze
+CONSULTAS = {
+    'receita_mensal': """
+        SELECT DATE_TRUNC('month', data_pedido), COUNT(*), SUM(valor_liquido)
+        FROM {bronze_pedidos}
+        GROUP BY 1
+    """,
+    'pedidos_por_tipo_cliente': """
+        SELECT c.tipo_cliente, COUNT(*), AVG(p.valor_liquido)
+        FROM {bronze_pedidos} p
+        JOIN {bronze_clientes} c ON c.id = p.cliente_id
+        GROUP BY 1
+    """,
+    'receita_por_produto': """
+        SELECT pr.id, SUM(i.valor_total)
+        FROM {bronze_itens_pedidos} i
+        JOIN {bronze_produtos} pr ON pr.id = i.produto_id
+        GROUP BY 1
+    """,
+}
+
+CARGA_ORIGEM = """
+    SELECT COALESCE(SUM(seq_scan), 0), COALESCE(SUM(seq_tup_read), 0),
+           COALESCE(SUM(idx_scan), 0), COALESCE(SUM(idx_tup_fetch), 0)
+    FROM pg_stat_user_tables
+    WHERE schemaname = 'public' AND relname = ANY(%s)
+"""
+
+
+def relacoes_bronze(dbt_project_dir):
+    """{nome do modelo: relação} das relações bronze, pelo manifest.json"""
+    with open(Path(dbt_project_dir) / "target" / "manifest.json", encoding='utf-8') as f:
+        nos = json.load(f)['nodes'].values()
+    return {
+        no['name']: no['relation_name']
+        for no in nos
+        if no['resource_type'] == 'model' and no['name'].startswith('bronze_') and no.get('relation_name')
+    }
+
+
+def carga_origem(cur):
+    """Contadores acumulados de leitura das tabelas de origem"""
+    # As estatísticas chegam ao coletor com atraso de até ~0,5s no Postgres 13
+    time.sleep(1)
+    cur.execute("SELECT pg_stat_clear_snapshot()")
+    cur.execute(CARGA_ORIGEM, (list(TABELAS_ORIGEM),))
+    return cur.fetchone()
+
+
+def tocar_pedidos(cur, quantidade):
+    """Simula a chegada de `quantidade` alterações (o trigger avança updated_at)"""
+    if quantidade:
+        cur.execute("""
+            UPDATE public.pedidos SET status = status
+            WHERE id IN (SELECT id FROM public.pedidos ORDER BY random() LIMIT %s)
+        """, (quantidade,))
+
+
+def medir_modo(backend, cur, nome, materializado, args):
+    """Reconstrói o projeto no modo e mede ciclos incrementais e consultas"""
+    variaveis = ['--vars', json.dumps({'bronze_materializado': materializado})]
+    print(f"🏗️  Modo {nome}: dbt run --full-refresh...")
+    if not backend.executar(['dbt', 'run', '--full-refresh', *variaveis]):
+        raise RuntimeError(f"dbt run --full-refresh falhou no modo {nome}")
+
+    ciclos, carga = [], [0, 0, 0, 0]
+    for _ in range(args.ciclos):
+        tocar_pedidos(cur, args.alteracoes)
+        antes = carga_origem(cur)
+        inicio = time.monotonic()
+        if not backend.executar(['dbt', 'run', *variaveis]):
+            raise RuntimeError(f"dbt run falhou no modo {nome}")
+        ciclos.append(time.monotonic() - inicio)
+        depois = carga_origem(cur)
+        carga = [total + (d - a) for total, a, d in zip(carga, antes, depois)]
+
+    relacoes = relacoes_bronze(args.dbt_project_dir)
+    consultas = {}
+    for consulta, sql in CONSULTAS.items():
+        sql = sql.format(**relacoes)
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.monotonic()
+            cur.execute(sql)
+            cur.fetchall()
+            tempos.append(time.monotonic() - inicio)
+        consultas[consulta] = min(tempos)
+
+    return {
+        'ciclo': min(ciclos),
+        'carga': [total / args.ciclos for total in carga],
+        'consultas': consultas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da camada bronze: views x tabelas materializadas")
+    parser.add_argument("--dbt-project-dir", default=str(Path(__file__).parent.parent / "dbt_project"),
+                        help="Diretório do projeto DBT")
+    parser.add_argument("--ciclos", type=int, default=3, help="Ciclos incrementais por modo (padrão: 3)")
+    parser.add_argument("--alteracoes", type=int, default=1000,
+                        help="Pedidos da origem alterados antes de cada ciclo (padrão: 1000; 0 desliga)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por consulta (padrão: 3)")
+    args = parser.parse_args()
+
+    backend = SubprocessBackend(args.dbt_project_dir, timeout=3600)
+    conn = psycopg2.connect(**SOURCE_DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        resultados = {nome: medir_modo(backend, cur, nome, materializado, args)
+                      for nome, materializado in MODOS.items()}
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print("\n" + "=" * 70)
+    print(f"⏱️  CAMADA BRONZE ({args.ciclos} ciclos, {args.alteracoes:,} pedidos alterados por ciclo)")
+    print("=" * 70)
+    print(f"   {'':<28}" + "".join(f"{nome:>14}" for nome in MODOS))
+    print(f"   {'ciclo dbt run (s)':<28}" + "".join(f"{r['ciclo']:14.2f}" for r in resultados.values()))
+    for i, rotulo in enumerate(('seq scans na origem', 'linhas lidas (seq)', 'index scans na origem',
+                                'linhas lidas (índice)')):
+        print(f"   {rotulo:<28}" + "".join(f"{r['carga'][i]:14,.0f}" for r in resultados.values()))
+    for consulta in CONSULTAS:
+        print(f"   {consulta + ' (s)':<28}"
+              + "".join(f"{r['consultas'][consulta]:14.3f}" for r in resultados.values()))
+    print("   (carga na origem: média por ciclo; tempos: menor das execuções)")
+    print("   No modo tabela as consultas não tocam a origem; no modo view cada uma a relê.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
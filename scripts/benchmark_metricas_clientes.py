@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark das formulações de gold_metricas_avancadas_clientes
+
+Gera uma base sintética (padrão: 1M clientes / 20M pedidos) em um schema
+próprio e mede o cálculo das métricas por cliente (totais, janelas 30d/90d/12m,
+tendência, mês preferido e scores RFM) em três formulações:
+
+- legado: duas passadas em fct_pedidos (pedidos_agregados + metricas_comportamentais
+  com join de volta e novo GROUP BY), como o modelo era antes
+- passada_unica: o SQL compilado do modelo (dbt compile, target/compiled/...)
+- historico_materializado: o SQL compilado com a var
+  metricas_clientes_historico_materializado; a cada ciclo, `novos-pedidos`
+  pedidos entram, gold_clientes_pedidos_historico é atualizado só para os
+  clientes deles (quando o dbt compila a forma incremental, ou seja, o modelo
+  já existe no banco) e o modelo final é recalculado. O modelo final continua
+  repontuando todos os clientes: os scores RFM são relativos ao conjunto.
+
+As relações do SQL compilado (fct_pedidos, dim_clientes,
+gold_clientes_pedidos_historico) são trocadas pelas da base sintética. Antes de
+medir, confere que legado e os dois modos do modelo produzem o mesmo resultado.
+
+Uso:
+    python benchmark_metricas_clientes.py [--clientes N] [--pedidos N] [--novos-pedidos N]
+                                          [--repeticoes N] [--schema NOME] [--manter]
+                                          [--dbt-project-dir DIR]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+from dbt_backend import SubprocessBackend
+from detector_mudancas import SOURCE_DB_CONFIG
+
+MODELO = 'gold_metricas_avancadas_clientes'
+HISTORICO_MODELO = 'gold_clientes_pedidos_historico'
+VAR_HISTORICO = 'metricas_clientes_historico_materializado'
+
+# Relações lidas pelo SQL compilado, recriadas no schema do benchmark
+RELACOES = ('fct_pedidos', 'dim_clientes', HISTORICO_MODELO)
+
+# Colunas comparadas entre as formulações
+COLUNAS = """
+    cliente_id, total_pedidos, receita_total, ticket_medio, primeira_compra, ultima_compra,
+    pedidos_30d, pedidos_90d, pedidos_12m, receita_30d, receita_90d, receita_12m,
+    dias_entre_compras, dias_desde_ultima_compra, tendencia_crescimento, mes_preferido,
+    frequency_score, monetary_score
+"""
+
+# Agregados por cliente da formulação legada
+JANELAS = """
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN 1 END) as pedidos_30d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN 1 END) as pedidos_90d,
+        COUNT(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '365 days' THEN 1 END) as pedidos_12m,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '30 days' THEN valor_liquido ELSE 0 END) as receita_30d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN valor_liquido ELSE 0 END) as receita_90d,
+        SUM(CASE WHEN data_pedido >= CURRENT_DATE - INTERVAL '365 days' THEN valor_liquido ELSE 0 END) as receita_12m
+"""
+
+HISTORICO = """
+        COUNT(*) as total_pedidos,
+        SUM(valor_liquido) as receita_total,
+        AVG(valor_liquido) as ticket_medio,
+        MIN(data_pedido) as primeira_compra,
+        MAX(data_pedido) as ultima_compra
+"""
+
+# Formulação anterior do modelo (duas passadas em fct_pedidos), só para comparação
+LEGADO = f"""
+WITH pedidos_agregados AS (
+    SELECT cliente_id, {HISTORICO}, {JANELAS}
+    FROM {{schema}}.fct_pedidos
+    GROUP BY cliente_id
+),
+metricas_comportamentais AS (
+    SELECT
+        p.cliente_id,
+        CASE WHEN pa.total_pedidos = 0 THEN 0
+             ELSE EXTRACT(DAYS FROM (pa.ultima_compra - pa.primeira_compra)) / NULLIF(pa.total_pedidos - 1, 0)
+        END as dias_entre_compras,
+        EXTRACT(DAYS FROM (CURRENT_DATE - pa.ultima_compra)) as dias_desde_ultima_compra,
+        COALESCE(
+            (SUM(CASE WHEN p.data_pedido >= CURRENT_DATE - INTERVAL '90 days' THEN p.valor_liquido ELSE 0 END) -
+             SUM(CASE WHEN p.data_pedido >= CURRENT_DATE - INTERVAL '180 days'
+                       AND p.data_pedido < CURRENT_DATE - INTERVAL '90 days'
+                       THEN p.valor_liquido ELSE 0 END)) /
+            NULLIF(SUM(CASE WHEN p.data_pedido >= CURRENT_DATE - INTERVAL '180 days'
+                            AND p.data_pedido < CURRENT_DATE - INTERVAL '90 days'
+                            THEN p.valor_liquido ELSE 0 END), 0), 0
+        ) as tendencia_crescimento,
+        MODE() WITHIN GROUP (ORDER BY EXTRACT(MONTH FROM p.data_pedido)) as mes_preferido
+    FROM {{schema}}.fct_pedidos p
+    INNER JOIN pedidos_agregados pa ON p.cliente_id = pa.cliente_id
+    GROUP BY p.cliente_id, pa.total_pedidos, pa.primeira_compra, pa.ultima_compra
+)
+SELECT
+    pa.cliente_id, pa.total_pedidos, pa.receita_total, pa.ticket_medio, pa.primeira_compra, pa.ultima_compra,
+    pa.pedidos_30d, pa.pedidos_90d, pa.pedidos_12m, pa.receita_30d, pa.receita_90d, pa.receita_12m,
+    COALESCE(mc.dias_entre_compras, 0) as dias_entre_compras,
+    mc.dias_desde_ultima_compra,
+    mc.tendencia_crescimento,
+    mc.mes_preferido,
+    NTILE(5) OVER (ORDER BY pa.total_pedidos, pa.cliente_id) as frequency_score,
+    NTILE(5) OVER (ORDER BY pa.receita_total, pa.cliente_id) as monetary_score
+FROM pedidos_agregados pa
+INNER JOIN metricas_comportamentais mc ON pa.cliente_id = mc.cliente_id
+"""
+
+
+def gerar_dados(cur, schema, clientes, pedidos):
+    """Cria {schema}.fct_pedidos e {schema}.dim_clientes com `pedidos` pedidos de `clientes` clientes"""
+    print(f"🏗️  Gerando {pedidos:,} pedidos para {clientes:,} clientes em {schema}...")
+    inicio = time.monotonic()
+    cur.execute(f"""
+        DROP SCHEMA IF EXISTS {schema} CASCADE;
+        CREATE SCHEMA {schema};
+        CREATE UNLOGGED TABLE {schema}.fct_pedidos AS
+        SELECT
+            g as pedido_id,
+            1 + (random() * ({clientes} - 1))::int as cliente_id,
+            (CURRENT_DATE - (random() * 1095)::int * INTERVAL '1 day'
+                          + (random() * 86400)::int * INTERVAL '1 second') as data_pedido,
+            round((10 + random() * 990)::numeric, 2) as valor_liquido,
+            now() - INTERVAL '1 day' as updated_at
+        FROM generate_series(1, {pedidos}) g;
+        CREATE UNIQUE INDEX ON {schema}.fct_pedidos (pedido_id);
+        CREATE INDEX ON {schema}.fct_pedidos (cliente_id);
+        CREATE INDEX ON {schema}.fct_pedidos (data_pedido);
+        CREATE INDEX ON {schema}.fct_pedidos (updated_at);
+        CREATE UNLOGGED TABLE {schema}.dim_clientes AS
+        SELECT
+            g as cliente_id,
+            'Cliente ' || g as nome,
+            'cliente' || g || '@exemplo.com' as email_original,
+            CURRENT_DATE - (random() * 1500)::int as data_cadastro,
+            'ativo' as status,
+            CASE WHEN g % 5 = 0 THEN 'pessoa_juridica' ELSE 'pessoa_fisica' END as tipo_cliente,
+            5000.00 as limite_credito
+        FROM generate_series(1, {clientes}) g;
+        CREATE UNIQUE INDEX ON {schema}.dim_clientes (cliente_id);
+        -- Versões anteriores dos pedidos (registrar_anteriores): os pedidos do
+        -- benchmark só são inseridos, então fica vazia
+        CREATE TABLE {schema}.fct_pedidos_anteriores (
+            pedido_id BIGINT, data_pedido TIMESTAMP, cliente_id INT, substituido_em TIMESTAMP
+        );
+        ANALYZE {schema}.fct_pedidos;
+        ANALYZE {schema}.dim_clientes;
+    """)
+    print(f"   pronto em {time.monotonic() - inicio:.1f}s")
+
+
+def inserir_pedidos_novos(cur, schema, clientes, quantidade):
+    """Simula um ciclo do scheduler: `quantidade` pedidos novos de clientes aleatórios"""
+    cur.execute(f"""
+        INSERT INTO {schema}.fct_pedidos
+        SELECT
+            (SELECT MAX(pedido_id) FROM {schema}.fct_pedidos) + g,
+            1 + (random() * ({clientes} - 1))::int,
+            now(),
+            round((10 + random() * 990)::numeric, 2),
+            now()
+        FROM generate_series(1, {quantidade}) g
+    """)
+
+
+def sql_compilado(backend, dbt_project_dir, modelo, variaveis, schema, full_refresh=False):
+    """
+    SQL de `modelo` compilado pelo dbt (target/compiled/...), com as relações de
+    RELACOES trocadas pelas do schema do benchmark
+
+    Returns:
+        tuple: (sql, True se o SQL compilado lê a própria relação do modelo,
+                ou seja, é a forma incremental)
+    """
+    comando = ['dbt', 'compile', '--select', modelo, '--vars', json.dumps(variaveis)]
+    if full_refresh:
+        comando.append('--full-refresh')
+    if not backend.executar(comando):
+        raise RuntimeError(f"dbt compile falhou para {modelo}")
+
+    target = Path(dbt_project_dir) / "target"
+    with open(target / "manifest.json", encoding='utf-8') as f:
+        nos = json.load(f)['nodes'].values()
+    relacoes = {no['name']: no['relation_name'] for no in nos
+                if no['resource_type'] == 'model' and no['name'] in RELACOES and no.get('relation_name')}
+    no = next(no for no in nos if no['resource_type'] == 'model' and no['name'] == modelo)
+    with open(target / "compiled" / no['package_name'] / no['original_file_path'], encoding='utf-8') as f:
+        sql = f.read()
+
+    incremental = no['relation_name'] in sql
+    if 'fct_pedidos' in relacoes:
+        # <fct_pedidos>_anteriores (macro relacao_anteriores), lida por chaves_anteriores
+        anteriores = relacoes['fct_pedidos'].replace('"fct_pedidos"', '"fct_pedidos_anteriores"')
+        sql = sql.replace(anteriores, f"{schema}.fct_pedidos_anteriores")
+    for nome, relacao in relacoes.items():
+        sql = sql.replace(relacao, f"{schema}.{nome}")
+    return sql, incremental
+
+
+def divergencias(cur, sql, referencia):
+    """Clientes com métricas diferentes entre o modelo compilado e a formulação de referência"""
+    cur.execute(f"""
+        SELECT COUNT(*) FROM (
+            (SELECT {COLUNAS} FROM ({sql}) m WHERE total_pedidos > 0)
+            EXCEPT
+            (SELECT {COLUNAS} FROM ({referencia}) r)
+        ) d
+    """)
+    return cur.fetchone()[0]
+
+
+def medir(cur, sql, repeticoes):
+    """Menor tempo de `repeticoes` execuções da consulta (materializando o resultado)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.monotonic()
+        cur.execute(f"SELECT COUNT(*), SUM(frequency_score + monetary_score) FROM ({sql}) q")
+        cur.fetchone()
+        tempos.append(time.monotonic() - inicio)
+    return min(tempos)
+
+
+def atualizar_historico(conn, cur, schema, sql):
+    """delete+insert de gold_clientes_pedidos_historico com o SQL incremental compilado"""
+    historico = f"{schema}.{HISTORICO_MODELO}"
+    conn.autocommit = False
+    cur.execute(f"CREATE TEMP TABLE historico_alterados ON COMMIT DROP AS {sql}")
+    cur.execute(f"DELETE FROM {historico} h USING historico_alterados a WHERE h.cliente_id = a.cliente_id")
+    cur.execute(f"INSERT INTO {historico} SELECT * FROM historico_alterados")
+    # post_hook remover_grupos_vazios
+    cur.execute(f"DELETE FROM {historico} WHERE ultima_atualizacao IS NULL")
+    conn.commit()
+    conn.autocommit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das formulações de gold_metricas_avancadas_clientes")
+    parser.add_argument("--dbt-project-dir", default=str(Path(__file__).parent.parent / "dbt_project"),
+                        help="Diretório do projeto DBT")
+    parser.add_argument("--clientes", type=int, default=1_000_000, help="Clientes distintos (padrão: 1M)")
+    parser.add_argument("--pedidos", type=int, default=20_000_000, help="Pedidos (padrão: 20M)")
+    parser.add_argument("--novos-pedidos", type=int, default=20_000,
+                        help="Pedidos novos por ciclo no modo histórico materializado (padrão: 20k)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por formulação (padrão: 3)")
+    parser.add_argument("--schema", default="benchmark_metricas", help="Schema da base sintética")
+    parser.add_argument("--manter", action="store_true", help="Não remove o schema ao final")
+    args = parser.parse_args()
+
+    backend = SubprocessBackend(args.dbt_project_dir, timeout=600)
+    try:
+        passada_unica, _ = sql_compilado(backend, args.dbt_project_dir, MODELO,
+                                         {VAR_HISTORICO: False}, args.schema)
+        historico_materializado, _ = sql_compilado(backend, args.dbt_project_dir, MODELO,
+                                                   {VAR_HISTORICO: True}, args.schema)
+        criar_historico, _ = sql_compilado(backend, args.dbt_project_dir, HISTORICO_MODELO,
+                                           {VAR_HISTORICO: True}, args.schema, full_refresh=True)
+        atualizar, incremental = sql_compilado(backend, args.dbt_project_dir, HISTORICO_MODELO,
+                                               {VAR_HISTORICO: True}, args.schema)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    conn = psycopg2.connect(**SOURCE_DB_CONFIG)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        gerar_dados(cur, args.schema, args.clientes, args.pedidos)
+        cur.execute(f"CREATE TABLE {args.schema}.{HISTORICO_MODELO} AS {criar_historico}")
+        cur.execute(f"CREATE UNIQUE INDEX ON {args.schema}.{HISTORICO_MODELO} (cliente_id)")
+        cur.execute(f"ANALYZE {args.schema}.{HISTORICO_MODELO}")
+
+        legado = LEGADO.format(schema=args.schema)
+        for nome, sql in (('passada_unica', passada_unica), ('historico_materializado', historico_materializado)):
+            diferentes = divergencias(cur, sql, legado)
+            if diferentes:
+                print(f"❌ {diferentes} clientes com métricas diferentes entre legado e {nome}")
+                return 1
+        print("✅ legado, passada_unica e historico_materializado produzem o mesmo resultado")
+
+        resultados = {
+            'legado': medir(cur, legado, args.repeticoes),
+            'passada_unica': medir(cur, passada_unica, args.repeticoes),
+        }
+
+        if not incremental:
+            print(f"⚠️  {HISTORICO_MODELO} não existe no banco do dbt: a atualização do estado "
+                  f"não foi compilada na forma incremental e fica fora da medição")
+        tempos = []
+        for _ in range(args.repeticoes):
+            inserir_pedidos_novos(cur, args.schema, args.clientes, args.novos_pedidos)
+            inicio = time.monotonic()
+            if incremental:
+                atualizar_historico(conn, cur, args.schema, atualizar)
+            tempos.append(time.monotonic() - inicio + medir(cur, historico_materializado, 1))
+        resultados['historico_materializado'] = min(tempos)
+
+        print("\n" + "=" * 60)
+        print(f"⏱️  MÉTRICAS POR CLIENTE ({args.clientes:,} clientes / {args.pedidos:,} pedidos)")
+        print("=" * 60)
+        base = resultados['legado']
+        for nome, duracao in resultados.items():
+            print(f"   {nome:<25} {duracao:9.2f}s   {base / duracao:5.2f}x")
+        print(f"   (historico_materializado: {args.novos_pedidos:,} pedidos novos por ciclo"
+              f"{', com a atualização do estado' if incremental else ''}; menor de {args.repeticoes} execuções)")
+        return 0
+    finally:
+        if not args.manter:
+            cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Driver de carga paralela para o banco de origem
+
+Distribui o mix de ações do simulador (insere_dados.ACOES) entre N processos,
+cada um com sua própria conexão e semente determinística, para reproduzir
+escrita concorrente contra a replicação lógica (CDC).
+
+Uso:
+    python carga_paralela.py --workers 8 --duration 60 [--seed 42] [--interval 0]
+                             [--pool-capacity N]
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import random
+import sys
+import time
+
+import insere_dados
+
+
+def executar_worker(indice, semente, duracao, max_ops, intervalo, verbose, capacidade_pool, resultados):
+    """
+    Loop de um worker: sorteia e executa ações até esgotar tempo ou operações
+
+    O resumo (operações, erros e histogramas de latência por ação) é sempre
+    enviado para a fila `resultados`, inclusive quando o worker é interrompido
+    com Ctrl+C. Com `capacidade_pool`, cada worker mantém no máximo esse
+    número de IDs por tabela (modo reservatório de insere_dados.PoolIds).
+    """
+    random.seed(semente)
+    resumo = {'worker': indice, 'semente': semente, 'ops': 0, 'erros': 0, 'pulados': 0,
+              'duracao': 0.0, 'latencias': {}, 'erros_por_acao': {}}
+    conn = insere_dados.conectar_db()
+    if not conn:
+        resumo['falha_conexao'] = True
+        resultados.put(resumo)
+        return
+
+    # Sem --verbose, as mensagens por operação do simulador são descartadas
+    saida = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    inicio = time.monotonic()
+    try:
+        with saida:
+            pools = insere_dados.criar_pools(conn, capacidade=capacidade_pool)
+            inicio = time.monotonic()
+            while (duracao is None or time.monotonic() - inicio < duracao) and \
+                    (max_ops is None or resumo['ops'] < max_ops):
+                acao = insere_dados.escolher_acao()
+                t0 = time.perf_counter()
+                resultado = insere_dados.executar_acao(conn, pools, acao, pausa=False)
+                latencia = (time.perf_counter() - t0) * 1000
+                if resultado is insere_dados.PULADO:
+                    # Nada a fazer (ex: pool vazio): nem operação nem erro
+                    resumo['pulados'] += 1
+                else:
+                    resumo['ops'] += 1
+                    resumo['latencias'].setdefault(acao, insere_dados.HistogramaLatencia()).registrar(latencia)
+                    if resultado is None:
+                        resumo['erros'] += 1
+                        resumo['erros_por_acao'][acao] = resumo['erros_por_acao'].get(acao, 0) + 1
+                if intervalo:
+                    time.sleep(intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        resumo['duracao'] = time.monotonic() - inicio
+        conn.close()
+        resultados.put(resumo)
+
+
+def imprimir_relatorio(resumos):
+    """Agrega os resumos dos workers em um único relatório"""
+    print("\n📊 RELATÓRIO DA CARGA PARALELA")
+    print("=" * 72)
+    print(f"{'worker':>6} {'semente':>8} {'ops':>9} {'erros':>7} {'ops/s':>9}")
+    for r in sorted(resumos, key=lambda r: r['worker']):
+        if r.get('falha_conexao'):
+            print(f"{r['worker']:>6} {r['semente']:>8}   ❌ falha ao conectar")
+            continue
+        ops_s = r['ops'] / r['duracao'] if r['duracao'] else 0
+        print(f"{r['worker']:>6} {r['semente']:>8} {r['ops']:>9} {r['erros']:>7} {ops_s:>9.1f}")
+
+    latencias = {}
+    erros = {}
+    for r in resumos:
+        for acao, histograma in r['latencias'].items():
+            latencias.setdefault(acao, insere_dados.HistogramaLatencia()).mesclar(histograma)
+        for acao, n in r['erros_por_acao'].items():
+            erros[acao] = erros.get(acao, 0) + n
+
+    print("-" * 72)
+    print(f"{'ação':<20} {'ops':>8} {'erros':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    for acao in insere_dados.ACOES:
+        histograma = latencias.get(acao)
+        if not histograma:
+            continue
+        print(f"{acao:<20} {histograma.total:>8} {erros.get(acao, 0):>6} "
+              f"{histograma.percentil(50):>8.1f} {histograma.percentil(95):>8.1f} "
+              f"{histograma.percentil(99):>8.1f} {histograma.maximo_ms:>8.1f}")
+
+    total_ops = sum(r['ops'] for r in resumos)
+    total_erros = sum(r['erros'] for r in resumos)
+    total_pulados = sum(r.get('pulados', 0) for r in resumos)
+    # Os workers rodam em paralelo: a vazão agregada usa a duração do mais longo
+    duracao = max((r['duracao'] for r in resumos), default=0)
+    print("-" * 72)
+    print(f"🚀 Total: {total_ops} ops, {total_erros} erros, {total_pulados} pulados, "
+          f"{total_ops / duracao if duracao else 0:.1f} ops/s com {len(resumos)} workers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga paralela (multi-processo) no banco de origem")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Quantidade de processos (padrão: número de CPUs)")
+    parser.add_argument("--duration", type=float, help="Duração em segundos (padrão: até Ctrl+C)")
+    parser.add_argument("--ops", type=int, help="Máximo de operações por worker")
+    parser.add_argument("--seed", type=int, default=42, help="Semente base; o worker i usa seed + i (padrão: 42)")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Pausa em segundos entre operações de cada worker (padrão: 0)")
+    parser.add_argument("--pool-capacity", type=int,
+                        help="Máximo de IDs por tabela mantidos em memória por worker (modo reservatório). "
+                             "Padrão: todos")
+    parser.add_argument("--verbose", action="store_true", help="Mostra as mensagens de cada operação")
+    args = parser.parse_args()
+
+    print(f"🎬 Carga paralela: {args.workers} workers, duração={args.duration or '∞'}s, "
+          f"ops/worker={args.ops or '∞'}, seed={args.seed}")
+    print("⏱️  Pressione Ctrl+C para parar\n")
+
+    resultados = multiprocessing.Queue()
+    processos = [
+        multiprocessing.Process(
+            target=executar_worker,
+            args=(i, args.seed + i, args.duration, args.ops, args.interval, args.verbose, args.pool_capacity, resultados)
+        )
+        for i in range(args.workers)
+    ]
+    for processo in processos:
+        processo.start()
+
+    # Coleta antes do join: a fila precisa ser esvaziada para os processos terminarem
+    resumos = []
+    while len(resumos) < len(processos):
+        try:
+            resumos.append(resultados.get())
+        except KeyboardInterrupt:
+            print("\n⏹️  Interrompido, aguardando os workers finalizarem...")
+    for processo in processos:
+        processo.join()
+
+    imprimir_relatorio(resumos)
+    sys.exit(0 if all(not r.get('falha_conexao') for r in resumos) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consultor de índices das tabelas dos modelos DBT
+
+Depois de uma execução do dbt (e do uso do dashboard), cruza:
+
+- pg_stat_statements: as consultas mais caras e as colunas que elas usam em
+  filtros (WHERE) e junções (ON) sobre as tabelas dos modelos
+- pg_stat_user_tables: leituras sequenciais e tamanho de cada tabela
+- pg_index: colunas que já lideram algum índice
+
+e sugere os índices que faltam, com a entrada correspondente da configuração
+`indexes` do modelo (criada pela macro garantir_indices na próxima execução).
+
+Uso:
+    python consultor_indices.py [--manifest ARQUIVO] [--min-linhas N] [--top N]
+    python consultor_indices.py --resetar   # zera as estatísticas antes de uma execução
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+import psycopg2
+
+from detector_mudancas import SOURCE_DB_CONFIG
+
+# Consultas mais caras analisadas em pg_stat_statements
+LIMITE_CONSULTAS = 500
+
+RE_TABELA = re.compile(
+    r'\b(?:FROM|JOIN)\s+(?:"?\w+"?\.)?(?:"?(\w+)"?\.)"?(\w+)"?(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|'
+    r'RIGHT\b|INNER\b|FULL\b|CROSS\b|GROUP\b|ORDER\b|LIMIT\b|USING\b)(\w+))?',
+    re.IGNORECASE,
+)
+RE_PREDICADO = re.compile(r'\b(?:WHERE|ON|AND|OR)\b(.*?)(?=\b(?:WHERE|ON|AND|OR|GROUP|ORDER|LIMIT|HAVING|'
+                          r'UNION|JOIN|LEFT|RIGHT|INNER|FULL|SELECT|FROM)\b|\)|$)',
+                          re.IGNORECASE | re.DOTALL)
+# Coluna à esquerda de um operador e coluna qualificada à direita (junções)
+RE_COLUNA_ESQ = re.compile(r'(?:"?(\w+)"?\.)?"?([a-z_]\w*)"?\s*(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bIS\b)',
+                           re.IGNORECASE)
+RE_COLUNA_DIR = re.compile(r'(?:=|<>|!=|<=|>=|<|>)\s*"?(\w+)"?\."?(\w+)"?', re.IGNORECASE)
+
+
+def tabelas_dos_modelos(caminho_manifest):
+    """{(schema, tabela): nome do modelo} das tabelas materializadas pelo dbt"""
+    with open(caminho_manifest, encoding='utf-8') as f:
+        nos = json.load(f)['nodes'].values()
+    return {
+        (no['schema'], no.get('alias') or no['name']): no['name']
+        for no in nos
+        if no['resource_type'] in ('model', 'snapshot')
+        and no.get('config', {}).get('materialized') not in ('view', 'ephemeral')
+    }
+
+
+def colunas_em_predicados(sql, colunas_por_tabela):
+    """
+    Colunas das tabelas conhecidas usadas em filtros e junções de uma consulta
+
+    Args:
+        sql: texto da consulta (normalizado pelo pg_stat_statements)
+        colunas_por_tabela: {(schema, tabela): set(colunas)}
+
+    Returns:
+        set: {(schema, tabela, coluna)}
+    """
+    apelidos = {}
+    for schema, tabela, apelido in RE_TABELA.findall(sql):
+        if (schema, tabela) in colunas_por_tabela:
+            apelidos[tabela] = (schema, tabela)
+            if apelido:
+                apelidos[apelido] = (schema, tabela)
+    if not apelidos:
+        return set()
+    referenciadas = set(apelidos.values())
+
+    encontradas = set()
+    for trecho in RE_PREDICADO.findall(sql):
+        for qualificador, coluna in RE_COLUNA_ESQ.findall(trecho) + RE_COLUNA_DIR.findall(trecho):
+            if qualificador:
+                candidatas = [apelidos[qualificador]] if qualificador in apelidos else []
+            else:
+                candidatas = [t for t in referenciadas if coluna in colunas_por_tabela[t]]
+            # Coluna sem qualificador ambígua entre tabelas: ignorada
+            if len(candidatas) == 1 and coluna in colunas_por_tabela[candidatas[0]]:
+                encontradas.add((*candidatas[0], coluna))
+    return encontradas
+
+
+def _consultar(cur, sql, parametros=None):
+    cur.execute(sql, parametros)
+    return cur.fetchall()
+
+
+def sugerir_indices(conn, modelos, min_linhas=10_000, top=20):
+    """
+    Índices sugeridos para as tabelas dos modelos
+
+    Returns:
+        list: [dict(modelo, schema, tabela, coluna, tempo_ms, chamadas, seq_scan, linhas)],
+              do maior tempo de consultas para o menor
+    """
+    cur = conn.cursor()
+    schemas = sorted({schema for schema, _ in modelos})
+
+    colunas_por_tabela = {}
+    for schema, tabela, coluna in _consultar(cur, """
+        SELECT table_schema, table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = ANY(%s)
+    """, (schemas,)):
+        if (schema, tabela) in modelos:
+            colunas_por_tabela.setdefault((schema, tabela), set()).add(coluna)
+
+    # Partições (incremental_particionado) somadas na tabela pai
+    estatisticas = {
+        (schema, tabela): (seq_scan, linhas)
+        for schema, tabela, seq_scan, linhas in _consultar(cur, """
+            SELECT s.schemaname, COALESCE(pai.relname, s.relname), SUM(s.seq_scan), SUM(s.n_live_tup)
+            FROM pg_stat_user_tables s
+            LEFT JOIN pg_inherits h ON h.inhrelid = s.relid
+            LEFT JOIN pg_class pai ON pai.oid = h.inhparent
+            WHERE s.schemaname = ANY(%s)
+            GROUP BY 1, 2
+        """, (schemas,))
+    }
+
+    # Colunas que já lideram um índice (em tabelas particionadas, o índice do pai)
+    indexadas = {
+        (schema, tabela, coluna)
+        for schema, tabela, coluna in _consultar(cur, """
+            SELECT n.nspname, c.relname, a.attname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE n.nspname = ANY(%s)
+        """, (schemas,))
+    }
+
+    cur.execute("SHOW server_version_num")
+    coluna_tempo = 'total_exec_time' if int(cur.fetchone()[0]) >= 130000 else 'total_time'
+    try:
+        consultas = _consultar(cur, f"""
+            SELECT query, calls, {coluna_tempo}
+            FROM pg_stat_statements
+            WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+            ORDER BY {coluna_tempo} DESC
+            LIMIT %s
+        """, (LIMITE_CONSULTAS,))
+    except psycopg2.Error as e:
+        raise RuntimeError(f"pg_stat_statements indisponível: {e.pgerror or e}") from e
+
+    uso = {}
+    for sql, chamadas, tempo in consultas:
+        for chave in colunas_em_predicados(sql, colunas_por_tabela):
+            tempo_total, chamadas_total = uso.get(chave, (0.0, 0))
+            uso[chave] = (tempo_total + tempo, chamadas_total + chamadas)
+
+    sugestoes = []
+    for (schema, tabela, coluna), (tempo, chamadas) in uso.items():
+        seq_scan, linhas = estatisticas.get((schema, tabela), (0, 0))
+        if (schema, tabela, coluna) in indexadas or linhas < min_linhas or not seq_scan:
+            continue
+        sugestoes.append({
+            'modelo': modelos[(schema, tabela)], 'schema': schema, 'tabela': tabela, 'coluna': coluna,
+            'tempo_ms': tempo, 'chamadas': chamadas, 'seq_scan': seq_scan, 'linhas': linhas,
+        })
+    return sorted(sugestoes, key=lambda s: s['tempo_ms'], reverse=True)[:top]
+
+
+def main():
+    projeto = Path(__file__).parent.parent / "dbt_project"
+    parser = argparse.ArgumentParser(description="Sugere índices para as tabelas dos modelos DBT")
+    parser.add_argument("--manifest", default=str(projeto / "target" / "manifest.json"),
+                        help="manifest.json do projeto (tabelas de cada modelo)")
+    parser.add_argument("--min-linhas", type=int, default=10_000,
+                        help="Ignora tabelas menores que isso (padrão: 10000)")
+    parser.add_argument("--top", type=int, default=20, help="Quantidade máxima de sugestões (padrão: 20)")
+    parser.add_argument("--resetar", action="store_true",
+                        help="Zera pg_stat_statements e pg_stat_user_tables e sai")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**SOURCE_DB_CONFIG)
+    conn.autocommit = True
+    try:
+        if args.resetar:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_stat_statements_reset()")
+                cur.execute("SELECT pg_stat_reset()")
+            print("✅ Estatísticas zeradas: rode o dbt e o dashboard e depois o consultor")
+            return 0
+
+        modelos = tabelas_dos_modelos(args.manifest)
+        try:
+            sugestoes = sugerir_indices(conn, modelos, min_linhas=args.min_linhas, top=args.top)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+    finally:
+        conn.close()
+
+    print("=" * 70)
+    print("🔎 ÍNDICES SUGERIDOS (colunas de filtros/junções sem índice)")
+    print("=" * 70)
+    if not sugestoes:
+        print("   Nenhuma sugestão: as colunas filtradas já lideram algum índice")
+        return 0
+    for s in sugestoes:
+        print(f"\n   {s['schema']}.{s['tabela']}.{s['coluna']}")
+        print(f"      {s['tempo_ms'] / 1000:.2f}s em {s['chamadas']:,} chamadas; "
+              f"{s['seq_scan']:,} seq scans; {s['linhas']:,} linhas")
+        print(f"      modelo {s['modelo']}: indexes=[{{'columns': ['{s['coluna']}']}}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,8 +9,12 @@ import psycopg2
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from dashboard_dados import CACHE_ARQUIVO, CacheResultados, DadosDashboard, PoolConsultas, VigiaVersoes
+from detector_mudancas import DetectorMudancas
+from series_temporais import RESOLUCOES, serie_vendas
 
 # Configuração da página
 st.set_page_config(
@@ -29,17 +33,335 @@ DB_CONFIG = {
     'password': 'admin'
 }
 
-@st.cache_data(ttl=5)  # Cache por 5 segundos
-def conectar_e_consultar(query):
-    """Conecta ao banco e executa query com cache"""
+# Intervalo (s) entre duas verificações de mudança nas tabelas dos painéis
+INTERVALO_ATUALIZACAO = 5
+
+# Consultas da tela, executadas em lote em uma única conexão do pool
+CONSULTAS = {
+    'metricas': """
+    SELECT total_clientes, total_pedidos, receita_total, ticket_medio
+    FROM public_gold.gold_dashboard_kpis
+    """,
+    'top_clientes': """
+    SELECT nome, total_pedidos, receita_total
+    FROM public_gold.gold_dashboard_clientes
+    ORDER BY receita_total DESC
+    LIMIT 10
+    """,
+    'top_produtos': """
+    SELECT produto, total_vendas, receita_total
+    FROM public_gold.gold_dashboard_produtos
+    ORDER BY receita_total DESC
+    LIMIT 10
+    """,
+}
+
+# Atividade recente: cada sessão guarda as últimas linhas e busca só o delta
+# (ids novos ou linhas alteradas desde a última leitura, com 10s de folga para
+# transações que fizeram commit fora de ordem)
+LIMITE_RECENTES = 5
+CONSULTAS_RECENTES = {
+    'ultimos_clientes': """
+    SELECT id, nome, email, data_cadastro, updated_at
+    FROM public.clientes
+    WHERE id > %(ultimo_id)s
+       OR updated_at > %(ultima_atualizacao)s::timestamp - INTERVAL '10 seconds'
+    ORDER BY id DESC
+    LIMIT %(limite)s
+    """,
+    'ultimos_pedidos': """
+    SELECT 
+        p.id,
+        c.nome,
+        p.numero_pedido,
+        p.observacoes,
+        p.valor_bruto as valor_total,
+        p.data_pedido,
+        p.updated_at
+    FROM public.pedidos p
+    JOIN public.clientes c ON p.cliente_id = c.id
+    WHERE p.id > %(ultimo_id)s
+       OR p.updated_at > %(ultima_atualizacao)s::timestamp - INTERVAL '10 seconds'
+    ORDER BY p.id DESC
+    LIMIT %(limite)s
+    """,
+}
+
+# Status do pipeline: {tabela exibida: (relação, tabela de origem das views bronze)}
+RELACOES_PIPELINE = {
+    'bronze_clientes': ('public_bronze.bronze_clientes', 'public.clientes'),
+    'bronze_pedidos': ('public_bronze.bronze_pedidos', 'public.pedidos'),
+    'silver_clientes': ('public_silver.dim_clientes', None),
+    'silver_pedidos': ('public_silver.fct_pedidos', None),
+    'gold_analise_coorte': ('public_gold.gold_analise_coorte', None),
+    'gold_deteccao_anomalias': ('public_gold.gold_deteccao_anomalias', None),
+}
+
+# Estimativas do catálogo (custam o mesmo a qualquer volume): n_live_tup das
+# estatísticas ou, sem elas (estatísticas zeradas), pg_class.reltuples. Views são
+# estimadas pela tabela de origem; tabelas particionadas, pela soma das partições
+CONSULTA_STATUS_PIPELINE = """
+WITH alvos(ordem, tabela, relacao, origem) AS (
+    VALUES {valores}
+),
+resolvidas AS (
+    SELECT a.ordem, a.tabela, c.relkind = 'v' AS view,
+           CASE WHEN c.relkind = 'v' THEN to_regclass(a.origem) ELSE c.oid END AS oid
+    FROM alvos a
+    JOIN pg_class c ON c.oid = to_regclass(a.relacao)
+)
+SELECT r.tabela, r.view,
+       SUM(CASE WHEN s.n_live_tup > 0 THEN s.n_live_tup ELSE GREATEST(c.reltuples, 0) END)::bigint as estimativa
+FROM resolvidas r
+JOIN pg_class c ON c.oid = r.oid
+    OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = r.oid)
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+GROUP BY r.ordem, r.tabela, r.view
+ORDER BY r.ordem
+""".format(valores=",\n           ".join(
+    f"({ordem}, '{tabela}', '{relacao}', NULLIF('{origem or ''}', ''))"
+    for ordem, (tabela, (relacao, origem)) in enumerate(RELACOES_PIPELINE.items())
+))
+
+# Contagens exatas gravadas pelo dbt ao fim de cada execução (macro registrar_contagens)
+CONSULTA_CONTAGENS_DBT = """
+SELECT schema_nome || '.' || tabela as relacao, registros, contado_em
+FROM public_auditoria.dbt_contagens
+"""
+
+# COUNT(*) de todas as camadas: só quando o usuário pede
+CONSULTA_CONTAGEM_EXATA = "\nUNION ALL\n".join(
+    f"SELECT '{tabela}' as tabela, COUNT(*) as registros FROM {relacao}"
+    for tabela, (relacao, _) in RELACOES_PIPELINE.items()
+)
+
+
+# Tabelas de que cada painel depende (public ou "schema.tabela"): o painel só é
+# reconsultado quando alguma delas recebe escrita
+TABELAS_PAINEIS = {
+    'metricas': ('public_gold.gold_dashboard_kpis',),
+    'top_clientes': ('public_gold.gold_dashboard_clientes',),
+    'top_produtos': ('public_gold.gold_dashboard_produtos',),
+    # Série de vendas: o rollup lido depende da resolução (series_temporais.py)
+    'evolucao': tuple(sorted({config['tabela'] for config in RESOLUCOES.values()})),
+    'ultimos_clientes': ('clientes',),
+    'ultimos_pedidos': ('pedidos', 'clientes'),
+    # As views bronze mudam junto com as tabelas de origem
+    'pipeline_status': ('clientes', 'pedidos', 'public_bronze.bronze_clientes', 'public_bronze.bronze_pedidos',
+                        'public_silver.dim_clientes', 'public_silver.fct_pedidos',
+                        'public_gold.gold_analise_coorte', 'public_gold.gold_deteccao_anomalias'),
+    'contagens_dbt': ('public_auditoria.dbt_contagens',),
+}
+TODAS_TABELAS = tuple(sorted({tabela for tabelas in TABELAS_PAINEIS.values() for tabela in tabelas}))
+
+
+# Última execução do dbt: invalida os resultados das tabelas do dbt a cada run
+RUN_RESULTS = Path(__file__).parent.parent / "dbt_project" / "target" / "run_results.json"
+
+
+@st.cache_resource
+def obter_dados():
+    """Pool, vigia de versões e cache de resultados compartilhados por todas as sessões do processo"""
+    # Pool e cache primeiro: se algum falhar (banco fora do ar), a thread do vigia
+    # ainda não existe (st.cache_resource não guarda exceções, cada rerun tenta de novo)
+    pool = PoolConsultas(DB_CONFIG)
+    cache = CacheResultados(caminho=CACHE_ARQUIVO or None)
+    vigia = VigiaVersoes(
+        DetectorMudancas(db_config=DB_CONFIG, tabelas=TODAS_TABELAS, estrategia='stats'),
+        intervalo=INTERVALO_ATUALIZACAO,
+        run_results=RUN_RESULTS
+    )
+    return DadosDashboard(pool, vigia, cache)
+
+
+def carregar_recentes(fonte_dados):
+    """
+    Atualiza os painéis de atividade recente da sessão com o delta desde a
+    última leitura, só quando as tabelas mudaram
+
+    Returns:
+        dict: {painel: erro} das consultas que falharam
+    """
+    pendentes, versoes = [], {}
+    for nome, sql in CONSULTAS_RECENTES.items():
+        estado = st.session_state.setdefault(f'recentes_{nome}', {
+            'df': pd.DataFrame(), 'ultimo_id': 0, 'ultima_atualizacao': datetime.min, 'versao': None
+        })
+        versoes[nome] = fonte_dados.vigia.versao(TABELAS_PAINEIS[nome])
+        if estado['versao'] is not None and estado['versao'] == versoes[nome]:
+            continue
+        pendentes.append((nome, sql, {
+            'ultimo_id': estado['ultimo_id'],
+            'ultima_atualizacao': estado['ultima_atualizacao'],
+            'limite': LIMITE_RECENTES,
+        }))
+    if not pendentes:
+        return {}
+
+    resultados, erros = fonte_dados.pool.consultar_lote(pendentes)
+    for nome, delta in resultados.items():
+        if nome in erros:
+            continue
+        estado = st.session_state[f'recentes_{nome}']
+        if not delta.empty:
+            df = delta if estado['df'].empty else pd.concat([delta, estado['df']])
+            estado['df'] = (df.drop_duplicates('id', keep='first')
+                              .sort_values('id', ascending=False)
+                              .head(LIMITE_RECENTES)
+                              .reset_index(drop=True))
+            estado['ultimo_id'] = max(estado['ultimo_id'], int(delta['id'].max()))
+            estado['ultima_atualizacao'] = max(estado['ultima_atualizacao'], delta['updated_at'].max())
+        estado['versao'] = versoes[nome]
+    return erros
+
+
+@st.fragment
+def painel_status_pipeline():
+    """Estimativas do catálogo e contagens do dbt; o COUNT(*) das camadas só sob demanda"""
+    st.header("⚙️ Status do Pipeline DBT")
+    fonte_dados = obter_dados()
+
+    try:
+        dados, erros, _ = fonte_dados.carregar({
+            'pipeline_status': (CONSULTA_STATUS_PIPELINE, TABELAS_PAINEIS['pipeline_status']),
+            'contagens_dbt': (CONSULTA_CONTAGENS_DBT, TABELAS_PAINEIS['contagens_dbt']),
+        })
+    except (psycopg2.Error, TimeoutError) as e:
+        st.error(f"Erro ao conectar ao banco: {e}")
+        return
+    # A tabela de contagens só existe depois da primeira execução do dbt
+    erros.pop('contagens_dbt', None)
+    for nome, erro in erros.items():
+        st.error(f"Erro na consulta {nome}: {erro}")
+
+    if st.button("🔢 Contagem exata (COUNT(*) em todas as camadas)"):
+        try:
+            resultados, erros_contagem = fonte_dados.pool.consultar_lote(
+                [('contagem_exata', CONSULTA_CONTAGEM_EXATA)]
+            )
+        except (psycopg2.Error, TimeoutError) as e:
+            erros_contagem = {'contagem_exata': e}
+        if erros_contagem:
+            st.error(f"Erro na contagem exata: {erros_contagem['contagem_exata']}")
+        else:
+            df_exata = resultados['contagem_exata']
+            st.session_state['contagem_exata'] = (dict(zip(df_exata['tabela'], df_exata['registros'])),
+                                                  datetime.now())
+    exatas, contado_em = st.session_state.get('contagem_exata', ({}, None))
+
+    df_pipeline = dados['pipeline_status']
+    df_dbt = dados.get('contagens_dbt', pd.DataFrame())
+    contagens_dbt = {} if df_dbt.empty else {
+        row.relacao: (row.registros, row.contado_em) for row in df_dbt.itertuples()
+    }
+
+    if not df_pipeline.empty:
+        # Organizar em 3 linhas: Bronze, Silver, Gold
+        for camada, titulo in (('bronze', "🟤 Camada Bronze"), ('silver', "🥈 Camada Silver"),
+                               ('gold', "🥇 Camada Gold")):
+            tabelas = df_pipeline[df_pipeline['tabela'].str.startswith(camada)]
+            if tabelas.empty:
+                continue
+            st.subheader(titulo)
+            cols = st.columns(len(tabelas))
+            for col, row in zip(cols, tabelas.itertuples()):
+                ajuda = ["estimativa pela tabela de origem (view)"] if row.view else []
+                relacao = RELACOES_PIPELINE[row.tabela][0]
+                if relacao in contagens_dbt:
+                    registros, quando = contagens_dbt[relacao]
+                    ajuda.append(f"dbt: {registros:,} registros em {quando:%d/%m %H:%M}")
+                if row.tabela in exatas:
+                    valor = f"{exatas[row.tabela]:,} registros"
+                else:
+                    valor = f"~{row.estimativa:,} registros"
+                with col:
+                    st.metric(
+                        label=row.tabela.split('_', 1)[1].replace('_', ' ').title(),
+                        value=valor,
+                        delta=None,
+                        help=" · ".join(ajuda) or None
+                    )
+
+    if contado_em:
+        st.caption(f"Contagem exata de {contado_em:%H:%M:%S}")
+    else:
+        st.caption("~ estimativas do catálogo do Postgres; passe o mouse para ver a contagem da última execução do dbt")
+
+
+@st.fragment
+def painel_evolucao():
+    """Série de vendas no período e resolução escolhidos, reduzida no servidor"""
+    st.subheader("📈 Evolução de Vendas")
+    
+    hoje = date.today()
+    col_periodo, col_resolucao = st.columns([2, 1])
+    with col_periodo:
+        periodo = st.date_input("Período", value=(hoje - timedelta(days=7), hoje), max_value=hoje,
+                                key='periodo_evolucao')
+    with col_resolucao:
+        resolucao = st.selectbox("Resolução", list(RESOLUCOES), index=list(RESOLUCOES).index('dia'),
+                                 key='resolucao_evolucao')
+    # Enquanto o intervalo é escolhido, date_input devolve só o início
+    inicio, fim = (periodo[0], periodo[-1]) if periodo else (hoje, hoje)
+    
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        return df
-    except Exception as e:
+        df_evolucao, resolucao_usada, erros = serie_vendas(obter_dados(), inicio, fim + timedelta(days=1), resolucao)
+    except (psycopg2.Error, TimeoutError) as e:
         st.error(f"Erro ao conectar ao banco: {e}")
-        return pd.DataFrame()
+        return
+    for nome, erro in erros.items():
+        st.error(f"Erro na consulta {nome}: {erro}")
+    if resolucao_usada != resolucao:
+        st.caption(f"Resolução '{resolucao}' fina demais para o período: exibindo por '{resolucao_usada}'")
+    
+    if not df_evolucao.empty:
+        # Duas métricas em gráfico de linha
+        fig_evolucao = go.Figure()
+        
+        # Pedidos (eixo Y esquerdo)
+        fig_evolucao.add_trace(
+            go.Scatter(
+                x=df_evolucao['periodo'],
+                y=df_evolucao['pedidos'],
+                name='Pedidos',
+                line=dict(color='blue'),
+                yaxis='y'
+            )
+        )
+        
+        # Receita (eixo Y direito)
+        fig_evolucao.add_trace(
+            go.Scatter(
+                x=df_evolucao['periodo'],
+                y=df_evolucao['receita'],
+                name='Receita (R$)',
+                line=dict(color='green'),
+                yaxis='y2'
+            )
+        )
+        
+        # Layout com dois eixos Y
+        fig_evolucao.update_layout(
+            title="Evolução de Pedidos e Receita",
+            xaxis=dict(title="Data"),
+            yaxis=dict(title="Número de Pedidos", side="left"),
+            yaxis2=dict(title="Receita (R$)", side="right", overlaying="y"),
+            height=400
+        )
+        
+        st.plotly_chart(fig_evolucao, use_container_width=True)
+    else:
+        st.info("Aguardando dados de evolução temporal...")
+
+
+@st.fragment(run_every=INTERVALO_ATUALIZACAO)
+def vigiar_mudancas():
+    """Reexecuta a página só quando alguma tabela exibida mudou (sem consultar o banco)"""
+    versao = obter_dados().vigia.versao(TODAS_TABELAS)
+    if versao != st.session_state.get('versao_exibida'):
+        st.rerun()
+    st.caption("🟢 Ao vivo: atualiza quando os dados mudam")
+
 
 def main():
     # Header
@@ -48,26 +370,38 @@ def main():
     
     # Sidebar com controles
     st.sidebar.header("⚙️ Configurações")
-    auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh (5s)", value=True)
+    auto_refresh = st.sidebar.checkbox("🔄 Auto-refresh", value=True)
     
+    try:
+        fonte_dados = obter_dados()
+    except psycopg2.Error as e:
+        # O pool abre as primeiras conexões ao ser criado
+        st.error(f"Erro ao conectar ao banco: {e}")
+        return
+    st.session_state['versao_exibida'] = fonte_dados.vigia.versao(TODAS_TABELAS)
     if auto_refresh:
-        # Auto-refresh usando rerun
-        time.sleep(5)
-        st.rerun()
+        with st.sidebar:
+            vigiar_mudancas()
+    
+    try:
+        dados, erros, _ = fonte_dados.carregar(
+            {nome: (sql, TABELAS_PAINEIS[nome]) for nome, sql in CONSULTAS.items()}
+        )
+    except (psycopg2.Error, TimeoutError) as e:
+        st.error(f"Erro ao conectar ao banco: {e}")
+        dados, erros = {nome: pd.DataFrame() for nome in CONSULTAS}, {}
+    try:
+        erros.update(carregar_recentes(fonte_dados))
+    except (psycopg2.Error, TimeoutError) as e:
+        st.error(f"Erro ao conectar ao banco: {e}")
+    for nome, erro in erros.items():
+        st.error(f"Erro na consulta {nome}: {erro}")
     
     # ====== MÉTRICAS PRINCIPAIS ======
     st.header("📈 Métricas Principais")
     
-    # Consulta para métricas
-    query_metricas = """
-    SELECT 
-        (SELECT COUNT(*) FROM public.clientes) as total_clientes,
-        (SELECT COUNT(*) FROM public.pedidos) as total_pedidos,
-        (SELECT COALESCE(SUM(valor_bruto), 0) FROM public.pedidos) as receita_total,
-        (SELECT COALESCE(AVG(valor_bruto), 0) FROM public.pedidos) as ticket_medio
-    """
-    
-    df_metricas = conectar_e_consultar(query_metricas)
+    # Métricas (linha única pré-agregada pelo dbt)
+    df_metricas = dados['metricas']
     
     if not df_metricas.empty:
         col1, col2, col3, col4 = st.columns(4)
@@ -108,20 +442,7 @@ def main():
     
     with col1:
         st.subheader("🏆 Top 10 Clientes por Receita")
-        query_top_clientes = """
-        SELECT 
-            c.nome,
-            COUNT(p.id) as total_pedidos,
-            SUM(p.valor_bruto) as receita_total
-        FROM public.clientes c
-        LEFT JOIN public.pedidos p ON c.id = p.cliente_id
-        GROUP BY c.id, c.nome
-        HAVING SUM(p.valor_bruto) IS NOT NULL
-        ORDER BY receita_total DESC
-        LIMIT 10
-        """
-        
-        df_top_clientes = conectar_e_consultar(query_top_clientes)
+        df_top_clientes = dados['top_clientes']
         
         if not df_top_clientes.empty:
             fig_clientes = px.bar(
@@ -139,19 +460,7 @@ def main():
     
     with col2:
         st.subheader("📦 Top 10 Produtos por Vendas")
-        query_top_produtos = """
-        SELECT 
-            SUBSTRING(observacoes FROM '^([^-]+)') as produto,
-            COUNT(*) as total_vendas,
-            SUM(valor_bruto) as receita_total
-        FROM public.pedidos
-        WHERE observacoes IS NOT NULL
-        GROUP BY SUBSTRING(observacoes FROM '^([^-]+)')
-        ORDER BY receita_total DESC
-        LIMIT 10
-        """
-        
-        df_top_produtos = conectar_e_consultar(query_top_produtos)
+        df_top_produtos = dados['top_produtos']
         
         if not df_top_produtos.empty:
             fig_produtos = px.pie(
@@ -166,59 +475,7 @@ def main():
             st.info("Aguardando dados de produtos...")
     
     # Row 2: Evolução Temporal
-    st.subheader("📈 Evolução de Vendas (Últimos 7 dias)")
-    
-    query_evolucao = """
-    SELECT 
-        DATE(data_pedido) as data,
-        COUNT(*) as pedidos_do_dia,
-        SUM(valor_bruto) as receita_do_dia
-    FROM public.pedidos
-    WHERE data_pedido >= CURRENT_DATE - INTERVAL '7 days'
-    GROUP BY DATE(data_pedido)
-    ORDER BY data
-    """
-    
-    df_evolucao = conectar_e_consultar(query_evolucao)
-    
-    if not df_evolucao.empty:
-        # Duas métricas em gráfico de linha
-        fig_evolucao = go.Figure()
-        
-        # Pedidos (eixo Y esquerdo)
-        fig_evolucao.add_trace(
-            go.Scatter(
-                x=df_evolucao['data'],
-                y=df_evolucao['pedidos_do_dia'],
-                name='Pedidos',
-                line=dict(color='blue'),
-                yaxis='y'
-            )
-        )
-        
-        # Receita (eixo Y direito)
-        fig_evolucao.add_trace(
-            go.Scatter(
-                x=df_evolucao['data'],
-                y=df_evolucao['receita_do_dia'],
-                name='Receita (R$)',
-                line=dict(color='green'),
-                yaxis='y2'
-            )
-        )
-        
-        # Layout com dois eixos Y
-        fig_evolucao.update_layout(
-            title="Evolução de Pedidos e Receita",
-            xaxis=dict(title="Data"),
-            yaxis=dict(title="Número de Pedidos", side="left"),
-            yaxis2=dict(title="Receita (R$)", side="right", overlaying="y"),
-            height=400
-        )
-        
-        st.plotly_chart(fig_evolucao, use_container_width=True)
-    else:
-        st.info("Aguardando dados de evolução temporal...")
+    painel_evolucao()
     
     # ====== DADOS RECENTES ======
     st.header("🔥 Atividade Recente")
@@ -227,127 +484,32 @@ def main():
     
     with col1:
         st.subheader("👥 Últimos Clientes")
-        query_ultimos_clientes = """
-        SELECT nome, email, data_cadastro
-        FROM public.clientes
-        ORDER BY id DESC
-        LIMIT 5
-        """
-        
-        df_ultimos_clientes = conectar_e_consultar(query_ultimos_clientes)
+        df_ultimos_clientes = st.session_state['recentes_ultimos_clientes']['df']
         if not df_ultimos_clientes.empty:
-            st.dataframe(df_ultimos_clientes, use_container_width=True)
+            st.dataframe(df_ultimos_clientes[['nome', 'email', 'data_cadastro']], use_container_width=True)
         else:
             st.info("Nenhum cliente encontrado")
     
     with col2:
         st.subheader("🛒 Últimos Pedidos")
-        query_ultimos_pedidos = """
-        SELECT 
-            p.id,
-            c.nome,
-            p.numero_pedido,
-            p.observacoes,
-            p.valor_bruto as valor_total,
-            p.data_pedido
-        FROM public.pedidos p
-        JOIN public.clientes c ON p.cliente_id = c.id
-        ORDER BY p.id DESC
-        LIMIT 5
-        """
-        
-        df_ultimos_pedidos = conectar_e_consultar(query_ultimos_pedidos)
+        df_ultimos_pedidos = st.session_state['recentes_ultimos_pedidos']['df'].drop(columns='updated_at', errors='ignore')
         if not df_ultimos_pedidos.empty:
-            # Formatar valor
+            # Formatar valor (na cópia exibida; o estado da sessão mantém o número)
             df_ultimos_pedidos['valor_total'] = df_ultimos_pedidos['valor_total'].apply(lambda x: f"R$ {x:.2f}")
             st.dataframe(df_ultimos_pedidos, use_container_width=True)
         else:
             st.info("Nenhum pedido encontrado")
     
     # ====== STATUS DO PIPELINE ======
-    st.header("⚙️ Status do Pipeline DBT")
-    
-    # Verificar se as tabelas DBT existem
-    query_pipeline_status = """
-    SELECT 
-        'bronze_clientes' as tabela,
-        COUNT(*) as registros
-    FROM public_bronze.bronze_clientes
-    UNION ALL
-    SELECT 
-        'bronze_pedidos',
-        COUNT(*)
-    FROM public_bronze.bronze_pedidos
-    UNION ALL
-    SELECT 
-        'silver_clientes',
-        COUNT(*)
-    FROM public_silver.dim_clientes
-    UNION ALL
-    SELECT 
-        'silver_pedidos',
-        COUNT(*)
-    FROM public_silver.fct_pedidos
-    UNION ALL
-    SELECT 
-        'gold_analise_coorte',
-        COUNT(*)
-    FROM public_gold.gold_analise_coorte
-    UNION ALL
-    SELECT 
-        'gold_deteccao_anomalias',
-        COUNT(*)
-    FROM public_gold.gold_deteccao_anomalias
-    """
-    
-    df_pipeline = conectar_e_consultar(query_pipeline_status)
-    
-    if not df_pipeline.empty:
-        # Organizar em 3 linhas: Bronze, Silver, Gold
-        bronze_tables = df_pipeline[df_pipeline['tabela'].str.contains('bronze')]
-        silver_tables = df_pipeline[df_pipeline['tabela'].str.contains('silver')]
-        gold_tables = df_pipeline[df_pipeline['tabela'].str.contains('gold')]
-        
-        # Bronze Layer
-        if not bronze_tables.empty:
-            st.subheader("🟤 Camada Bronze")
-            cols = st.columns(len(bronze_tables))
-            for i, (col, row) in enumerate(zip(cols, bronze_tables.itertuples())):
-                with col:
-                    st.metric(
-                        label=row.tabela.replace('bronze_', '').title(),
-                        value=f"{row.registros} registros",
-                        delta=None
-                    )
-        
-        # Silver Layer
-        if not silver_tables.empty:
-            st.subheader("🥈 Camada Silver")
-            cols = st.columns(len(silver_tables))
-            for i, (col, row) in enumerate(zip(cols, silver_tables.itertuples())):
-                with col:
-                    st.metric(
-                        label=row.tabela.replace('silver_', '').title(),
-                        value=f"{row.registros} registros",
-                        delta=None
-                    )
-        
-        # Gold Layer
-        if not gold_tables.empty:
-            st.subheader("🥇 Camada Gold")
-            cols = st.columns(len(gold_tables))
-            for i, (col, row) in enumerate(zip(cols, gold_tables.itertuples())):
-                with col:
-                    st.metric(
-                        label=row.tabela.replace('gold_', '').replace('_', ' ').title(),
-                        value=f"{row.registros} registros",
-                        delta=None
-                    )
+    painel_status_pipeline()
     
     # Footer
     st.markdown("---")
     st.markdown(f"🕐 Última atualização: {datetime.now().strftime('%H:%M:%S')}")
-    st.markdown("💡 **Dica**: Os dados são atualizados automaticamente a cada 5 segundos")
+    st.markdown(f"💡 **Dica**: A página verifica mudanças a cada {INTERVALO_ATUALIZACAO} segundos "
+                "e só reconsulta os painéis cujas tabelas mudaram")
+    st.markdown("📦 Métricas, rankings e evolução vêm das tabelas gold_dashboard_* "
+                "(atualizadas a cada execução do dbt)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
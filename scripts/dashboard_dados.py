@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Camada de acesso a dados do dashboard
+
+Um pool de conexões por processo do Streamlit (criado via st.cache_resource no
+dashboard), compartilhado por todas as sessões: cada atualização da página
+pega uma conexão, executa todas as consultas da tela nela e a devolve. O
+número de conexões com a origem fica limitado a `maximo`, independentemente
+da quantidade de usuários; quem chega com o pool ocupado espera por uma vaga.
+
+A atualização ao vivo também é por processo: VigiaVersoes lê em uma thread a
+assinatura das tabelas (detector_mudancas, estratégia 'stats') a cada poucos
+segundos, e DadosDashboard só reconsulta os painéis cujas tabelas mudaram. Com
+N sessões abertas a origem recebe uma sonda por intervalo, não N vezes as
+consultas da tela. Os resultados ficam em CacheResultados (LRU em memória ou
+em SQLite compartilhado entre réplicas), com a versão dos dados na chave.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Limites do pool (variáveis de ambiente, com os padrões locais)
+POOL_MINIMO = int(os.environ.get('DASHBOARD_POOL_MIN', '1'))
+POOL_MAXIMO = int(os.environ.get('DASHBOARD_POOL_MAX', '8'))
+STATEMENT_TIMEOUT_MS = int(os.environ.get('DASHBOARD_STATEMENT_TIMEOUT_MS', '5000'))
+# Cache de resultados: SQLite compartilhado entre réplicas (vazio = memória do processo)
+CACHE_ARQUIVO = os.environ.get('DASHBOARD_CACHE_FILE', '')
+CACHE_LIMITE_BYTES = int(os.environ.get('DASHBOARD_CACHE_MB', '64')) * 1024 * 1024
+
+
+class PoolConsultas:
+    """Pool de conexões somente leitura com timeout por consulta e verificação de saúde"""
+
+    def __init__(self, db_config, minimo=POOL_MINIMO, maximo=POOL_MAXIMO,
+                 statement_timeout_ms=STATEMENT_TIMEOUT_MS, espera=10, verificar_apos=30):
+        """
+        Args:
+            db_config: parâmetros de conexão do psycopg2
+            minimo/maximo: conexões mantidas abertas / limite de conexões com a origem
+            statement_timeout_ms: tempo máximo de cada consulta no servidor
+            espera: segundos aguardando uma conexão livre antes de desistir
+            verificar_apos: conexões ociosas há mais que isso (s) são testadas com SELECT 1
+        """
+        self.espera = espera
+        self.verificar_apos = verificar_apos
+        self._pool = ThreadedConnectionPool(
+            minimo, maximo,
+            connect_timeout=5,
+            application_name='dashboard',
+            options=f'-c statement_timeout={statement_timeout_ms}',
+            **db_config
+        )
+        # ThreadedConnectionPool falha quando esgotado; o semáforo faz esperar
+        self._vagas = threading.BoundedSemaphore(maximo)
+        self._ultimo_uso = {}
+
+    def _saudavel(self, conn):
+        """Testa conexões fechadas ou ociosas há muito tempo (o servidor pode tê-las derrubado)"""
+        if conn.closed:
+            return False
+        if time.monotonic() - self._ultimo_uso.get(id(conn), 0) < self.verificar_apos:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão do pool (somente leitura, autocommit)"""
+        if not self._vagas.acquire(timeout=self.espera):
+            raise TimeoutError(f"Nenhuma conexão livre em {self.espera}s")
+        conn = None
+        try:
+            conn = self._pool.getconn()
+            if not self._saudavel(conn):
+                logger.info("♻️  Conexão do dashboard inválida: reconectando")
+                self._pool.putconn(conn, close=True)
+                # Já devolvida: se o getconn abaixo falhar, o finally não a devolve de novo
+                conn = None
+                conn = self._pool.getconn()
+            if not conn.autocommit:
+                conn.set_session(readonly=True, autocommit=True)
+            yield conn
+        finally:
+            if conn is not None:
+                self._ultimo_uso[id(conn)] = time.monotonic()
+                self._pool.putconn(conn, close=bool(conn.closed))
+            self._vagas.release()
+
+    def consultar_lote(self, consultas):
+        """
+        Executa várias consultas em uma única conexão
+
+        Args:
+            consultas: sequência de (nome, sql) ou (nome, sql, parâmetros)
+
+        Returns:
+            tuple: ({nome: DataFrame}, {nome: mensagem de erro}); consultas com
+                   erro retornam DataFrame vazio
+        """
+        resultados, erros = {}, {}
+        with self.conexao() as conn:
+            for nome, sql, *parametros in consultas:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(sql, *parametros)
+                        colunas = [d[0] for d in cur.description]
+                        resultados[nome] = pd.DataFrame(cur.fetchall(), columns=colunas)
+                except psycopg2.Error as e:
+                    # Ex.: tabela gold ainda não criada ou statement_timeout
+                    erros[nome] = str(e).strip()
+                    resultados[nome] = pd.DataFrame()
+                    if conn.closed:
+                        break
+        for nome, *_ in consultas:
+            if nome not in resultados:
+                erros.setdefault(nome, "Conexão perdida durante o lote")
+                resultados[nome] = pd.DataFrame()
+        return resultados, erros
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+class VigiaVersoes:
+    """Lê a assinatura das tabelas em segundo plano; as sessões só consultam a memória"""
+
+    def __init__(self, detector, intervalo=5, run_results=None):
+        """
+        Args:
+            detector: DetectorMudancas com as tabelas lidas pelos painéis
+            intervalo: segundos entre duas leituras da assinatura
+            run_results: target/run_results.json do projeto DBT; o invocation_id
+                         da última execução entra na versão das tabelas do dbt
+        """
+        self.detector = detector
+        self.intervalo = intervalo
+        self.run_results = Path(run_results) if run_results else None
+        self._assinatura = None
+        self._execucao_dbt = None
+        self._mtime_run_results = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._executar, name='vigia-dashboard', daemon=True)
+        self._thread.start()
+
+    def _ler_execucao_dbt(self):
+        """invocation_id da última execução do dbt (relido só quando o arquivo muda)"""
+        try:
+            mtime = self.run_results.stat().st_mtime
+            if mtime == self._mtime_run_results:
+                return self._execucao_dbt
+            with open(self.run_results, encoding='utf-8') as f:
+                execucao = json.load(f).get('metadata', {}).get('invocation_id')
+            self._mtime_run_results = mtime
+            return execucao
+        except (OSError, ValueError):
+            return None
+
+    def _executar(self):
+        while True:
+            execucao = self._ler_execucao_dbt() if self.run_results else None
+            try:
+                assinatura = self.detector.assinatura()
+            except Exception as e:
+                logger.warning(f"⚠️  Falha ao consultar versões das tabelas: {e}")
+                assinatura = None
+            with self._lock:
+                self._assinatura = assinatura
+                self._execucao_dbt = execucao
+            time.sleep(self.intervalo)
+
+    def versao(self, tabelas):
+        """
+        Versão dos dados das `tabelas`: a assinatura de cada uma e, para as
+        tabelas do dbt ("schema.tabela"), a última execução do dbt. Sem leitura
+        válida da assinatura, a versão passa a ser a janela de tempo atual, e os
+        resultados expiram a cada `intervalo`.
+
+        Returns:
+            tuple
+        """
+        with self._lock:
+            if self._assinatura is None:
+                return ('tempo', int(time.time() // self.intervalo))
+            versao = tuple(self._assinatura.get(tabela) for tabela in tabelas)
+            if any('.' in tabela for tabela in tabelas):
+                versao += (self._execucao_dbt,)
+            return versao
+
+
+class CacheResultados:
+    """
+    Cache LRU de DataFrames com limite de tamanho (bytes serializados)
+
+    Em memória, é local ao processo; com `caminho`, fica em um SQLite
+    compartilhado pelas réplicas do dashboard na mesma máquina/volume. Os
+    DataFrames são guardados em Parquet (só dados): o conteúdo do arquivo
+    compartilhado nunca é executado, ao contrário de um pickle.
+    """
+
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS resultados (
+        chave TEXT PRIMARY KEY,
+        valor BLOB NOT NULL,
+        tamanho INTEGER NOT NULL,
+        usado_em REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_resultados_usado_em ON resultados (usado_em);
+    """
+
+    def __init__(self, limite_bytes=CACHE_LIMITE_BYTES, caminho=None):
+        self.limite_bytes = limite_bytes
+        self.caminho = str(caminho) if caminho else None
+        self._memoria = OrderedDict()  # chave -> bytes, do menos para o mais recente
+        self._tamanho = 0
+        self._lock = threading.Lock()
+        if self.caminho:
+            with self._conexao() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(self.ESQUEMA)
+
+    @staticmethod
+    def chave(sql, versao, parametros=None):
+        """Chave de um resultado: a consulta, seus parâmetros e a versão dos dados que ela lê"""
+        return hashlib.sha256(f"{sql}\x00{parametros!r}\x00{versao!r}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _serializar(df):
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _desserializar(valor):
+        """DataFrame do Parquet guardado, ou None se o conteúdo não for um Parquet válido"""
+        try:
+            return pd.read_parquet(io.BytesIO(valor))
+        except Exception as e:
+            # Ex.: entrada gravada por uma versão antiga do cache: tratada como ausente
+            logger.warning(f"⚠️  Resultado inválido no cache descartado: {e}")
+            return None
+
+    @contextmanager
+    def _conexao(self):
+        conn = sqlite3.connect(self.caminho, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def obter(self, chave):
+        """DataFrame guardado na chave, ou None"""
+        if self.caminho:
+            with self._conexao() as conn:
+                linha = conn.execute("SELECT valor FROM resultados WHERE chave = ?", (chave,)).fetchone()
+                if linha is None:
+                    return None
+                conn.execute("UPDATE resultados SET usado_em = ? WHERE chave = ?", (time.time(), chave))
+            return self._desserializar(linha[0])
+        with self._lock:
+            valor = self._memoria.get(chave)
+            if valor is None:
+                return None
+            self._memoria.move_to_end(chave)
+        return self._desserializar(valor)
+
+    def guardar(self, chave, df):
+        """Guarda o DataFrame e descarta os menos usados recentemente acima do limite"""
+        valor = self._serializar(df)
+        if len(valor) > self.limite_bytes:
+            return  # Maior que o cache inteiro: não vale guardar
+        if self.caminho:
+            with self._conexao() as conn:
+                conn.execute("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?)",
+                             (chave, valor, len(valor), time.time()))
+                conn.execute("""
+                    DELETE FROM resultados WHERE chave IN (
+                        SELECT chave FROM (
+                            SELECT chave, SUM(tamanho) OVER (ORDER BY usado_em DESC, chave) as acumulado
+                            FROM resultados
+                        ) WHERE acumulado > ?
+                    )
+                """, (self.limite_bytes,))
+            return
+        with self._lock:
+            if chave in self._memoria:
+                self._tamanho -= len(self._memoria.pop(chave))
+            self._memoria[chave] = valor
+            self._tamanho += len(valor)
+            while self._tamanho > self.limite_bytes:
+                _, descartado = self._memoria.popitem(last=False)
+                self._tamanho -= len(descartado)
+
+
+class DadosDashboard:
+    """
+    Resultados dos painéis compartilhados entre as sessões (e, com cache em
+    SQLite, entre réplicas), indexados pela consulta e pela versão das tabelas
+    de que dependem: uma escrita nas tabelas ou uma nova execução do dbt muda a
+    chave, então nenhum resultado sobrevive a uma mudança nos dados
+    """
+
+    def __init__(self, pool, vigia, cache=None):
+        self.pool = pool
+        self.vigia = vigia
+        self.cache = cache or CacheResultados()
+        # Single-flight por chave: quem pede um resultado que outra sessão já está
+        # consultando espera por ele; chaves diferentes consultam em paralelo
+        self._lock = threading.Lock()
+        self._travas = {}  # chave -> [Lock, sessões usando]
+
+    @contextmanager
+    def _exclusivo(self, chaves):
+        """Trava as `chaves` de cache (sempre na mesma ordem, sem deadlock entre lotes)"""
+        with self._lock:
+            travas = []
+            for chave in sorted(set(chaves)):
+                trava = self._travas.setdefault(chave, [threading.Lock(), 0])
+                trava[1] += 1
+                travas.append((chave, trava))
+        adquiridas = []
+        try:
+            for _, (lock, _) in travas:
+                lock.acquire()
+                adquiridas.append(lock)
+            yield
+        finally:
+            for lock in adquiridas:
+                lock.release()
+            with self._lock:
+                for chave, trava in travas:
+                    trava[1] -= 1
+                    if not trava[1]:
+                        del self._travas[chave]
+
+    def carregar(self, paineis):
+        """
+        Args:
+            paineis: {nome: (sql, tabelas)} ou {nome: (sql, tabelas, parâmetros)}
+
+        Returns:
+            tuple: ({nome: DataFrame}, {nome: erro}, {nome: versão}); só os
+                   painéis sem resultado para a versão atual são consultados,
+                   em uma conexão
+        """
+        versoes = {nome: self.vigia.versao(tabelas) for nome, (_, tabelas, *_) in paineis.items()}
+        chaves = {nome: CacheResultados.chave(sql, versoes[nome], *parametros)
+                  for nome, (sql, _, *parametros) in paineis.items()}
+        dados, erros = {}, {}
+
+        def faltantes(consultas):
+            pendentes = []
+            for nome, sql, *parametros in consultas:
+                df = self.cache.obter(chaves[nome])
+                if df is None:
+                    pendentes.append((nome, sql, *parametros))
+                else:
+                    dados[nome] = df
+            return pendentes
+
+        pendentes = faltantes((nome, sql, *parametros) for nome, (sql, _, *parametros) in paineis.items())
+        if pendentes:
+            with self._exclusivo(chaves[nome] for nome, *_ in pendentes):
+                # Outra sessão pode ter consultado enquanto esperávamos
+                pendentes = faltantes(pendentes)
+                if pendentes:
+                    resultados, erros = self.pool.consultar_lote(pendentes)
+                    for nome, df in resultados.items():
+                        dados[nome] = df
+                        if nome not in erros:
+                            self.cache.guardar(chaves[nome], df)
+        return dados, erros, versoes
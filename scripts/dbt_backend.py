@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends de execução do DBT
+
+- SubprocessBackend: chama o executável `dbt` (um processo novo por comando,
+  que reimporta o dbt-core, refaz o parse do projeto e reabre as conexões)
+- InProcessBackend: mantém o dbt carregado neste processo e o executa pelo
+  runner programático (dbt.cli.main.dbtRunner), reaproveitando o manifest
+  já parseado entre os comandos e entre os ciclos do scheduler
+
+Os dois expõem executar(args) -> bool, com args no formato da linha de comando
+(ex: ['dbt', 'run', '--select', 'fct_pedidos']), e registram a sobrecarga de
+cada comando: tempo total menos o tempo que o próprio dbt reporta para a
+execução dos nós (elapsed_time do run_results).
+
+executar_com_resultados(args) devolve também o run_results.json da própria
+invocação: os comandos de um backend são serializados e o arquivo é lido antes
+que o próximo comando comece, então ele não pode ter sido sobrescrito por
+outra invocação deste processo.
+"""
+
+import json
+import logging
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Diretórios do projeto DBT cujas alterações invalidam o manifest.json
+DIRETORIOS_PROJETO = ('models', 'macros', 'seeds', 'snapshots', 'tests')
+
+# Comandos que não usam o manifest (não disparam o parse no backend in-process)
+COMANDOS_SEM_MANIFEST = {'debug', 'deps', 'clean', 'init'}
+
+
+def projeto_alterado_desde(dbt_project_dir, instante):
+    """True se algum arquivo do projeto foi modificado depois de `instante` (epoch)"""
+    projeto = Path(dbt_project_dir)
+    arquivos = [projeto / "dbt_project.yml"] + [
+        arquivo
+        for diretorio in DIRETORIOS_PROJETO
+        for arquivo in (projeto / diretorio).rglob("*")
+        if arquivo.is_file()
+    ]
+    return any(arquivo.exists() and arquivo.stat().st_mtime > instante for arquivo in arquivos)
+
+
+def ler_run_results(dbt_project_dir, desde):
+    """target/run_results.json, se ele foi gerado depois de `desde` (epoch); senão None"""
+    run_results = Path(dbt_project_dir) / "target" / "run_results.json"
+    try:
+        if run_results.stat().st_mtime < desde:
+            return None
+        with open(run_results, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def dbt_importavel():
+    """True se o dbt-core pode ser importado neste interpretador"""
+    try:
+        import dbt.version  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class SubprocessBackend:
+    """Executa o DBT como processo externo"""
+
+    nome = 'subprocess'
+
+    def __init__(self, dbt_project_dir, timeout=600):
+        self.dbt_project_dir = dbt_project_dir
+        self.timeout = timeout
+        self.ultima_sobrecarga = None
+        # Dois processos dbt no mesmo projeto disputariam os arquivos de target/
+        self._lock = threading.Lock()
+
+    def versao(self):
+        """Versão do DBT instalado, ou None se não encontrado"""
+        try:
+            result = subprocess.run(["dbt", "--version"], capture_output=True, text=True, timeout=30)
+        except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+            logger.error(f"DBT não encontrado ou timeout: {e}")
+            return None
+        if result.returncode != 0:
+            logger.error(f"Erro ao verificar DBT: {result.stderr}")
+            return None
+        return result.stdout.strip()
+
+    def executar(self, command):
+        """
+        Executa um comando DBT
+
+        Args:
+            command: Lista com o comando DBT (ex: ['dbt', 'run'])
+
+        Returns:
+            bool: True se sucesso, False se erro
+        """
+        return self.executar_com_resultados(command)[0]
+
+    def executar_com_resultados(self, command):
+        """
+        Executa um comando DBT e lê o run_results.json gerado por ele
+
+        Returns:
+            tuple: (sucesso, run_results da invocação ou None)
+        """
+        with self._lock:
+            try:
+                logger.info(f"Executando: {' '.join(command)}")
+                inicio_epoch = time.time()
+                inicio = time.monotonic()
+
+                result = subprocess.run(
+                    command,
+                    cwd=self.dbt_project_dir,
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout
+                )
+
+                duracao = time.monotonic() - inicio
+                run_results = ler_run_results(self.dbt_project_dir, inicio_epoch)
+                elapsed = (run_results or {}).get('elapsed_time')
+                self.ultima_sobrecarga = duracao - elapsed if elapsed is not None else None
+
+                if result.returncode == 0:
+                    logger.info(f"✅ Comando executado com sucesso em {duracao:.2f}s"
+                                + (f" (sobrecarga {self.ultima_sobrecarga:.2f}s)" if elapsed is not None else ""))
+                    if result.stdout:
+                        logger.debug(f"Output: {result.stdout}")
+                    return True, run_results
+                else:
+                    logger.error(f"❌ Erro na execução: {result.stderr}")
+                    if result.stdout:
+                        logger.error(f"Output: {result.stdout}")
+                    return False, run_results
+
+            except subprocess.TimeoutExpired:
+                logger.error(f"⏰ Timeout na execução do comando: {' '.join(command)}")
+                return False, None
+            except Exception as e:
+                logger.error(f"💥 Erro inesperado: {e}")
+                return False, None
+
+
+class InProcessBackend:
+    """
+    Executa o DBT dentro deste processo pelo dbtRunner
+
+    O manifest é parseado uma vez e reutilizado em todos os comandos; só é
+    refeito quando algum arquivo do projeto muda. O dbtRunner não suporta
+    invocações simultâneas, então as chamadas são serializadas por um lock:
+    para paralelismo entre modelos use um único `dbt build --threads N`.
+    """
+
+    nome = 'inprocess'
+
+    def __init__(self, dbt_project_dir):
+        from dbt.cli.main import dbtRunner  # Import tardio: dbt-core é opcional
+
+        self._runner_cls = dbtRunner
+        self.dbt_project_dir = dbt_project_dir
+        self.manifest = None
+        self._parse_em = 0.0
+        self._lock = threading.Lock()
+        self.ultima_sobrecarga = None
+
+    def versao(self):
+        from dbt.version import __version__
+        return __version__
+
+    def _args(self, command):
+        args = list(command[1:] if command and command[0] == 'dbt' else command)
+        if '--project-dir' not in args:
+            args += ['--project-dir', str(self.dbt_project_dir)]
+        return args
+
+    def _garantir_manifest(self):
+        """Parse do projeto só na primeira vez e quando algum arquivo mudou"""
+        if self.manifest is not None and not projeto_alterado_desde(self.dbt_project_dir, self._parse_em):
+            return True
+        logger.info("📖 Parse do projeto DBT (manifest em memória)")
+        inicio = time.time()
+        res = self._runner_cls().invoke(self._args(['parse']))
+        if not res.success:
+            logger.error(f"❌ Falha no parse do projeto: {res.exception}")
+            return False
+        self.manifest = res.result
+        self._parse_em = inicio
+        return True
+
+    def executar(self, command):
+        """Mesmo contrato de SubprocessBackend.executar"""
+        return self.executar_com_resultados(command)[0]
+
+    def executar_com_resultados(self, command):
+        """Mesmo contrato de SubprocessBackend.executar_com_resultados"""
+        with self._lock:
+            try:
+                logger.info(f"Executando (in-process): {' '.join(command)}")
+                inicio_epoch = time.time()
+                inicio = time.monotonic()
+
+                args = self._args(command)
+                if args[0] == 'parse':
+                    self.manifest = None
+                    return self._garantir_manifest(), None
+                if args[0] in COMANDOS_SEM_MANIFEST:
+                    runner = self._runner_cls()
+                else:
+                    if not self._garantir_manifest():
+                        return False, None
+                    runner = self._runner_cls(manifest=self.manifest)
+
+                res = runner.invoke(args)
+
+                duracao = time.monotonic() - inicio
+                elapsed = getattr(res.result, 'elapsed_time', None)
+                self.ultima_sobrecarga = duracao - elapsed if elapsed is not None else None
+                # Gravado pelo dbt ao fim desta invocação, ainda dentro do lock
+                run_results = ler_run_results(self.dbt_project_dir, inicio_epoch)
+
+                if res.success:
+                    logger.info(f"✅ Comando executado com sucesso em {duracao:.2f}s"
+                                + (f" (sobrecarga {self.ultima_sobrecarga:.2f}s)" if elapsed is not None else ""))
+                    return True, run_results
+                logger.error(f"❌ Erro na execução: {res.exception or 'nós com erro'}")
+                return False, run_results
+
+            except Exception as e:
+                logger.error(f"💥 Erro inesperado: {e}")
+                return False, None
+
+
+def criar_backend(nome, dbt_project_dir):
+    """
+    Cria o backend pelo nome: 'subprocess', 'inprocess' ou 'auto'
+    ('auto' usa o in-process quando o dbt-core é importável)
+    """
+    if nome == 'auto':
+        nome = 'inprocess' if dbt_importavel() else 'subprocess'
+    elif nome == 'inprocess' and not dbt_importavel():
+        logger.warning("dbt-core não importável neste Python: usando o backend subprocess")
+        nome = 'subprocess'
+    if nome == 'inprocess':
+        return InProcessBackend(dbt_project_dir)
+    return SubprocessBackend(dbt_project_dir)
+
+
+def comparar_backends(dbt_project_dir, command=('dbt', 'run'), ciclos=3):
+    """
+    Mede a sobrecarga por ciclo de cada backend executando `command` `ciclos` vezes
+
+    Returns:
+        dict: {backend: {'duracao_media', 'sobrecarga_media'}}
+    """
+    resultado = {}
+    for nome in ('subprocess', 'inprocess'):
+        if nome == 'inprocess' and not dbt_importavel():
+            logger.warning("dbt-core não importável: backend in-process não medido")
+            continue
+        backend = criar_backend(nome, dbt_project_dir)
+        duracoes, sobrecargas = [], []
+        for _ in range(ciclos):
+            inicio = time.monotonic()
+            backend.executar(list(command))
+            duracoes.append(time.monotonic() - inicio)
+            if backend.ultima_sobrecarga is not None:
+                sobrecargas.append(backend.ultima_sobrecarga)
+        resultado[nome] = {
+            'duracao_media': sum(duracoes) / len(duracoes),
+            'sobrecarga_media': sum(sobrecargas) / len(sobrecargas) if sobrecargas else None,
+        }
+    return resultado
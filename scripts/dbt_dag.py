@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grafo de dependências do projeto DBT
+
+Lê o target/manifest.json e expõe as dependências entre os nós executáveis
+(seed, snapshot, modelo): quais nós leem cada tabela de origem (reconstrução
+seletiva do scheduler) e o caminho crítico de um ciclo a partir dos tempos de
+cada nó (relatório de historico_execucoes).
+
+A execução em si fica com um único `dbt build --threads N`, que percorre o
+mesmo DAG com o pool de threads do dbt e roda os testes de cada modelo logo
+após ele, em uma só invocação (um parse, um diretório target/ consistente).
+"""
+
+import json
+
+# Tipos de nó executáveis
+TIPOS_EXECUTAVEIS = ('seed', 'snapshot', 'model')
+
+
+class GrafoDBT:
+    """Grafo de dependências entre os nós executáveis de um manifest do DBT"""
+
+    def __init__(self, nos, dependencias, fontes=None):
+        """
+        Args:
+            nos: {unique_id: {'nome', 'tipo'}} dos nós executáveis
+            dependencias: {unique_id: set(unique_ids executáveis dos quais depende)}
+            fontes: {tabela de origem: set(unique_ids que a leem diretamente)}
+        """
+        self.nos = nos
+        self.dependencias = dependencias
+        self.fontes = fontes or {}
+        self.dependentes = {uid: set() for uid in nos}
+        for uid, deps in dependencias.items():
+            for dep in deps:
+                self.dependentes[dep].add(uid)
+
+    @classmethod
+    def do_manifest(cls, caminho_manifest, tipos=TIPOS_EXECUTAVEIS):
+        """Monta o grafo a partir do target/manifest.json"""
+        with open(caminho_manifest, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        nos = {
+            uid: {'nome': no['name'], 'tipo': no['resource_type']}
+            for uid, no in manifest['nodes'].items()
+            if no['resource_type'] in tipos
+        }
+        dependencias = {
+            uid: {dep for dep in manifest['nodes'][uid].get('depends_on', {}).get('nodes', []) if dep in nos}
+            for uid in nos
+        }
+        # Tabela física de cada source (raw_data.pedidos e public.pedidos são a mesma tabela)
+        tabela_do_source = {uid: fonte['identifier'] for uid, fonte in manifest.get('sources', {}).items()}
+        fontes = {}
+        for uid in nos:
+            for dep in manifest['nodes'][uid].get('depends_on', {}).get('nodes', []):
+                if dep in tabela_do_source:
+                    fontes.setdefault(tabela_do_source[dep], set()).add(uid)
+        return cls(nos, dependencias, fontes)
+
+    def descendentes(self, uids):
+        """Fecho de todos os nós que dependem (direta ou indiretamente) de `uids`"""
+        visitados = set()
+        pendentes = list(uids)
+        while pendentes:
+            uid = pendentes.pop()
+            for filho in self.dependentes.get(uid, ()):
+                if filho not in visitados:
+                    visitados.add(filho)
+                    pendentes.append(filho)
+        return visitados
+
+    def afetados_por(self, tabelas):
+        """Nós que leem `tabelas` de origem, direta ou indiretamente"""
+        diretos = set().union(*(self.fontes.get(tabela, set()) for tabela in tabelas))
+        return diretos | self.descendentes(diretos)
+
+    def caminho_critico(self, duracoes):
+        """
+        Caminho mais longo do grafo pesado pelas `duracoes` ({unique_id: s})
+
+        Com workers suficientes, é o limite inferior da duração de um ciclo:
+        os nós desse caminho nunca rodam em paralelo entre si.
+
+        Returns:
+            tuple: (duração total, [unique_ids do caminho, da raiz à folha])
+        """
+        melhor = {}
+        anterior = {}
+        pendentes = {uid: set(deps) for uid, deps in self.dependencias.items()}
+        prontos = [uid for uid, deps in pendentes.items() if not deps]
+        while prontos:
+            uid = prontos.pop()
+            origem = max(self.dependencias[uid], key=lambda dep: melhor[dep], default=None)
+            anterior[uid] = origem
+            melhor[uid] = duracoes.get(uid, 0.0) + (melhor[origem] if origem else 0.0)
+            for filho in self.dependentes[uid]:
+                pendentes[filho].discard(uid)
+                if not pendentes[filho]:
+                    prontos.append(filho)
+
+        if not melhor:
+            return 0.0, []
+        uid = max(melhor, key=melhor.get)
+        total = melhor[uid]
+        caminho = []
+        while uid:
+            caminho.append(uid)
+            uid = anterior[uid]
+        return total, caminho[::-1]
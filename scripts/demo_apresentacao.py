@@ -73,19 +73,13 @@ class DemoOrchestrator:
         print("🔧 Executando modelos DBT...")
         
         try:
-            # Bronze
+            # Bronze e Silver em uma única invocação: o dbt segue o DAG e roda
+            # os ramos independentes em paralelo (threads do profile)
             subprocess.run([
                 'docker', 'compose', 'exec', '-T', 'dbt_runner', 
-                'dbt', 'run', '--select', 'tag:bronze'
+                'dbt', 'run', '--select', 'tag:bronze', 'tag:silver'
             ], check=True)
-            print("   ✅ Modelos Bronze executados")
-            
-            # Silver
-            subprocess.run([
-                'docker', 'compose', 'exec', '-T', 'dbt_runner', 
-                'dbt', 'run', '--select', 'tag:silver'
-            ], check=True)
-            print("   ✅ Modelos Silver executados")
+            print("   ✅ Modelos Bronze e Silver executados")
             
             return True
         except subprocess.CalledProcessError:
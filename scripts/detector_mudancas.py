@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detecção de mudanças nas tabelas de origem
+
+Usado pelo scheduler para disparar o DBT só quando chegam dados novos, em vez
+de rodar em intervalo fixo, e pelo dashboard para reconsultar só os painéis
+cujas tabelas mudaram. Duas estratégias, ambas com custo constante:
+
+- 'stats': contadores n_tup_ins/n_tup_upd/n_tup_del de pg_stat_user_tables
+  (uma única consulta ao catálogo para todas as tabelas)
+- 'updated_at': max(updated_at) de cada tabela, resolvido pelos índices
+  idx_*_updated_at (postgres_init_scripts/init_source_db.sql); com
+  lookback_minutos, também o número de linhas na janela [max - lookback, max],
+  que acusa linhas confirmadas depois com updated_at mais antigo
+
+MarcasDagua guarda em disco o max(updated_at) de cada tabela na última
+execução bem-sucedida, para que o scheduler reconstrua só os modelos afetados
+pelas tabelas que mudaram, inclusive depois de reiniciado. Exclusões físicas
+não alteram max(updated_at) e não são detectadas por essa estratégia.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Tabelas de origem lidas pelos modelos DBT (schema public)
+TABELAS_ORIGEM = ('clientes', 'pedidos', 'produtos', 'itens_pedido', 'campanhas_marketing', 'leads')
+
+# Conexão com o banco de origem: as variáveis DBT_TARGET_* do profiles.yml (o dbt lê e
+# grava no mesmo banco), com os padrões do acesso local (porta 5430 publicada pelo docker)
+SOURCE_DB_CONFIG = {
+    'host': os.environ.get('DBT_TARGET_HOST', 'localhost'),
+    'port': int(os.environ.get('DBT_TARGET_PORT', '5430')),
+    'database': os.environ.get('DBT_TARGET_DB', 'db_source'),
+    'user': os.environ.get('DBT_TARGET_USER', 'admin'),
+    'password': os.environ.get('DBT_TARGET_PASSWORD', 'admin'),
+}
+
+
+class DetectorMudancas:
+    """
+    Lê uma "assinatura" barata das tabelas de origem e compara entre leituras
+
+    As tabelas são nomes do schema public ou "schema.tabela" (ex.: as tabelas
+    gold lidas pelo dashboard).
+    """
+
+    def __init__(self, db_config=None, tabelas=TABELAS_ORIGEM, estrategia='stats', lookback_minutos=0):
+        if estrategia not in ('stats', 'updated_at'):
+            raise ValueError(f"Estratégia desconhecida: {estrategia}")
+        self.db_config = db_config or SOURCE_DB_CONFIG
+        self.tabelas = tuple(tabelas)
+        self.estrategia = estrategia
+        # Estratégia 'updated_at': mesma janela do incremental_watermark
+        # (var incremental_lookback_minutes do dbt_project.yml)
+        self.lookback_minutos = lookback_minutos
+        self._conn = None
+
+    def _conexao(self):
+        import psycopg2  # Import tardio: só o modo por mudança precisa do driver
+
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(connect_timeout=10, **self.db_config)
+            self._conn.autocommit = True
+        return self._conn
+
+    def fechar(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+
+    def assinatura(self):
+        """
+        Returns:
+            dict: {tabela: valor}; o valor muda sempre que a tabela recebe escrita
+        """
+        try:
+            cur = self._conexao().cursor()
+            if self.estrategia == 'stats':
+                # O oid muda quando o dbt recria a tabela (materialização table);
+                # partições (incremental_particionado) são somadas na tabela pai
+                cur.execute("""
+                    SELECT tabela, MAX(oid)::text || ':' || SUM(escritas)::text
+                    FROM (
+                        SELECT
+                            CASE WHEN s.schemaname = 'public' THEN COALESCE(pai.relname, s.relname)
+                                 ELSE s.schemaname || '.' || COALESCE(pai.relname, s.relname) END as tabela,
+                            COALESCE(pai.oid, s.relid) as oid,
+                            s.n_tup_ins + s.n_tup_upd + s.n_tup_del as escritas
+                        FROM pg_stat_user_tables s
+                        LEFT JOIN pg_inherits h ON h.inhrelid = s.relid
+                        LEFT JOIN pg_class pai ON pai.oid = h.inhparent
+                    ) t
+                    WHERE tabela = ANY(%s)
+                    GROUP BY tabela
+                """, (list(self.tabelas),))
+                return dict(cur.fetchall())
+
+            if not self.lookback_minutos:
+                cur.execute(" UNION ALL ".join(
+                    f"SELECT '{tabela}', MAX(updated_at) FROM {self._qualificada(tabela)}"
+                    for tabela in self.tabelas
+                ))
+                return dict(cur.fetchall())
+
+            # (max, linhas na janela de lookback) na mesma consulta, sob o mesmo snapshot:
+            # uma linha confirmada tarde com updated_at dentro da janela muda a contagem
+            # mesmo sem mover o max
+            cur.execute(" UNION ALL ".join(
+                f"""SELECT '{tabela}', m.maximo,
+                       (SELECT COUNT(*) FROM {self._qualificada(tabela)}
+                        WHERE updated_at >= m.maximo - make_interval(mins => %(lookback)s))
+                   FROM (SELECT MAX(updated_at) as maximo FROM {self._qualificada(tabela)}) m"""
+                for tabela in self.tabelas
+            ), {'lookback': int(self.lookback_minutos)})
+            return {tabela: (maximo, linhas) for tabela, maximo, linhas in cur.fetchall()}
+        except Exception:
+            # Conexão perdida: força reconexão na próxima leitura
+            self.fechar()
+            self._conn = None
+            raise
+
+    @staticmethod
+    def _qualificada(tabela):
+        return tabela if '.' in tabela else 'public.' + tabela
+
+    @staticmethod
+    def tabelas_alteradas(anterior, atual):
+        """Tabelas cuja assinatura mudou entre duas leituras"""
+        return {tabela for tabela, valor in atual.items() if anterior.get(tabela) != valor}
+
+
+class GatilhoMudancas:
+    """
+    Decide quando disparar uma execução a partir das mudanças na origem
+
+    - debounce: espera a origem ficar esse tempo sem novas escritas (agrupa rajadas)
+    - espera_minima: intervalo mínimo entre duas execuções
+    - espera_maxima: com escrita contínua, dispara mesmo sem o período de silêncio
+      quando a primeira mudança pendente tem essa idade (limita a defasagem)
+    """
+
+    def __init__(self, detector, debounce=10, espera_minima=30, espera_maxima=600, intervalo_consulta=5):
+        self.detector = detector
+        self.debounce = debounce
+        self.espera_minima = espera_minima
+        self.espera_maxima = espera_maxima
+        self.intervalo_consulta = intervalo_consulta
+        self.base = None
+        self.ultima_execucao = None
+
+    def aguardar(self, continuar=lambda: True):
+        """
+        Bloqueia até que uma execução deva ser disparada
+
+        Args:
+            continuar: função consultada a cada ciclo; retornar False interrompe a espera
+
+        Returns:
+            set: tabelas alteradas desde a última execução (vazio na primeira
+                 chamada, quando ainda não há base de comparação), ou None se
+                 a espera foi interrompida
+        """
+        if self.base is None:
+            # Primeira execução: sem base de comparação, roda tudo
+            self.base = self._ler_assinatura_ate_conseguir(continuar)
+            if self.base is None:
+                return None
+            self.ultima_execucao = time.monotonic()
+            return set()
+
+        primeira_mudanca = ultima_mudanca = None
+        leitura_anterior = self.base
+        while continuar():
+            time.sleep(self.intervalo_consulta)
+            try:
+                atual = self.detector.assinatura()
+            except Exception as e:
+                logger.warning(f"⚠️  Falha ao consultar mudanças na origem: {e}")
+                continue
+
+            agora = time.monotonic()
+            if atual != leitura_anterior:
+                ultima_mudanca = agora
+                if primeira_mudanca is None:
+                    primeira_mudanca = agora
+                    logger.info(f"📥 Dados novos em: {', '.join(sorted(self.detector.tabelas_alteradas(self.base, atual)))}")
+            leitura_anterior = atual
+
+            if primeira_mudanca is None or agora - self.ultima_execucao < self.espera_minima:
+                continue
+            if agora - ultima_mudanca >= self.debounce or agora - primeira_mudanca >= self.espera_maxima:
+                alteradas = self.detector.tabelas_alteradas(self.base, atual)
+                self.base = atual
+                self.ultima_execucao = agora
+                return alteradas
+        return None
+
+    def _ler_assinatura_ate_conseguir(self, continuar):
+        while continuar():
+            try:
+                return self.detector.assinatura()
+            except Exception as e:
+                logger.warning(f"⚠️  Falha ao consultar mudanças na origem: {e}")
+                time.sleep(self.intervalo_consulta)
+        return None
+
+
+class MarcasDagua:
+    """
+    Marcas d'água (max(updated_at) por tabela, com a contagem da janela de
+    lookback quando o detector a lê) persistidas em um arquivo JSON
+    """
+
+    def __init__(self, caminho):
+        self.caminho = Path(caminho)
+
+    def carregar(self):
+        """
+        Returns:
+            dict: {'marcas': {tabela: iso|None}, 'executado_em': epoch}, ou None
+                  se ainda não houve execução registrada
+        """
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Marcas d'água ilegíveis em {self.caminho} ({e}): execução completa")
+            return None
+
+    def salvar(self, marcas):
+        """Grava as marcas de forma atômica (arquivo temporário + rename)"""
+        temporario = self.caminho.with_name(self.caminho.name + '.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'marcas': marcas, 'executado_em': time.time()}, f, indent=2)
+        os.replace(temporario, self.caminho)
+
+    @staticmethod
+    def serializar(assinatura):
+        """Assinatura 'updated_at' do DetectorMudancas em formato JSON"""
+        def iso(valor):
+            return valor.isoformat() if valor is not None else None
+
+        return {
+            tabela: [iso(valor[0]), valor[1]] if isinstance(valor, tuple) else iso(valor)
+            for tabela, valor in assinatura.items()
+        }
@@ -9,6 +9,17 @@ import sys
 import os
 from pathlib import Path
 
+from dbt_backend import InProcessBackend, dbt_importavel
+
+# Sequência de comandos dbt de cada comando deste script
+COMANDOS_DBT = {
+    "debug": [["dbt", "debug"]],
+    "full": [["dbt", "run"], ["dbt", "test"]],
+    "test": [["dbt", "test"]],
+    "run": [["dbt", "run"]],
+    "deps": [["dbt", "deps"]],
+}
+
 def log_info(msg: str):
     print(f"ℹ️  {msg}")
 
@@ -23,6 +34,9 @@ def log_warning(msg: str):
 
 def ensure_dbt_installed():
     """Verifica se DBT está instalado"""
+    if dbt_importavel():
+        log_success("DBT já está instalado")
+        return True
     try:
         result = subprocess.run(["dbt", "--version"], capture_output=True, text=True)
         if result.returncode == 0:
@@ -57,6 +71,24 @@ def check_profiles_yml():
         log_info("Execute primeiro: python3 scripts/auto_configure_dbt.py")
         return False
 
+def run_dbt_command_inprocess(command: str, project_dir: Path):
+    """
+    Executa o comando com o dbtRunner neste processo: sem custo de
+    inicialização por comando e com um único parse para run + test
+    """
+    if command not in COMANDOS_DBT:
+        log_error(f"Comando não reconhecido: {command}")
+        return False
+    
+    backend = InProcessBackend(project_dir)
+    log_info(f"Executando dbt {command} (in-process)...")
+    for dbt_command in COMANDOS_DBT[command]:
+        if not backend.executar(dbt_command):
+            log_error(f"Comando dbt {command} falhou!")
+            return False
+    log_success(f"Comando dbt {command} executado com sucesso!")
+    return True
+
 def run_dbt_command(command: str):
     """Executa comando DBT no diretório correto"""
     
@@ -67,6 +99,9 @@ def run_dbt_command(command: str):
         log_error(f"Diretório do projeto DBT não encontrado: {project_dir}")
         return False
     
+    if dbt_importavel():
+        return run_dbt_command_inprocess(command, project_dir)
+    
     # Mudar para o diretório do projeto
     original_dir = os.getcwd()
     os.chdir(project_dir)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Histórico de desempenho das execuções do DBT
+
+Depois de cada comando dbt, o scheduler grava o tempo de execução, as linhas
+afetadas e o status de cada nó em um SQLite local, a partir do run_results.json
+daquela invocação (lido pelo backend antes do comando seguinte). O relatório
+mostra os modelos mais lentos, as regressões em relação a uma linha de base
+móvel e o caminho crítico do último ciclo.
+
+Uso:
+    python historico_execucoes.py relatorio [--db ARQUIVO] [--top N] [--baseline N] [--limiar X]
+    python historico_execucoes.py registrar [--db ARQUIVO] [--run-results ARQUIVO]
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import statistics
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from dbt_dag import GrafoDBT
+
+logger = logging.getLogger(__name__)
+
+# Tipos de nó considerados no relatório (testes e hooks ficam só no histórico)
+TIPOS_RELATORIO = ('model', 'snapshot', 'seed')
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes_nos (
+    ciclo TEXT NOT NULL,
+    invocation_id TEXT NOT NULL,
+    comando TEXT,
+    unique_id TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tempo_execucao REAL NOT NULL,
+    linhas_afetadas INTEGER,
+    concluido_em TEXT,
+    PRIMARY KEY (invocation_id, unique_id)
+);
+CREATE INDEX IF NOT EXISTS idx_execucoes_nos_unique_id ON execucoes_nos (unique_id, ciclo);
+CREATE INDEX IF NOT EXISTS idx_execucoes_nos_ciclo ON execucoes_nos (ciclo);
+"""
+
+
+def normalizar_ciclo(valor):
+    """
+    Identificador de ciclo em um único formato (ISO, hora local, em segundos),
+    para que ciclos do scheduler (datetime.now().isoformat) e generated_at do
+    run_results (UTC com microssegundos e 'Z') fiquem na mesma ordem
+    """
+    if not valor:
+        return valor
+    try:
+        instante = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+    except ValueError:
+        return valor
+    if instante.tzinfo is not None:
+        instante = instante.astimezone().replace(tzinfo=None)
+    return instante.isoformat(timespec='seconds')
+
+
+def _concluido_em(resultado, padrao):
+    """Fim da fase 'execute' do nó (ou `padrao` se o dbt não a reportou)"""
+    for fase in resultado.get('timing') or []:
+        if fase.get('name') == 'execute' and fase.get('completed_at'):
+            return fase['completed_at']
+    return padrao
+
+
+class HistoricoExecucoes:
+    """Armazena e consulta o tempo de execução de cada nó do DBT"""
+
+    def __init__(self, caminho='dbt_run_history.sqlite'):
+        self.caminho = str(caminho)
+        with self._conexao() as conn:
+            conn.executescript(ESQUEMA)
+
+    @contextmanager
+    def _conexao(self):
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conn:  # commit ao final do bloco, rollback em caso de erro
+                yield conn
+        finally:
+            conn.close()
+
+    def registrar_run_results(self, caminho_run_results, ciclo=None):
+        """
+        Grava os resultados de um arquivo run_results.json
+
+        Returns:
+            int: quantidade de nós gravados (0 se o arquivo não existe ou já foi registrado)
+        """
+        try:
+            with open(caminho_run_results, encoding='utf-8') as f:
+                run_results = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"run_results.json indisponível: {e}")
+            return 0
+        return self.registrar(run_results, ciclo=ciclo)
+
+    def registrar(self, run_results, ciclo=None):
+        """
+        Grava os resultados de uma invocação do dbt
+
+        Args:
+            run_results: conteúdo do run_results.json da invocação
+            ciclo: identificador do ciclo do scheduler (padrão: generated_at do arquivo)
+
+        Returns:
+            int: quantidade de nós gravados (0 se a invocação já foi registrada)
+        """
+        metadata = run_results.get('metadata', {})
+        invocation_id = metadata.get('invocation_id')
+        gerado_em = metadata.get('generated_at')
+        comando = (run_results.get('args') or {}).get('which')
+        linhas = [
+            (
+                normalizar_ciclo(ciclo or gerado_em),
+                invocation_id,
+                comando,
+                resultado['unique_id'],
+                resultado['unique_id'].split('.')[-1],
+                resultado['unique_id'].split('.')[0],
+                resultado.get('status') or 'unknown',
+                resultado.get('execution_time') or 0.0,
+                (resultado.get('adapter_response') or {}).get('rows_affected'),
+                _concluido_em(resultado, gerado_em),
+            )
+            for resultado in run_results.get('results', [])
+        ]
+        if not invocation_id or not linhas:
+            return 0
+
+        with self._conexao() as conn:
+            antes = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO execucoes_nos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas
+            )
+            return conn.total_changes - antes
+
+    def mais_lentos(self, top=10, ultimos_ciclos=10):
+        """
+        Nós mais lentos nos últimos ciclos
+
+        Returns:
+            list: [(nome, execuções, média s, máximo s, linhas afetadas na última)]
+        """
+        with self._conexao() as conn:
+            return conn.execute(f"""
+                WITH ciclos AS (
+                    SELECT DISTINCT ciclo FROM execucoes_nos ORDER BY ciclo DESC LIMIT ?
+                )
+                SELECT nome, COUNT(*), AVG(tempo_execucao), MAX(tempo_execucao),
+                       (SELECT e2.linhas_afetadas FROM execucoes_nos e2
+                        WHERE e2.unique_id = e.unique_id ORDER BY e2.ciclo DESC, e2.concluido_em DESC LIMIT 1)
+                FROM execucoes_nos e
+                WHERE ciclo IN (SELECT ciclo FROM ciclos)
+                  AND tipo IN ({', '.join('?' for _ in TIPOS_RELATORIO)})
+                  AND status = 'success'
+                GROUP BY unique_id, nome
+                ORDER BY AVG(tempo_execucao) DESC
+                LIMIT ?
+            """, (ultimos_ciclos, *TIPOS_RELATORIO, top)).fetchall()
+
+    def regressoes(self, baseline=10, limiar=1.5, diferenca_minima=0.5):
+        """
+        Nós cuja última execução ficou `limiar` vezes mais lenta que a mediana
+        das `baseline` execuções anteriores (e pelo menos `diferenca_minima` s)
+
+        Returns:
+            list: [(nome, última s, mediana s, razão)], da maior razão para a menor
+        """
+        with self._conexao() as conn:
+            linhas = conn.execute(f"""
+                SELECT unique_id, nome, tempo_execucao
+                FROM execucoes_nos
+                WHERE tipo IN ({', '.join('?' for _ in TIPOS_RELATORIO)}) AND status = 'success'
+                ORDER BY unique_id, ciclo DESC, concluido_em DESC
+            """, TIPOS_RELATORIO).fetchall()
+
+        tempos = {}
+        for unique_id, nome, tempo in linhas:
+            tempos.setdefault((unique_id, nome), []).append(tempo)
+
+        resultado = []
+        for (_, nome), historico in tempos.items():
+            anteriores = historico[1:baseline + 1]
+            if len(anteriores) < 3:
+                continue  # Linha de base curta demais para comparar
+            ultima, mediana = historico[0], statistics.median(anteriores)
+            if ultima - mediana >= diferenca_minima and ultima >= limiar * mediana:
+                resultado.append((nome, ultima, mediana, ultima / mediana if mediana else float('inf')))
+        return sorted(resultado, key=lambda r: r[3], reverse=True)
+
+    def ultimo_ciclo(self):
+        """
+        Returns:
+            tuple: (ciclo, {unique_id: tempo_execucao}) do ciclo mais recente, ou (None, {})
+        """
+        with self._conexao() as conn:
+            linha = conn.execute("SELECT MAX(ciclo) FROM execucoes_nos").fetchone()
+            if not linha or linha[0] is None:
+                return None, {}
+            tempos = conn.execute(
+                "SELECT unique_id, MAX(tempo_execucao) FROM execucoes_nos WHERE ciclo = ? GROUP BY unique_id",
+                (linha[0],)
+            ).fetchall()
+        return linha[0], dict(tempos)
+
+
+def imprimir_relatorio(historico, caminho_manifest, top=10, baseline=10, limiar=1.5):
+    """Imprime modelos mais lentos, regressões e caminho crítico"""
+    print("=" * 70)
+    print(f"🐢 MODELOS MAIS LENTOS (últimos {baseline} ciclos)")
+    print("=" * 70)
+    lentos = historico.mais_lentos(top=top, ultimos_ciclos=baseline)
+    if not lentos:
+        print("   Nenhuma execução registrada")
+    for nome, execucoes, media, maximo, linhas in lentos:
+        print(f"   {nome:<45} média {media:8.2f}s  máx {maximo:8.2f}s  "
+              f"n={execucoes:<3} linhas={linhas if linhas is not None else '-'}")
+
+    print("\n" + "=" * 70)
+    print(f"📈 REGRESSÕES (última execução ≥ {limiar:.1f}x a mediana das {baseline} anteriores)")
+    print("=" * 70)
+    regressoes = historico.regressoes(baseline=baseline, limiar=limiar)
+    if not regressoes:
+        print("   Nenhuma regressão detectada")
+    for nome, ultima, mediana, razao in regressoes:
+        print(f"   {nome:<45} {ultima:8.2f}s  (mediana {mediana:.2f}s, {razao:.1f}x)")
+
+    print("\n" + "=" * 70)
+    ciclo, tempos = historico.ultimo_ciclo()
+    print(f"🛤️  CAMINHO CRÍTICO (ciclo {ciclo or '-'})")
+    print("=" * 70)
+    if not tempos:
+        print("   Nenhuma execução registrada")
+    elif not Path(caminho_manifest).exists():
+        print(f"   manifest.json não encontrado em {caminho_manifest}")
+    else:
+        total, caminho = GrafoDBT.do_manifest(caminho_manifest).caminho_critico(tempos)
+        print(f"   Duração mínima do ciclo com paralelismo ilimitado: {total:.2f}s "
+              f"(soma dos nós: {sum(tempos.values()):.2f}s)")
+        for uid in caminho:
+            print(f"   → {uid.split('.')[-1]:<43} {tempos.get(uid, 0.0):8.2f}s")
+
+
+def main():
+    projeto = Path(__file__).parent.parent / "dbt_project"
+    parser = argparse.ArgumentParser(description="Histórico de desempenho das execuções do DBT")
+    parser.add_argument("acao", choices=["relatorio", "registrar"])
+    parser.add_argument("--db", default="dbt_run_history.sqlite",
+                        help="Arquivo SQLite do histórico (padrão: dbt_run_history.sqlite)")
+    parser.add_argument("--run-results", default=str(projeto / "target" / "run_results.json"),
+                        help="run_results.json a registrar (ação registrar)")
+    parser.add_argument("--manifest", default=str(projeto / "target" / "manifest.json"),
+                        help="manifest.json usado no caminho crítico")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de modelos mais lentos (padrão: 10)")
+    parser.add_argument("--baseline", type=int, default=10,
+                        help="Execuções anteriores na linha de base móvel (padrão: 10)")
+    parser.add_argument("--limiar", type=float, default=1.5,
+                        help="Razão última/mediana que caracteriza regressão (padrão: 1.5)")
+    args = parser.parse_args()
+
+    historico = HistoricoExecucoes(args.db)
+    if args.acao == "registrar":
+        gravados = historico.registrar_run_results(args.run_results)
+        print(f"✅ {gravados} nós registrados de {args.run_results}")
+        return 0
+
+    imprimir_relatorio(historico, args.manifest, top=args.top, baseline=args.baseline, limiar=args.limiar)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,20 @@ Simula um ambiente real para demonstrar CDC e pipeline em tempo real
 """
 
 import psycopg2
+from psycopg2.extras import execute_values
+import argparse
+import bisect
+import functools
+import io
+import itertools
+import json
+import os
 import random
+import threading
 import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta
+from decimal import Decimal
 import sys
 
 # Configurações de conexão
@@ -59,6 +70,44 @@ CARGOS = ['CEO', 'CTO', 'Gerente TI', 'Analista', 'Desenvolvedor', 'Coordenador'
 
 DOMINIOS_EMAIL = ['gmail.com', 'hotmail.com', 'yahoo.com.br', 'empresa.com', 'outlook.com']
 
+# Ações do simulador e seus pesos (probabilidades relativas)
+ACOES = {
+    'novo_cliente': 15,
+    'novo_pedido': 25,
+    'atualizar_cliente': 10,
+    'pedido_cliente_novo': 20,
+    'novo_produto': 10,
+    'nova_campanha': 8,
+    'novo_lead': 10,
+    'lead_com_campanha': 2,
+}
+
+# Proporção de linhas por tabela em cada lote do modo de carga massiva.
+# Os itens_pedido não entram aqui: cada pedido gera de 1 a 4 itens (média 2.5),
+# o que completa o restante do lote (~50% das linhas).
+PROPORCAO_CARGA = {
+    'campanhas_marketing': 0.01,
+    'produtos': 0.02,
+    'clientes': 0.15,
+    'leads': 0.12,
+    'pedidos': 0.20,
+}
+
+# Sequência usada por sufixo_unico()
+_SEQUENCIA = itertools.count(1)
+_INICIO = int(time.time())
+
+# Limites superiores (ms) dos buckets dos histogramas de latência:
+# de 0.1ms a ~100s, crescendo por um fator de raiz de 2 (erro de estimativa < 42%)
+LIMITES_LATENCIA_MS = tuple(round(0.1 * 2 ** (i / 2), 4) for i in range(41))
+
+# Retorno das operações que não tinham o que fazer (ex: pool de IDs vazio):
+# contado à parte, nem como sucesso nem como erro
+PULADO = object()
+
+# Capacidade padrão dos pools de IDs no modo de carga massiva (modo reservatório)
+CAPACIDADE_POOL_CARGA = 100000
+
 def conectar_db():
     """Conecta ao banco PostgreSQL"""
     try:
@@ -69,6 +118,300 @@ def conectar_db():
         print(f"❌ Erro ao conectar ao banco: {e}")
         return None
 
+class PoolIds:
+    """
+    Pool em memória dos IDs conhecidos de uma tabela (substitui ORDER BY RANDOM())
+
+    É carregado uma vez do banco e depois alimentado com os IDs retornados pelos
+    INSERTs (RETURNING id). A escolha aleatória é O(1). Com `capacidade` definida
+    o pool funciona como um reservatório (algoritmo R): a memória fica limitada e
+    os IDs mantidos são uma amostra uniforme de todos os IDs já vistos.
+    """
+
+    def __init__(self, tabela, colunas_extra=(), filtro=None, capacidade=None, rastrear_inseridos=True):
+        """
+        Args:
+            tabela: Tabela de origem (schema public)
+            colunas_extra: Colunas guardadas junto com o ID (ex: preço do produto)
+            filtro: Condição SQL adicional aplicada na leitura do banco
+            capacidade: Máximo de IDs em memória (None = todos)
+            rastrear_inseridos: Guarda os IDs inseridos por este processo até a
+                próxima atualizar(), para não contá-los duas vezes. Desligue em
+                pools que nunca são atualizados depois da carga inicial: o
+                conjunto só é podado por atualizar() e cresceria sem limite
+        """
+        self.tabela = tabela
+        self.colunas_extra = tuple(colunas_extra)
+        self.filtro = filtro
+        self.capacidade = capacidade
+        self.ids = []
+        self.valores = []
+        self.vistos = 0
+        self.ultimo_id_lido = 0
+        self._inseridos = set() if rastrear_inseridos else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _guardar(self, id_, valor):
+        self.vistos += 1
+        if self.capacidade is None or len(self.ids) < self.capacidade:
+            self.ids.append(id_)
+            self.valores.append(valor)
+            return
+        posicao = random.randrange(self.vistos)
+        if posicao < self.capacidade:
+            self.ids[posicao] = id_
+            self.valores[posicao] = valor
+
+    def adicionar(self, id_, valor=None):
+        """Registra um ID recém-inserido por este processo"""
+        if self._inseridos is not None:
+            self._inseridos.add(id_)
+        self._guardar(id_, valor)
+
+    def escolher(self):
+        """Retorna (id, valor) aleatório, ou None se o pool estiver vazio"""
+        if not self.ids:
+            return None
+        posicao = random.randrange(len(self.ids))
+        return self.ids[posicao], self.valores[posicao]
+
+    def atualizar(self, conn):
+        """
+        Lê do banco os IDs acima do último já lido (na primeira chamada, carga completa)
+
+        Pega as linhas inseridas por outros processos; as inseridas por este
+        processo já estão no pool e são ignoradas.
+
+        Returns:
+            int: Quantidade de IDs novos incorporados
+        """
+        colunas = ', '.join(('id',) + self.colunas_extra)
+        condicao = "id > %s" + (f" AND {self.filtro}" if self.filtro else "")
+        novos = 0
+        # Cursor do lado do servidor: a tabela é percorrida em blocos, sem carregar tudo no cliente
+        cur = conn.cursor(name=f"pool_{self.tabela}", withhold=True)
+        cur.itersize = 10000
+        try:
+            cur.execute(
+                f"SELECT {colunas} FROM public.{self.tabela} WHERE {condicao} ORDER BY id",
+                (self.ultimo_id_lido,)
+            )
+            for linha in cur:
+                self.ultimo_id_lido = linha[0]
+                if self._inseridos is not None and linha[0] in self._inseridos:
+                    continue
+                self._guardar(linha[0], tuple(linha[1:]) or None)
+                novos += 1
+        finally:
+            cur.close()
+        if self._inseridos is not None:
+            self._inseridos = {i for i in self._inseridos if i > self.ultimo_id_lido}
+        return novos
+
+def criar_pools(conn, capacidade=None, rastrear_inseridos=True):
+    """Cria e carrega os pools de IDs usados pelo simulador (ver PoolIds)"""
+    opcoes = {'capacidade': capacidade, 'rastrear_inseridos': rastrear_inseridos}
+    pools = {
+        'clientes': PoolIds('clientes', **opcoes),
+        'produtos': PoolIds('produtos', ('nome', 'preco_venda'), filtro='ativo', **opcoes),
+        'campanhas_marketing': PoolIds('campanhas_marketing', **opcoes),
+    }
+    for pool in pools.values():
+        pool.atualizar(conn)
+    return pools
+
+def atualizar_pools(conn, pools):
+    """Atualização incremental dos pools com as linhas inseridas por outros processos"""
+    try:
+        for pool in pools.values():
+            pool.atualizar(conn)
+    except Exception as e:
+        print(f"❌ Erro ao atualizar pools de IDs: {e}")
+
+# ============================================================================
+# MÉTRICAS (latência, vazão e erros por operação)
+# ============================================================================
+
+class HistogramaLatencia:
+    """Histograma de latências com buckets fixos (LIMITES_LATENCIA_MS), mesclável entre processos"""
+
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_LATENCIA_MS) + 1)  # último bucket = +Inf
+        self.total = 0
+        self.soma_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def registrar(self, latencia_ms):
+        self.contagens[bisect.bisect_left(LIMITES_LATENCIA_MS, latencia_ms)] += 1
+        self.total += 1
+        self.soma_ms += latencia_ms
+        self.maximo_ms = max(self.maximo_ms, latencia_ms)
+
+    def mesclar(self, outro):
+        self.contagens = [a + b for a, b in zip(self.contagens, outro.contagens)]
+        self.total += outro.total
+        self.soma_ms += outro.soma_ms
+        self.maximo_ms = max(self.maximo_ms, outro.maximo_ms)
+
+    def percentil(self, p):
+        """Estimativa do percentil p (0-100) por interpolação linear dentro do bucket"""
+        if not self.total:
+            return 0.0
+        alvo = p / 100 * self.total
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            if contagem and acumulado + contagem >= alvo:
+                inferior = LIMITES_LATENCIA_MS[indice - 1] if indice > 0 else 0.0
+                superior = LIMITES_LATENCIA_MS[indice] if indice < len(LIMITES_LATENCIA_MS) else self.maximo_ms
+                estimativa = inferior + (superior - inferior) * (alvo - acumulado) / contagem
+                return min(estimativa, self.maximo_ms)
+            acumulado += contagem
+        return self.maximo_ms
+
+class MetricasSimulador:
+    """
+    Métricas do simulador: histograma de latência, operações e erros por operação
+
+    Exportadas como linha JSON (para_json) ou no formato texto do Prometheus
+    (para_prometheus). O registro é protegido por lock porque o endpoint HTTP
+    lê as métricas a partir de outra thread.
+    """
+
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.histogramas = {}
+        self.erros = {}
+        self.pulados = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, operacao, latencia_ms, sucesso=True):
+        with self._lock:
+            self.histogramas.setdefault(operacao, HistogramaLatencia()).registrar(latencia_ms)
+            if not sucesso:
+                self.erros[operacao] = self.erros.get(operacao, 0) + 1
+
+    def registrar_pulo(self, operacao):
+        """Operação sem nada a fazer (fora dos histogramas e dos erros)"""
+        with self._lock:
+            self.pulados[operacao] = self.pulados.get(operacao, 0) + 1
+
+    def resumo(self):
+        """Dicionário com ops, ops/s, erros, pulados e p50/p95/p99 (ms) por operação"""
+        with self._lock:
+            decorrido = max(time.monotonic() - self.inicio, 1e-9)
+            operacoes = {}
+            for operacao in sorted(set(self.histogramas) | set(self.pulados)):
+                histograma = self.histogramas.get(operacao) or HistogramaLatencia()
+                operacoes[operacao] = {
+                    'ops': histograma.total,
+                    'ops_s': round(histograma.total / decorrido, 3),
+                    'erros': self.erros.get(operacao, 0),
+                    'pulados': self.pulados.get(operacao, 0),
+                    'p50_ms': round(histograma.percentil(50), 3),
+                    'p95_ms': round(histograma.percentil(95), 3),
+                    'p99_ms': round(histograma.percentil(99), 3),
+                    'max_ms': round(histograma.maximo_ms, 3),
+                }
+            total = sum(o['ops'] for o in operacoes.values())
+            return {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'uptime_s': round(decorrido, 1),
+                'ops': total,
+                'ops_s': round(total / decorrido, 3),
+                'erros': sum(o['erros'] for o in operacoes.values()),
+                'pulados': sum(o['pulados'] for o in operacoes.values()),
+                'operacoes': operacoes,
+            }
+
+    def para_json(self):
+        return json.dumps(self.resumo(), ensure_ascii=False)
+
+    def para_prometheus(self):
+        """Métricas no formato de exposição texto do Prometheus"""
+        linhas = [
+            "# HELP simulador_latencia_segundos Latência das operações do simulador",
+            "# TYPE simulador_latencia_segundos histogram",
+        ]
+        with self._lock:
+            histogramas = sorted(self.histogramas.items())
+            erros = dict(self.erros)
+            pulados = dict(self.pulados)
+        for operacao, histograma in histogramas:
+            acumulado = 0
+            for limite, contagem in zip(LIMITES_LATENCIA_MS + (None,), histograma.contagens):
+                acumulado += contagem
+                le = '+Inf' if limite is None else repr(limite / 1000)
+                linhas.append(f'simulador_latencia_segundos_bucket{{operacao="{operacao}",le="{le}"}} {acumulado}')
+            linhas.append(f'simulador_latencia_segundos_sum{{operacao="{operacao}"}} {histograma.soma_ms / 1000}')
+            linhas.append(f'simulador_latencia_segundos_count{{operacao="{operacao}"}} {histograma.total}')
+        linhas += [
+            "# HELP simulador_erros_total Operações que falharam",
+            "# TYPE simulador_erros_total counter",
+        ]
+        for operacao, _ in histogramas:
+            linhas.append(f'simulador_erros_total{{operacao="{operacao}"}} {erros.get(operacao, 0)}')
+        linhas += [
+            "# HELP simulador_pulados_total Operações sem nada a fazer (ex: pool de IDs vazio)",
+            "# TYPE simulador_pulados_total counter",
+        ]
+        for operacao, quantidade in sorted(pulados.items()):
+            linhas.append(f'simulador_pulados_total{{operacao="{operacao}"}} {quantidade}')
+        return '\n'.join(linhas) + '\n'
+
+# Métricas do processo atual (cada worker de carga_paralela.py tem as suas)
+METRICAS = MetricasSimulador()
+
+def instrumentar(operacao):
+    """
+    Decorator que registra latência e sucesso (retorno diferente de None) em
+    METRICAS; o retorno PULADO é contado só como pulo
+    """
+    def decorator(funcao):
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = funcao(*args, **kwargs)
+            if resultado is PULADO:
+                METRICAS.registrar_pulo(operacao)
+                return resultado
+            METRICAS.registrar(operacao, (time.perf_counter() - inicio) * 1000, resultado is not None)
+            return resultado
+        return wrapper
+    return decorator
+
+def iniciar_endpoint_metricas(porta, metricas=METRICAS):
+    """Serve GET /metrics (formato Prometheus) em uma thread em segundo plano"""
+    class MetricasHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            corpo = metricas.para_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass  # Sem log por requisição no stdout do simulador
+
+    servidor = ThreadingHTTPServer(('0.0.0.0', porta), MetricasHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    print(f"📡 Métricas Prometheus em http://localhost:{porta}/metrics")
+    return servidor
+
+def sufixo_unico():
+    """
+    Sufixo único por processo para colunas UNIQUE (codigo_produto, numero_pedido, email)
+
+    Inclui o PID, então vários processos do simulador rodando ao mesmo tempo
+    não colidem entre si.
+    """
+    return f"{os.getpid():x}{_INICIO:x}-{next(_SEQUENCIA)}"
+
 def gerar_email(nome):
     """Gera um email baseado no nome"""
     nome_limpo = nome.lower().replace(' ', '.').replace('ã', 'a').replace('é', 'e').replace('í', 'i')
@@ -76,7 +419,8 @@ def gerar_email(nome):
     numero = random.randint(1, 999)
     return f"{nome_limpo}{numero}@{dominio}"
 
-def inserir_cliente(conn):
+@instrumentar('inserir_cliente')
+def inserir_cliente(conn, pools):
     """Insere um novo cliente"""
     try:
         nome = random.choice(NOMES)
@@ -90,6 +434,7 @@ def inserir_cliente(conn):
         """, (nome, email, datetime.now()))
         
         cliente_id = cur.fetchone()[0]
+        pools['clientes'].adicionar(cliente_id)
         print(f"➕ Cliente inserido: ID {cliente_id} - {nome} ({email})")
         return cliente_id
         
@@ -97,18 +442,20 @@ def inserir_cliente(conn):
         print(f"❌ Erro ao inserir cliente: {e}")
         return None
 
-def inserir_produto(conn):
+@instrumentar('inserir_produto')
+def inserir_produto(conn, pools):
     """Insere um novo produto"""
     try:
         produto = random.choice(PRODUTOS)
+        codigo = f"{produto['codigo']}-{sufixo_unico()}"
         
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO public.produtos (codigo_produto, nome, categoria, preco_venda, preco_custo, estoque_minimo, ativo)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
+            RETURNING id, preco_venda;
         """, (
-            produto['codigo'], 
+            codigo, 
             produto['nome'], 
             produto['categoria'], 
             produto['preco'],
@@ -117,7 +464,8 @@ def inserir_produto(conn):
             True
         ))
         
-        produto_id = cur.fetchone()[0]
+        produto_id, preco_venda = cur.fetchone()
+        pools['produtos'].adicionar(produto_id, (produto['nome'], preco_venda))
         print(f"📦 Produto inserido: ID {produto_id} - {produto['nome']} ({produto['categoria']}) - R$ {produto['preco']:.2f}")
         return produto_id
         
@@ -125,81 +473,91 @@ def inserir_produto(conn):
         print(f"❌ Erro ao inserir produto: {e}")
         return None
 
-def inserir_pedido(conn, cliente_id=None):
-    """Insere um novo pedido"""
+def gerar_itens_pedido(pools):
+    """
+    Sorteia de 1 a 4 itens para um pedido a partir do pool de produtos
+
+    Returns:
+        tuple: (itens, valor_bruto), com itens no formato
+               (produto_id, nome, quantidade, preco_unitario, desconto_item).
+               valor_bruto é a soma de itens_pedido.valor_total
+               (quantidade * preco_unitario - desconto_item).
+    """
+    itens = []
+    valor_bruto = Decimal('0')
+    for _ in range(random.randint(1, 4)):
+        produto_id, (produto_nome, preco_unitario) = pools['produtos'].escolher()
+        quantidade = random.randint(1, 3)
+        desconto_item = Decimal(str(round(random.uniform(0, float(preco_unitario) * 0.1), 2)))  # Até 10% de desconto
+        valor_bruto += quantidade * preco_unitario - desconto_item
+        itens.append((produto_id, produto_nome, quantidade, preco_unitario, desconto_item))
+    return itens, valor_bruto
+
+@instrumentar('inserir_pedido')
+def inserir_pedido(conn, pools, cliente_id=None):
+    """
+    Insere um novo pedido com seus itens em um único comando (uma ida ao banco)
+
+    O valor_bruto é calculado no cliente a partir dos itens, então o pedido já
+    nasce com o valor correto: não há UPDATE posterior (nem o evento CDC extra).
+    """
     try:
         # Se não foi especificado cliente, pega um aleatório existente
         if cliente_id is None:
-            cur = conn.cursor()
-            cur.execute("SELECT id FROM public.clientes ORDER BY RANDOM() LIMIT 1")
-            result = cur.fetchone()
+            result = pools['clientes'].escolher()
             if not result:
                 print("❌ Nenhum cliente disponível para pedido")
                 return None
             cliente_id = result[0]
         
+        # Se não há produtos, criar um (o INSERT já o registra no pool)
+        if not pools['produtos'] and not inserir_produto(conn, pools):
+            return None
+        
         # Data do pedido pode ser alguns dias atrás para variar
         dias_atras = random.randint(0, 7)
         data_pedido = datetime.now() - timedelta(days=dias_atras)
         
         # Gerar número do pedido único
-        numero_pedido = f"PED-{datetime.now().strftime('%Y%m%d')}-{random.randint(1000, 9999)}"
+        numero_pedido = f"PED-{datetime.now().strftime('%Y%m%d')}-{sufixo_unico()}"
+        
+        itens, valor_total_pedido = gerar_itens_pedido(pools)
         
-        # Criar pedido sem valor (será calculado pelos itens)
+        # Pedido e itens no mesmo comando: os itens vão como arrays paralelos (unnest),
+        # o texto do SQL é sempre o mesmo e tudo é gravado atomicamente
         cur = conn.cursor()
         cur.execute("""
-            INSERT INTO public.pedidos (cliente_id, numero_pedido, valor_bruto, data_pedido, status, metodo_pagamento, canal_venda)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id;
+            WITH novo_pedido AS (
+                INSERT INTO public.pedidos (cliente_id, numero_pedido, valor_bruto, data_pedido, status, metodo_pagamento, canal_venda)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            ), novos_itens AS (
+                INSERT INTO public.itens_pedido (pedido_id, produto_id, quantidade, preco_unitario, desconto_item)
+                SELECT novo_pedido.id, i.produto_id, i.quantidade, i.preco_unitario, i.desconto_item
+                FROM novo_pedido,
+                     unnest(%s::int[], %s::int[], %s::numeric[], %s::numeric[])
+                         AS i(produto_id, quantidade, preco_unitario, desconto_item)
+            )
+            SELECT id FROM novo_pedido;
         """, (
             cliente_id, 
             numero_pedido, 
-            0,  # Será atualizado depois
+            valor_total_pedido,
             data_pedido,
             random.choice(['pendente', 'processando', 'enviado', 'entregue']),
             random.choice(['cartao_credito', 'cartao_debito', 'pix', 'boleto']),
-            random.choice(['loja_online', 'marketplace', 'loja_fisica', 'telefone'])
+            random.choice(['loja_online', 'marketplace', 'loja_fisica', 'telefone']),
+            [item[0] for item in itens],
+            [item[2] for item in itens],
+            [item[3] for item in itens],
+            [item[4] for item in itens]
         ))
         
         pedido_id = cur.fetchone()[0]
         
-        # Adicionar itens ao pedido
-        valor_total_pedido = 0
-        num_itens = random.randint(1, 4)  # 1 a 4 itens por pedido
-        
-        for _ in range(num_itens):
-            # Pegar produto existente ou criar um novo
-            cur.execute("SELECT id, nome, preco_venda FROM public.produtos ORDER BY RANDOM() LIMIT 1")
-            produto_result = cur.fetchone()
-            
-            if not produto_result:
-                # Se não há produtos, criar um
-                produto_id = inserir_produto(conn)
-                if produto_id:
-                    cur.execute("SELECT id, nome, preco_venda FROM public.produtos WHERE id = %s", (produto_id,))
-                    produto_result = cur.fetchone()
-            
-            if produto_result:
-                produto_id, produto_nome, preco_unitario = produto_result
-                quantidade = random.randint(1, 3)
-                desconto_item = round(random.uniform(0, preco_unitario * 0.1), 2)  # Até 10% de desconto
-                
-                # Inserir item do pedido
-                cur.execute("""
-                    INSERT INTO public.itens_pedido (pedido_id, produto_id, quantidade, preco_unitario, desconto_item)
-                    VALUES (%s, %s, %s, %s, %s)
-                    RETURNING valor_total;
-                """, (pedido_id, produto_id, quantidade, preco_unitario, desconto_item))
-                
-                valor_item = cur.fetchone()[0]
-                valor_total_pedido += valor_item
-                
-                print(f"  📋 Item adicionado: {produto_nome} (Qtd: {quantidade}, Valor: R$ {valor_item:.2f})")
-        
-        # Atualizar valor total do pedido
-        cur.execute("""
-            UPDATE public.pedidos SET valor_bruto = %s WHERE id = %s
-        """, (valor_total_pedido, pedido_id))
+        for _, produto_nome, quantidade, preco_unitario, desconto_item in itens:
+            valor_item = quantidade * preco_unitario - desconto_item
+            print(f"  📋 Item adicionado: {produto_nome} (Qtd: {quantidade}, Valor: R$ {valor_item:.2f})")
         
         print(f"🛒 Pedido inserido: ID {pedido_id} - Cliente {cliente_id} - Total: R$ {valor_total_pedido:.2f}")
         return pedido_id
@@ -208,7 +566,8 @@ def inserir_pedido(conn, cliente_id=None):
         print(f"❌ Erro ao inserir pedido: {e}")
         return None
 
-def inserir_campanha(conn):
+@instrumentar('inserir_campanha')
+def inserir_campanha(conn, pools):
     """Insere uma nova campanha de marketing"""
     try:
         campanha = random.choice(CAMPANHAS)
@@ -234,6 +593,7 @@ def inserir_campanha(conn):
         ))
         
         campanha_id = cur.fetchone()[0]
+        pools['campanhas_marketing'].adicionar(campanha_id)
         print(f"📢 Campanha inserida: ID {campanha_id} - {campanha['nome']} ({campanha['tipo']})")
         return campanha_id
         
@@ -241,7 +601,8 @@ def inserir_campanha(conn):
         print(f"❌ Erro ao inserir campanha: {e}")
         return None
 
-def inserir_lead(conn):
+@instrumentar('inserir_lead')
+def inserir_lead(conn, pools):
     """Insere um novo lead"""
     try:
         nome = random.choice(NOMES)
@@ -251,16 +612,15 @@ def inserir_lead(conn):
         fonte = random.choice(FONTES_LEAD)
         
         # Pegar uma campanha existente ou criar uma nova
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM public.campanhas_marketing ORDER BY RANDOM() LIMIT 1")
-        campanha_result = cur.fetchone()
+        campanha_result = pools['campanhas_marketing'].escolher()
         
         campanha_id = None
         if campanha_result:
             campanha_id = campanha_result[0]
         elif random.random() < 0.3:  # 30% chance de criar nova campanha
-            campanha_id = inserir_campanha(conn)
+            campanha_id = inserir_campanha(conn, pools)
         
+        cur = conn.cursor()
         cur.execute("""
             INSERT INTO public.leads (nome, email, telefone, empresa, cargo, fonte, campanha_id, score, status, interesse, orcamento_estimado)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -287,16 +647,23 @@ def inserir_lead(conn):
         print(f"❌ Erro ao inserir lead: {e}")
         return None
 
-def atualizar_cliente(conn):
-    """Atualiza um cliente existente (simula CDC)"""
+@instrumentar('atualizar_cliente')
+def atualizar_cliente(conn, pools):
+    """Atualiza um cliente existente (simula CDC); PULADO se não há cliente para atualizar"""
     try:
+        escolhido = pools['clientes'].escolher()
+        if not escolhido:
+            return PULADO
+        cliente_id = escolhido[0]
+        
+        # Busca pela chave primária (o ID pode ter sido removido por outro processo)
         cur = conn.cursor()
-        cur.execute("SELECT id, nome, email FROM public.clientes ORDER BY RANDOM() LIMIT 1")
+        cur.execute("SELECT nome, email FROM public.clientes WHERE id = %s", (cliente_id,))
         result = cur.fetchone()
         if not result:
-            return None
+            return PULADO
             
-        cliente_id, nome_atual, email_atual = result
+        nome_atual, email_atual = result
         
         # Simula atualização de email ou telefone
         if random.random() < 0.7:  # 70% chance de atualizar email
@@ -323,37 +690,38 @@ def atualizar_cliente(conn):
         return None
 
 def mostrar_estatisticas(conn):
-    """Mostra estatísticas atuais do banco"""
+    """
+    Mostra estatísticas atuais do banco e as métricas do simulador
+
+    As contagens vêm de uma única consulta ao catálogo (pg_stat_user_tables,
+    com pg_class.reltuples como reserva) em vez de COUNT(*) em cada tabela:
+    são estimativas, mas o custo não cresce com o tamanho das tabelas. A
+    receita total vem da linha pré-agregada pelo dbt (gold_dashboard_kpis),
+    com SUM(valor_bruto) só enquanto o dbt ainda não a criou; o último pedido
+    é lido pela chave primária.
+    """
     try:
         cur = conn.cursor()
-        
-        # Contagem de clientes
-        cur.execute("SELECT COUNT(*) FROM public.clientes")
-        total_clientes = cur.fetchone()[0]
-        
-        # Contagem de pedidos
-        cur.execute("SELECT COUNT(*) FROM public.pedidos")
-        total_pedidos = cur.fetchone()[0]
-        
-        # Contagem de produtos
-        cur.execute("SELECT COUNT(*) FROM public.produtos")
-        total_produtos = cur.fetchone()[0]
-        
-        # Contagem de itens de pedido
-        cur.execute("SELECT COUNT(*) FROM public.itens_pedido")
-        total_itens = cur.fetchone()[0]
-        
-        # Contagem de campanhas
-        cur.execute("SELECT COUNT(*) FROM public.campanhas_marketing")
-        total_campanhas = cur.fetchone()[0]
-        
-        # Contagem de leads
-        cur.execute("SELECT COUNT(*) FROM public.leads")
-        total_leads = cur.fetchone()[0]
+        cur.execute("""
+            SELECT c.relname,
+                   COALESCE(s.n_live_tup, GREATEST(c.reltuples, 0))::bigint AS linhas
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+            WHERE n.nspname = 'public'
+              AND c.relname IN ('clientes', 'pedidos', 'produtos', 'itens_pedido', 'campanhas_marketing', 'leads')
+        """)
+        linhas = dict(cur.fetchall())
         
         # Receita total
-        cur.execute("SELECT SUM(valor_bruto) FROM public.pedidos")
-        receita_total = cur.fetchone()[0] or 0
+        cur.execute("SELECT to_regclass('public_gold.gold_dashboard_kpis') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT receita_total FROM public_gold.gold_dashboard_kpis")
+            origem_receita = " (última execução do dbt)"
+        else:
+            cur.execute("SELECT SUM(valor_bruto) FROM public.pedidos")
+            origem_receita = ""
+        receita_total = (cur.fetchone() or [0])[0] or 0
         
         # Último pedido
         cur.execute("""
@@ -364,22 +732,334 @@ def mostrar_estatisticas(conn):
         """)
         ultimo_pedido = cur.fetchone()
         
-        print(f"\n📊 ESTATÍSTICAS ATUAIS:")
-        print(f"   👥 Clientes: {total_clientes}")
-        print(f"   🛒 Pedidos: {total_pedidos}")
-        print(f"   📦 Produtos: {total_produtos}")
-        print(f"   📋 Itens de Pedido: {total_itens}")
-        print(f"   📢 Campanhas: {total_campanhas}")
-        print(f"   🎯 Leads: {total_leads}")
-        print(f"   💰 Receita Total: R$ {receita_total:.2f}")
+        print(f"\n📊 ESTATÍSTICAS ATUAIS (estimativas do catálogo):")
+        print(f"   👥 Clientes: ~{linhas.get('clientes', 0)}")
+        print(f"   🛒 Pedidos: ~{linhas.get('pedidos', 0)}")
+        print(f"   📦 Produtos: ~{linhas.get('produtos', 0)}")
+        print(f"   📋 Itens de Pedido: ~{linhas.get('itens_pedido', 0)}")
+        print(f"   📢 Campanhas: ~{linhas.get('campanhas_marketing', 0)}")
+        print(f"   🎯 Leads: ~{linhas.get('leads', 0)}")
+        print(f"   💰 Receita Total: R$ {receita_total:.2f}{origem_receita}")
         if ultimo_pedido:
             print(f"   🔥 Último Pedido: ID {ultimo_pedido[0]} - {ultimo_pedido[1]} (R$ {ultimo_pedido[2]:.2f})")
+        
+        resumo = METRICAS.resumo()
+        print(f"   ⚡ Simulador: {resumo['ops']} ops ({resumo['ops_s']:.2f} ops/s), {resumo['erros']} erros, "
+              f"{resumo['pulados']} pulados")
+        for operacao, m in resumo['operacoes'].items():
+            print(f"      {operacao}: {m['ops']} ops, {m['erros']} erros, {m['pulados']} pulados, "
+                  f"p50={m['p50_ms']:.1f}ms p95={m['p95_ms']:.1f}ms p99={m['p99_ms']:.1f}ms")
         print("-" * 60)
         
     except Exception as e:
         print(f"❌ Erro ao mostrar estatísticas: {e}")
 
+def escolher_acao():
+    """Sorteia a próxima ação do simulador segundo os pesos de ACOES"""
+    return random.choices(list(ACOES), weights=list(ACOES.values()), k=1)[0]
+
+def executar_acao(conn, pools, acao, pausa=True):
+    """
+    Executa uma ação do simulador
+
+    Args:
+        pausa: Pequena pausa entre as etapas das ações compostas (simula tempo real)
+
+    Returns:
+        ID da última linha afetada, None se a ação falhou ou PULADO se não havia o que fazer
+    """
+    if acao == 'novo_cliente':
+        return inserir_cliente(conn, pools)
+        
+    elif acao == 'novo_pedido':
+        return inserir_pedido(conn, pools)
+        
+    elif acao == 'atualizar_cliente':
+        return atualizar_cliente(conn, pools)
+        
+    elif acao == 'pedido_cliente_novo':
+        # Cria cliente e pedido na sequência
+        cliente_id = inserir_cliente(conn, pools)
+        if cliente_id:
+            if pausa:
+                time.sleep(1)  # Pequena pausa
+            return inserir_pedido(conn, pools, cliente_id)
+        return None
+            
+    elif acao == 'novo_produto':
+        return inserir_produto(conn, pools)
+        
+    elif acao == 'nova_campanha':
+        return inserir_campanha(conn, pools)
+        
+    elif acao == 'novo_lead':
+        return inserir_lead(conn, pools)
+        
+    elif acao == 'lead_com_campanha':
+        # Cria campanha e lead na sequência
+        campanha_id = inserir_campanha(conn, pools)
+        if campanha_id:
+            if pausa:
+                time.sleep(1)  # Pequena pausa
+            return inserir_lead(conn, pools)
+        return None
+
+    raise ValueError(f"Ação desconhecida: {acao}")
+
+# ============================================================================
+# MODO DE CARGA MASSIVA
+# ============================================================================
+
+def parse_taxa(valor):
+    """Converte '5000/s' ou '5000' em linhas por segundo"""
+    texto = str(valor).strip().lower()
+    if texto.endswith('/s'):
+        texto = texto[:-2]
+    taxa = float(texto)
+    if taxa <= 0:
+        raise argparse.ArgumentTypeError("a taxa deve ser maior que zero")
+    return taxa
+
+def _escapar_copy(valor):
+    """Formata um valor para o formato texto do COPY"""
+    if valor is None:
+        return '\\N'
+    return str(valor).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+def copy_linhas(cur, tabela, colunas, linhas):
+    """Grava linhas com COPY FROM STDIN (usado onde não precisamos dos IDs gerados)"""
+    if not linhas:
+        return 0
+    buffer = io.StringIO()
+    for linha in linhas:
+        buffer.write('\t'.join(_escapar_copy(v) for v in linha))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY public.{tabela} ({', '.join(colunas)}) FROM STDIN", buffer)
+    return len(linhas)
+
+def _telefone_aleatorio():
+    return f"({random.randint(11, 99)}) {random.randint(90000, 99999)}-{random.randint(1000, 9999)}"
+
+def gravar_lote(cur, tamanho, pools):
+    """
+    Gera e grava um lote de aproximadamente `tamanho` linhas distribuídas entre as tabelas
+
+    A ordem de gravação respeita as chaves estrangeiras:
+    campanhas -> leads, produtos/clientes -> pedidos -> itens_pedido.
+    Os IDs gerados são registrados nos `pools` (ver PoolIds).
+
+    Returns:
+        dict: linhas gravadas por tabela
+    """
+    agora = datetime.now()
+    qtd = {tabela: int(tamanho * fracao) for tabela, fracao in PROPORCAO_CARGA.items()}
+    # O arredondamento (e lotes pequenos no fim da carga) fica com os clientes
+    qtd['clientes'] += max(0, tamanho - sum(qtd.values()) - int(qtd['pedidos'] * 2.5))
+    gravadas = {}
+
+    # Campanhas e produtos: precisamos dos IDs, então usamos execute_values com RETURNING
+    if qtd['campanhas_marketing'] or not pools['campanhas_marketing']:
+        linhas = []
+        for _ in range(max(1, qtd['campanhas_marketing'])):
+            campanha = random.choice(CAMPANHAS)
+            data_inicio = agora - timedelta(days=random.randint(0, 30))
+            linhas.append((
+                campanha['nome'], campanha['tipo'], campanha['canal'],
+                round(random.uniform(1000, 50000), 2),
+                data_inicio.date(), (data_inicio + timedelta(days=random.randint(7, 60))).date(),
+                random.choice(['planejada', 'ativa', 'pausada', 'finalizada']),
+                random.randint(50, 1000)
+            ))
+        ids = execute_values(cur, """
+            INSERT INTO public.campanhas_marketing (nome, tipo, canal, orcamento, data_inicio, data_fim, status, meta_leads)
+            VALUES %s RETURNING id
+        """, linhas, page_size=len(linhas), fetch=True)
+        for r in ids:
+            pools['campanhas_marketing'].adicionar(r[0])
+        gravadas['campanhas_marketing'] = len(linhas)
+
+    if qtd['produtos'] or not pools['produtos']:
+        linhas = []
+        for _ in range(max(1, qtd['produtos'])):
+            produto = random.choice(PRODUTOS)
+            codigo = f"{produto['codigo']}-{sufixo_unico()}"
+            linhas.append((
+                codigo, produto['nome'], produto['categoria'], produto['preco'],
+                round(produto['preco'] * 0.7, 2), random.randint(5, 50), True
+            ))
+        ids = execute_values(cur, """
+            INSERT INTO public.produtos (codigo_produto, nome, categoria, preco_venda, preco_custo, estoque_minimo, ativo)
+            VALUES %s RETURNING id, nome, preco_venda
+        """, linhas, page_size=len(linhas), fetch=True)
+        for r in ids:
+            pools['produtos'].adicionar(r[0], (r[1], r[2]))
+        gravadas['produtos'] = len(linhas)
+
+    if qtd['clientes'] or not pools['clientes']:
+        linhas = []
+        for _ in range(max(1, qtd['clientes'])):
+            nome = random.choice(NOMES)
+            usuario, dominio = gerar_email(nome).split('@')
+            linhas.append((nome, f"{usuario}.{sufixo_unico()}@{dominio}", _telefone_aleatorio(), agora))
+        ids = execute_values(cur, """
+            INSERT INTO public.clientes (nome, email, telefone, data_cadastro)
+            VALUES %s RETURNING id
+        """, linhas, page_size=len(linhas), fetch=True)
+        for r in ids:
+            pools['clientes'].adicionar(r[0])
+        gravadas['clientes'] = len(linhas)
+
+    # Leads não são referenciados por ninguém: COPY direto
+    linhas = []
+    for _ in range(qtd['leads']):
+        nome = random.choice(NOMES)
+        usuario, dominio = gerar_email(nome).split('@')
+        linhas.append((
+            nome, f"{usuario}.{sufixo_unico()}@{dominio}", _telefone_aleatorio(),
+            random.choice(EMPRESAS), random.choice(CARGOS), random.choice(FONTES_LEAD),
+            pools['campanhas_marketing'].escolher()[0], random.randint(0, 100),
+            random.choice(['novo', 'contatado', 'qualificado', 'oportunidade', 'perdido', 'convertido']),
+            random.choice(['baixo', 'medio', 'alto']),
+            round(random.uniform(1000, 100000), 2)
+        ))
+    gravadas['leads'] = copy_linhas(cur, 'leads', (
+        'nome', 'email', 'telefone', 'empresa', 'cargo', 'fonte', 'campanha_id',
+        'score', 'status', 'interesse', 'orcamento_estimado'
+    ), linhas)
+
+    # Pedidos: os itens são gerados antes para que valor_bruto já saia correto no INSERT
+    pedidos = []
+    itens_por_pedido = {}
+    for _ in range(qtd['pedidos']):
+        numero_pedido = f"PED-{agora.strftime('%Y%m%d')}-{sufixo_unico()}"
+        itens, valor_bruto = gerar_itens_pedido(pools)
+        itens_por_pedido[numero_pedido] = [
+            (produto_id, quantidade, preco_unitario, desconto_item)
+            for produto_id, _, quantidade, preco_unitario, desconto_item in itens
+        ]
+        pedidos.append((
+            pools['clientes'].escolher()[0], numero_pedido, valor_bruto,
+            agora - timedelta(days=random.randint(0, 7)),
+            random.choice(['pendente', 'processando', 'enviado', 'entregue']),
+            random.choice(['cartao_credito', 'cartao_debito', 'pix', 'boleto']),
+            random.choice(['loja_online', 'marketplace', 'loja_fisica', 'telefone'])
+        ))
+
+    gravadas['pedidos'] = 0
+    gravadas['itens_pedido'] = 0
+    if pedidos:
+        ids = execute_values(cur, """
+            INSERT INTO public.pedidos (cliente_id, numero_pedido, valor_bruto, data_pedido, status, metodo_pagamento, canal_venda)
+            VALUES %s RETURNING id, numero_pedido
+        """, pedidos, page_size=len(pedidos), fetch=True)
+        # Mapeia pelo numero_pedido (único) em vez de confiar na ordem do RETURNING
+        linhas = [
+            (pedido_id, *item)
+            for pedido_id, numero_pedido in ids
+            for item in itens_por_pedido[numero_pedido]
+        ]
+        gravadas['pedidos'] = len(pedidos)
+        gravadas['itens_pedido'] = copy_linhas(cur, 'itens_pedido', (
+            'pedido_id', 'produto_id', 'quantidade', 'preco_unitario', 'desconto_item'
+        ), linhas)
+
+    return gravadas
+
+def carga_massiva(conn, total=None, taxa=None, tamanho_lote=5000, capacidade_pool=CAPACIDADE_POOL_CARGA):
+    """
+    Gera carga em alta vazão: lotes gravados com execute_values/COPY, um commit por lote
+
+    Args:
+        conn: Conexão com o banco
+        total: Total de linhas a gravar (None = até Ctrl+C)
+        taxa: Limite de linhas por segundo (None = sem limite)
+        tamanho_lote: Linhas por lote/transação
+        capacidade_pool: Máximo de IDs por tabela mantidos em memória
+
+    Returns:
+        dict: linhas gravadas por tabela
+    """
+    # Pools carregados uma vez e nunca atualizados: sem rastreio dos IDs inseridos,
+    # a memória fica limitada à capacidade do reservatório
+    pools = criar_pools(conn, capacidade=capacidade_pool, rastrear_inseridos=False)
+    conn.autocommit = False
+    cur = conn.cursor()
+
+    totais = {}
+    gravadas_total = 0
+    inicio = time.monotonic()
+    ultimo_relatorio = inicio
+
+    print(f"🚀 Carga massiva: total={total or '∞'} taxa={f'{taxa:.0f}/s' if taxa else 'máxima'} lote={tamanho_lote}")
+
+    try:
+        while total is None or gravadas_total < total:
+            tamanho = tamanho_lote if total is None else min(tamanho_lote, total - gravadas_total)
+            try:
+                gravadas = gravar_lote(cur, tamanho, pools)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Erro ao gravar lote: {e}")
+                break
+
+            for tabela, quantidade in gravadas.items():
+                totais[tabela] = totais.get(tabela, 0) + quantidade
+            gravadas_total += sum(gravadas.values())
+
+            agora = time.monotonic()
+            if taxa:
+                # Controle de vazão: espera até o tempo "devido" para as linhas já gravadas
+                atraso = gravadas_total / taxa - (agora - inicio)
+                if atraso > 0:
+                    time.sleep(atraso)
+                    agora = time.monotonic()
+
+            if agora - ultimo_relatorio >= 5:
+                print(f"📈 {gravadas_total} linhas - {gravadas_total / (agora - inicio):.0f} linhas/s")
+                ultimo_relatorio = agora
+
+    except KeyboardInterrupt:
+        print("\n⏹️  Carga interrompida pelo usuário")
+
+    duracao = time.monotonic() - inicio
+    print(f"\n📊 CARGA MASSIVA CONCLUÍDA em {duracao:.1f}s")
+    for tabela, quantidade in totais.items():
+        print(f"   {tabela}: {quantidade}")
+    print(f"   🚀 Total: {gravadas_total} linhas - {gravadas_total / max(duracao, 1e-9):.0f} linhas/s")
+
+    conn.autocommit = True
+    return totais
+
 def main():
+    parser = argparse.ArgumentParser(description="Simulador de dados para o banco de origem")
+    parser.add_argument("--rate", type=parse_taxa, help="Modo carga massiva: linhas por segundo (ex: 5000/s)")
+    parser.add_argument("--total", type=int, help="Modo carga massiva: total de linhas a gravar")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Linhas por lote no modo carga massiva (padrão: 5000)")
+    parser.add_argument("--pool-capacity", type=int,
+                        help="Máximo de IDs por tabela mantidos em memória (modo reservatório). "
+                             f"Padrão: todos no simulador, {CAPACIDADE_POOL_CARGA} na carga massiva")
+    parser.add_argument("--metrics-interval", type=float,
+                        help="Emite as métricas como uma linha JSON a cada N segundos")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Expõe as métricas no formato Prometheus em http://localhost:PORTA/metrics")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        iniciar_endpoint_metricas(args.metrics_port)
+
+    if args.rate or args.total:
+        conn = conectar_db()
+        if not conn:
+            sys.exit(1)
+        try:
+            carga_massiva(conn, total=args.total, taxa=args.rate, tamanho_lote=args.batch_size,
+                          capacidade_pool=args.pool_capacity or CAPACIDADE_POOL_CARGA)
+        finally:
+            conn.close()
+        return
+
     print("🎬 SIMULADOR DE DADOS EM TEMPO REAL")
     print("==================================")
     print("🎯 Objetivo: Demonstrar CDC e Pipeline funcionando")
@@ -391,54 +1071,28 @@ def main():
         sys.exit(1)
     
     try:
+        # IDs conhecidos em memória: evita ORDER BY RANDOM() a cada operação
+        pools = criar_pools(conn, capacidade=args.pool_capacity)
+        print(f"🗂️  Pools carregados: {', '.join(f'{t}={len(p)}' for t, p in pools.items())}")
+        
         ciclo = 0
+        ultima_emissao = time.monotonic()
         while True:
             ciclo += 1
             print(f"\n🔄 CICLO {ciclo} - {datetime.now().strftime('%H:%M:%S')}")
             
             # Decisão aleatória do que fazer
-            acao = random.choices(
-                ['novo_cliente', 'novo_pedido', 'atualizar_cliente', 'pedido_cliente_novo', 
-                 'novo_produto', 'nova_campanha', 'novo_lead', 'lead_com_campanha'],
-                weights=[15, 25, 10, 20, 10, 8, 10, 2],  # Probabilidades
-                k=1
-            )[0]
+            acao = escolher_acao()
+            executar_acao(conn, pools, acao)
             
-            if acao == 'novo_cliente':
-                inserir_cliente(conn)
-                
-            elif acao == 'novo_pedido':
-                inserir_pedido(conn)
-                
-            elif acao == 'atualizar_cliente':
-                atualizar_cliente(conn)
-                
-            elif acao == 'pedido_cliente_novo':
-                # Cria cliente e pedido na sequência
-                cliente_id = inserir_cliente(conn)
-                if cliente_id:
-                    time.sleep(1)  # Pequena pausa
-                    inserir_pedido(conn, cliente_id)
-                    
-            elif acao == 'novo_produto':
-                inserir_produto(conn)
-                
-            elif acao == 'nova_campanha':
-                inserir_campanha(conn)
-                
-            elif acao == 'novo_lead':
-                inserir_lead(conn)
-                
-            elif acao == 'lead_com_campanha':
-                # Cria campanha e lead na sequência
-                campanha_id = inserir_campanha(conn)
-                if campanha_id:
-                    time.sleep(1)  # Pequena pausa
-                    inserir_lead(conn)
-            
-            # Mostra estatísticas a cada 10 ciclos
+            # Mostra estatísticas e atualiza os pools a cada 10 ciclos
             if ciclo % 10 == 0:
                 mostrar_estatisticas(conn)
+                atualizar_pools(conn, pools)
+            
+            if args.metrics_interval and time.monotonic() - ultima_emissao >= args.metrics_interval:
+                print(METRICAS.para_json(), flush=True)
+                ultima_emissao = time.monotonic()
             
             # Pausa entre inserções (simula tempo real)
             intervalo = random.uniform(2, 8)  # Entre 2 e 8 segundos
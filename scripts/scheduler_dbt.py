@@ -7,18 +7,26 @@ Este script executa o DBT em intervalos regulares para simular
 um pipeline de dados em tempo real, lendo diretamente do banco de origem.
 
 Uso:
-    python scheduler_dbt.py [--interval SECONDS] [--run-once]
+    python scheduler_dbt.py [--interval SECONDS] [--run-once] [--mode sequential|dag] [--workers N]
+                            [--backend subprocess|inprocess|auto] [--benchmark-backends]
+                            [--trigger interval|change] [--debounce S] [--min-wait S] [--max-wait S]
+                            [--selective] [--watermark-file ARQUIVO] [--lookback-minutes MIN]
+                            [--history-file ARQUIVO]
 """
 
 import os
 import sys
 import time
 import argparse
-import subprocess
 import logging
 from datetime import datetime
 from pathlib import Path
 
+from dbt_backend import comparar_backends, criar_backend, projeto_alterado_desde
+from dbt_dag import GrafoDBT
+from detector_mudancas import DetectorMudancas, GatilhoMudancas, MarcasDagua
+from historico_execucoes import HistoricoExecucoes
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -31,23 +39,74 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class DBTScheduler:
-    def __init__(self, dbt_project_dir=None, interval=300):
+    def __init__(self, dbt_project_dir=None, interval=300, mode='sequential', workers=4,
+                 backend='subprocess', trigger='interval', change_detection='stats',
+                 debounce=10, min_wait=30, max_wait=600, poll_interval=5,
+                 selective=False, watermark_file='dbt_watermarks.json', lookback_minutes=10,
+                 history_file='dbt_run_history.sqlite'):
         """
         Inicializa o scheduler do DBT
         
         Args:
             dbt_project_dir: Diretório do projeto DBT
             interval: Intervalo em segundos entre execuções (padrão: 5 minutos)
+            mode: 'sequential' (deps, seed, run, test) ou 'dag' (um `dbt build`
+                  com nós em paralelo seguindo o DAG, testes logo após cada modelo)
+            workers: Threads do dbt (--threads) no modo 'dag'
+            backend: 'subprocess' (executável dbt), 'inprocess' (dbtRunner com
+                     manifest reutilizado entre ciclos) ou 'auto'
+            trigger: 'interval' (a cada `interval` segundos) ou 'change' (só
+                     quando chegam dados novos na origem, ver detector_mudancas)
+            change_detection: 'stats' (pg_stat_user_tables) ou 'updated_at'
+            debounce, min_wait, max_wait, poll_interval: parâmetros do trigger
+                     'change' em segundos (ver GatilhoMudancas)
+            selective: reconstrói só os modelos afetados pelas tabelas de origem
+                     alteradas desde a última execução bem-sucedida
+            watermark_file: arquivo JSON com o max(updated_at) de cada tabela
+                     na última execução bem-sucedida (modo selective)
+            lookback_minutes: janela contada abaixo de cada marca d'água, para
+                     acusar linhas confirmadas tarde com updated_at mais antigo;
+                     deve acompanhar a var incremental_lookback_minutes
+            history_file: SQLite onde o tempo de cada nó é registrado após cada
+                     comando (None desativa; ver historico_execucoes)
         """
         self.interval = interval
         self.dbt_project_dir = dbt_project_dir or self._find_dbt_project()
+        self.mode = mode
+        self.workers = workers
         self.running = False
+        self._deps_instaladas = False
+        self._dbt_verificado = False
+        self.backend = criar_backend(backend, self.dbt_project_dir)
+        self.trigger = trigger
+        self.gatilho = None
+        if trigger == 'change':
+            self.gatilho = GatilhoMudancas(
+                DetectorMudancas(estrategia=change_detection),
+                debounce=debounce,
+                espera_minima=min_wait,
+                espera_maxima=max_wait,
+                intervalo_consulta=poll_interval
+            )
+        self.selective = selective
+        self.marcas = MarcasDagua(watermark_file) if selective else None
+        self.detector_marcas = DetectorMudancas(estrategia='updated_at', lookback_minutos=lookback_minutes) if selective else None
+        self.historico = HistoricoExecucoes(history_file) if history_file else None
+        self._ciclo = None
         
         logger.info(f"DBT Scheduler inicializado")
         logger.info(f"Projeto DBT: {self.dbt_project_dir}")
         logger.info(f"Intervalo: {self.interval} segundos")
+        logger.info(f"Modo: {self.mode}" + (f" ({self.workers} workers)" if self.mode == 'dag' else ""))
+        logger.info(f"Backend: {self.backend.nome}")
+        if self.gatilho:
+            logger.info(f"Trigger: mudanças na origem ({change_detection}, debounce {debounce}s, "
+                        f"espera mín. {min_wait}s, máx. {max_wait}s)")
+        if self.selective:
+            logger.info(f"Reconstrução seletiva (marcas d'água em {watermark_file}, lookback {lookback_minutes} min)")
     
-    def _find_dbt_project(self):
+    @staticmethod
+    def _find_dbt_project():
         """Encontra o diretório do projeto DBT"""
         current_dir = Path(__file__).parent
         
@@ -63,27 +122,19 @@ class DBTScheduler:
         return str(default_path)
     
     def check_dbt_installation(self):
-        """Verifica se o DBT está instalado"""
-        try:
-            result = subprocess.run(
-                ["dbt", "--version"], 
-                capture_output=True, 
-                text=True, 
-                timeout=30
-            )
-            if result.returncode == 0:
-                logger.info(f"DBT encontrado: {result.stdout.strip()}")
-                return True
-            else:
-                logger.error(f"Erro ao verificar DBT: {result.stderr}")
-                return False
-        except (subprocess.TimeoutExpired, FileNotFoundError) as e:
-            logger.error(f"DBT não encontrado ou timeout: {e}")
-            return False
+        """Verifica se o DBT está instalado (uma única vez por processo)"""
+        if self._dbt_verificado:
+            return True
+        versao = self.backend.versao()
+        if versao:
+            logger.info(f"DBT encontrado: {versao}")
+            self._dbt_verificado = True
+            return True
+        return False
     
     def run_dbt_command(self, command):
         """
-        Executa um comando DBT
+        Executa um comando DBT pelo backend configurado
         
         Args:
             command: Lista com o comando DBT (ex: ['dbt', 'run'])
@@ -91,44 +142,66 @@ class DBTScheduler:
         Returns:
             bool: True se sucesso, False se erro
         """
-        try:
-            logger.info(f"Executando: {' '.join(command)}")
-            
-            result = subprocess.run(
-                command,
-                cwd=self.dbt_project_dir,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutos timeout
-            )
-            
-            if result.returncode == 0:
-                logger.info(f"✅ Comando executado com sucesso")
-                if result.stdout:
-                    logger.debug(f"Output: {result.stdout}")
-                return True
-            else:
-                logger.error(f"❌ Erro na execução: {result.stderr}")
-                if result.stdout:
-                    logger.error(f"Output: {result.stdout}")
+        sucesso, run_results = self.backend.executar_com_resultados(command)
+        if self.historico and run_results:
+            try:
+                self.historico.registrar(run_results, ciclo=self._ciclo)
+            except Exception as e:
+                logger.warning(f"⚠️  Falha ao registrar o histórico de execução: {e}")
+        return sucesso
+    
+    def _manifest_path(self):
+        return Path(self.dbt_project_dir) / "target" / "manifest.json"
+    
+    def ensure_manifest(self):
+        """
+        Garante um manifest.json atualizado, rodando `dbt parse` só quando algum
+        arquivo do projeto é mais novo que o manifest
+        
+        Returns:
+            bool: True se o manifest está disponível
+        """
+        manifest = self._manifest_path()
+        if manifest.exists() and not projeto_alterado_desde(self.dbt_project_dir, manifest.stat().st_mtime):
+            return True
+        
+        logger.info("📖 Projeto alterado, atualizando manifest.json")
+        return self.run_dbt_command(["dbt", "parse"])
+    
+    def _instalar_deps(self):
+        """Pacotes só precisam ser instalados uma vez por processo"""
+        if not self._deps_instaladas:
+            if (Path(self.dbt_project_dir) / "packages.yml").exists() and not self.run_dbt_command(["dbt", "deps"]):
                 return False
-                
-        except subprocess.TimeoutExpired:
-            logger.error(f"⏰ Timeout na execução do comando: {' '.join(command)}")
-            return False
-        except Exception as e:
-            logger.error(f"💥 Erro inesperado: {e}")
+            self._deps_instaladas = True
+        return True
+    
+    def run_dbt_dag(self):
+        """
+        Executa os nós do projeto como DAG
+        
+        Um único `dbt build` percorre o DAG com o pool de threads do próprio dbt
+        e roda os testes de cada modelo logo após ele. Em uma só invocação o
+        projeto é parseado uma vez e os artefatos de target/ (manifest.json,
+        run_results.json, SQL compilado) não são disputados por processos dbt
+        simultâneos.
+        
+        Returns:
+            bool: True se todos os nós e testes executaram com sucesso
+        """
+        if not self._instalar_deps():
             return False
+        return self.run_dbt_command(["dbt", "build", "--threads", str(self.workers)])
     
-    def run_dbt_pipeline(self):
+    def run_dbt_full(self):
         """
-        Executa o pipeline completo do DBT
+        Executa o projeto inteiro no modo configurado
         
         Returns:
-            bool: True se todo o pipeline foi executado com sucesso
+            bool: True se todos os comandos executaram com sucesso
         """
-        logger.info("🚀 Iniciando execução do pipeline DBT")
-        start_time = datetime.now()
+        if self.mode == 'dag':
+            return self.run_dbt_dag()
         
         # Sequência de comandos DBT
         commands = [
@@ -138,11 +211,86 @@ class DBTScheduler:
             ["dbt", "test"]            # Executa testes
         ]
         
-        success = True
         for command in commands:
             if not self.run_dbt_command(command):
-                success = False
-                break
+                return False
+        return True
+    
+    def run_dbt_selection(self, grafo, selecao):
+        """
+        Executa apenas os nós `selecao` (unique_ids de `grafo`) e seus testes
+        
+        Returns:
+            bool: True se todos os nós e testes executaram com sucesso
+        """
+        nomes = sorted(grafo.nos[uid]['nome'] for uid in selecao)
+        logger.info(f"🎯 Reconstruindo {len(nomes)} nós: {', '.join(nomes)}")
+        
+        # `build` cobre modelos, snapshots e testes da seleção em um comando
+        command = ["dbt", "build", "--select"] + nomes
+        if self.mode == 'dag':
+            command += ["--threads", str(self.workers)]
+        return self.run_dbt_command(command)
+    
+    def run_dbt_selective(self):
+        """
+        Reconstrói só o fecho de dependentes das tabelas de origem cujo
+        max(updated_at) mudou desde a última execução bem-sucedida
+        
+        Sem marcas d'água registradas, ou com o projeto DBT alterado depois da
+        última execução, roda o projeto inteiro. As marcas só avançam quando a
+        execução termina com sucesso, então uma falha é refeita no ciclo seguinte.
+        Exclusões físicas na origem não movem as marcas e não são detectadas.
+        
+        Returns:
+            bool: True se a execução (ou a ausência dela) foi bem-sucedida
+        """
+        try:
+            # Lidas antes da execução: escritas feitas durante ela ficam para o próximo ciclo
+            atuais = MarcasDagua.serializar(self.detector_marcas.assinatura())
+        except Exception as e:
+            logger.warning(f"⚠️  Falha ao ler as marcas d'água da origem ({e}): execução completa")
+            return self.run_dbt_full()
+        
+        estado = self.marcas.carregar()
+        if estado is None:
+            logger.info("Sem marcas d'água anteriores: execução completa")
+            success = self.run_dbt_full()
+        elif projeto_alterado_desde(self.dbt_project_dir, estado['executado_em']):
+            logger.info("Projeto DBT alterado desde a última execução: execução completa")
+            success = self.run_dbt_full()
+        else:
+            alteradas = DetectorMudancas.tabelas_alteradas(estado['marcas'], atuais)
+            if not alteradas:
+                logger.info("💤 Nenhuma tabela de origem alterada: nada a reconstruir")
+                return True
+            
+            logger.info(f"📥 Tabelas alteradas: {', '.join(sorted(alteradas))}")
+            if not (self._instalar_deps() and self.ensure_manifest()):
+                return False
+            grafo = GrafoDBT.do_manifest(self._manifest_path())
+            selecao = grafo.afetados_por(alteradas)
+            success = self.run_dbt_selection(grafo, selecao) if selecao else True
+        
+        if success:
+            self.marcas.salvar(atuais)
+        return success
+    
+    def run_dbt_pipeline(self):
+        """
+        Executa o pipeline completo do DBT
+        
+        Returns:
+            bool: True se todo o pipeline foi executado com sucesso
+        """
+        logger.info("🚀 Iniciando execução do pipeline DBT")
+        start_time = datetime.now()
+        self._ciclo = start_time.isoformat(timespec='seconds')
+        
+        if self.selective:
+            success = self.run_dbt_selective()
+        else:
+            success = self.run_dbt_full()
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
@@ -169,16 +317,26 @@ class DBTScheduler:
             return
         
         self.running = True
-        logger.info(f"📅 Scheduler iniciado. Executando a cada {self.interval} segundos")
+        if self.gatilho:
+            logger.info("📅 Scheduler iniciado. Executando quando houver dados novos na origem")
+        else:
+            logger.info(f"📅 Scheduler iniciado. Executando a cada {self.interval} segundos")
         logger.info("Pressione Ctrl+C para parar")
         
         try:
-            while self.running:
-                self.run_dbt_pipeline()
-                
-                if self.running:  # Verifica se ainda está rodando
-                    logger.info(f"⏳ Aguardando {self.interval} segundos até a próxima execução...")
-                    time.sleep(self.interval)
+            if self.gatilho:
+                while self.running:
+                    logger.info("👀 Aguardando dados novos na origem...")
+                    if self.gatilho.aguardar(continuar=lambda: self.running) is None:
+                        break
+                    self.run_dbt_pipeline()
+            else:
+                while self.running:
+                    self.run_dbt_pipeline()
+                    
+                    if self.running:  # Verifica se ainda está rodando
+                        logger.info(f"⏳ Aguardando {self.interval} segundos até a próxima execução...")
+                        time.sleep(self.interval)
                     
         except KeyboardInterrupt:
             logger.info("\n🛑 Scheduler interrompido pelo usuário")
@@ -186,6 +344,10 @@ class DBTScheduler:
             logger.error(f"💥 Erro inesperado no scheduler: {e}")
         finally:
             self.running = False
+            if self.gatilho:
+                self.gatilho.detector.fechar()
+            if self.detector_marcas:
+                self.detector_marcas.fechar()
             logger.info("📴 Scheduler finalizado")
     
     def stop(self):
@@ -213,13 +375,103 @@ def main():
         type=str, 
         help="Diretório do projeto DBT (opcional)"
     )
+    parser.add_argument(
+        "--mode",
+        choices=["sequential", "dag"],
+        default="sequential",
+        help="sequential: deps/seed/run/test em sequência; dag: nós em paralelo pelo manifest.json"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Comandos dbt simultâneos no modo dag (padrão: 4)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["subprocess", "inprocess", "auto"],
+        default="subprocess",
+        help="subprocess: executável dbt; inprocess: dbtRunner no mesmo processo (manifest reutilizado)"
+    )
+    parser.add_argument(
+        "--trigger",
+        choices=["interval", "change"],
+        default="interval",
+        help="interval: a cada --interval segundos; change: só quando chegam dados novos na origem"
+    )
+    parser.add_argument(
+        "--change-detection",
+        choices=["stats", "updated_at"],
+        default="stats",
+        help="Como detectar mudanças no trigger change (padrão: stats = pg_stat_user_tables)"
+    )
+    parser.add_argument("--debounce", type=float, default=10,
+                        help="Trigger change: segundos sem novas escritas antes de executar (padrão: 10)")
+    parser.add_argument("--min-wait", type=float, default=30,
+                        help="Trigger change: intervalo mínimo entre execuções em segundos (padrão: 30)")
+    parser.add_argument("--max-wait", type=float, default=600,
+                        help="Trigger change: defasagem máxima com escrita contínua em segundos (padrão: 600)")
+    parser.add_argument("--poll-interval", type=float, default=5,
+                        help="Trigger change: intervalo entre consultas à origem em segundos (padrão: 5)")
+    parser.add_argument(
+        "--selective",
+        action="store_true",
+        help="Reconstrói só os modelos afetados pelas tabelas de origem alteradas (marcas d'água em updated_at). "
+             "Exclusões físicas na origem não são detectadas: rode periodicamente sem --selective "
+             "(ou dbt build --full-refresh) para propagá-las"
+    )
+    parser.add_argument(
+        "--watermark-file",
+        type=str,
+        default="dbt_watermarks.json",
+        help="Arquivo onde as marcas d'água do modo --selective são persistidas (padrão: dbt_watermarks.json)"
+    )
+    parser.add_argument(
+        "--lookback-minutes",
+        type=int,
+        default=10,
+        help="Modo --selective: janela abaixo de cada marca d'água em que linhas confirmadas tarde "
+             "são detectadas; use o valor da var incremental_lookback_minutes (padrão: 10)"
+    )
+    parser.add_argument(
+        "--history-file",
+        type=str,
+        default="dbt_run_history.sqlite",
+        help="SQLite com o tempo de cada modelo por execução (relatório: historico_execucoes.py relatorio)"
+    )
+    parser.add_argument(
+        "--benchmark-backends",
+        action="store_true",
+        help="Mede a sobrecarga por ciclo (dbt run) de cada backend e sai"
+    )
     
     args = parser.parse_args()
     
+    if args.benchmark_backends:
+        project_dir = args.project_dir or DBTScheduler._find_dbt_project()
+        for nome, medidas in comparar_backends(project_dir).items():
+            sobrecarga = medidas['sobrecarga_media']
+            logger.info(f"⏱️  {nome}: ciclo médio {medidas['duracao_media']:.2f}s, sobrecarga média "
+                        + (f"{sobrecarga:.2f}s" if sobrecarga is not None else "n/d"))
+        sys.exit(0)
+    
     # Cria o scheduler
     scheduler = DBTScheduler(
         dbt_project_dir=args.project_dir,
-        interval=args.interval
+        interval=args.interval,
+        mode=args.mode,
+        workers=args.workers,
+        backend=args.backend,
+        trigger=args.trigger,
+        change_detection=args.change_detection,
+        debounce=args.debounce,
+        min_wait=args.min_wait,
+        max_wait=args.max_wait,
+        poll_interval=args.poll_interval,
+        selective=args.selective,
+        watermark_file=args.watermark_file,
+        lookback_minutes=args.lookback_minutes,
+        history_file=args.history_file
     )
     
     if args.run_once:
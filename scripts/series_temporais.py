@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Séries temporais de vendas do dashboard
+
+Para um período e uma resolução (minuto/hora/dia/mês), lê o rollup gold
+correspondente (gold_dashboard_vendas_minuto/horarias/diarias; o mês é
+agregado a partir do diário) e reduz o resultado a no máximo `max_pontos`
+com LTTB (Largest-Triangle-Three-Buckets) antes de chegar ao Plotly.
+
+O custo fica limitado nas duas pontas: uma resolução fina demais para o
+período é trocada pela próxima mais grossa (no máximo MAX_INTERVALOS_LIDOS
+linhas lidas do rollup), e o navegador recebe no máximo `max_pontos` pontos
+por série. Dois anos custam o mesmo que uma semana.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# Resoluções, da mais fina para a mais grossa: rollup lido, coluna do
+# intervalo e duração aproximada de um intervalo
+RESOLUCOES = {
+    'minuto': {'tabela': 'public_gold.gold_dashboard_vendas_minuto', 'coluna': 'minuto_venda',
+               'passo': timedelta(minutes=1)},
+    'hora': {'tabela': 'public_gold.gold_dashboard_vendas_horarias', 'coluna': 'hora_venda',
+             'passo': timedelta(hours=1)},
+    'dia': {'tabela': 'public_gold.gold_dashboard_vendas_diarias', 'coluna': 'data_venda',
+            'passo': timedelta(days=1)},
+    'mes': {'tabela': 'public_gold.gold_dashboard_vendas_diarias', 'coluna': 'data_venda',
+            'passo': timedelta(days=30), 'agrupar': 'month'},
+}
+
+# Linhas lidas do rollup por consulta, no máximo
+MAX_INTERVALOS_LIDOS = 10_000
+
+# Pontos por gráfico enviados ao navegador
+MAX_PONTOS = 500
+
+COLUNAS_SERIE = ('pedidos', 'receita')
+
+
+def resolucao_para_periodo(inicio, fim, resolucao):
+    """
+    A resolução pedida ou, se o período tiver intervalos demais nela, a
+    primeira mais grossa que caiba em MAX_INTERVALOS_LIDOS
+    """
+    nomes = list(RESOLUCOES)
+    for nome in nomes[nomes.index(resolucao):]:
+        if (fim - inicio) / RESOLUCOES[nome]['passo'] <= MAX_INTERVALOS_LIDOS:
+            return nome
+    return nomes[-1]
+
+
+def consulta_serie(resolucao):
+    """
+    Consulta da série na resolução, com parâmetros %(inicio)s e %(fim)s
+    (intervalo semiaberto [inicio, fim))
+
+    Returns:
+        tuple: (sql, tabela do rollup)
+    """
+    config = RESOLUCOES[resolucao]
+    coluna, tabela = config['coluna'], config['tabela']
+    if 'agrupar' in config:
+        sql = f"""
+        SELECT
+            DATE_TRUNC('{config['agrupar']}', {coluna}) as periodo,
+            SUM(total_pedidos) as pedidos,
+            SUM(receita_bruta) as receita
+        FROM {tabela}
+        WHERE {coluna} >= %(inicio)s AND {coluna} < %(fim)s
+        GROUP BY 1
+        ORDER BY 1
+        """
+    else:
+        sql = f"""
+        SELECT
+            {coluna} as periodo,
+            total_pedidos as pedidos,
+            receita_bruta as receita
+        FROM {tabela}
+        WHERE {coluna} >= %(inicio)s AND {coluna} < %(fim)s
+        ORDER BY {coluna}
+        """
+    return sql, tabela
+
+
+def lttb(x, y, limite):
+    """
+    Largest-Triangle-Three-Buckets: escolhe `limite` pontos que preservam a
+    forma da série (picos e vales), sempre com o primeiro e o último
+
+    Args:
+        x: valores crescentes (numéricos)
+        y: valores da série
+        limite: quantidade de pontos desejada
+
+    Returns:
+        numpy.ndarray: índices dos pontos escolhidos, em ordem
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Pontos internos divididos em limite - 2 grupos; de cada grupo fica o que
+    # forma o maior triângulo com o ponto escolhido antes e a média do próximo grupo
+    bordas = np.linspace(1, n - 1, limite - 1).astype(int)
+    indices = np.empty(limite, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        proximo = slice(bordas[i + 1], bordas[i + 2]) if i + 2 < len(bordas) else slice(n - 1, n)
+        media_x, media_y = x[proximo].mean(), y[proximo].mean()
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+
+def reduzir_serie(df, max_pontos=MAX_PONTOS, colunas=COLUNAS_SERIE):
+    """
+    Reduz a série a no máximo `max_pontos` linhas: LTTB em cada coluna (com
+    max_pontos / len(colunas) pontos) e a união dos pontos escolhidos
+    """
+    if len(df) <= max_pontos:
+        return df
+    periodo = pd.to_datetime(df['periodo'])
+    x = (periodo - periodo.iloc[0]).dt.total_seconds().to_numpy()
+    por_coluna = max(max_pontos // len(colunas), 3)
+    indices = np.unique(np.concatenate([
+        lttb(x, df[coluna].to_numpy(dtype=float), por_coluna) for coluna in colunas
+    ]))
+    return df.iloc[indices].reset_index(drop=True)
+
+
+def serie_vendas(fonte_dados, inicio, fim, resolucao='dia', max_pontos=MAX_PONTOS):
+    """
+    Pedidos e receita por intervalo no período [inicio, fim)
+
+    Args:
+        fonte_dados: DadosDashboard (cache por versão do rollup lido)
+        inicio, fim: datas ou timestamps do período
+        resolucao: 'minuto', 'hora', 'dia' ou 'mes'
+        max_pontos: pontos máximos da série devolvida
+
+    Returns:
+        tuple: (DataFrame com periodo, pedidos e receita; resolução usada; {nome: erro})
+    """
+    resolucao = resolucao_para_periodo(inicio, fim, resolucao)
+    sql, tabela = consulta_serie(resolucao)
+    dados, erros, _ = fonte_dados.carregar({
+        'evolucao': (sql, (tabela,), {'inicio': inicio, 'fim': fim})
+    })
+    return reduzir_serie(dados['evolucao'], max_pontos), resolucao, erros